@@ -0,0 +1,24 @@
+"""Add endpoints to database connections
+
+Revision ID: 3f9c2a7d41b8
+Revises: add_uuid_columns
+Create Date: 2026-10-19 09:12:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9c2a7d41b8'
+down_revision = 'add_uuid_columns'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('database_connections', sa.Column('endpoints', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('database_connections', 'endpoints')
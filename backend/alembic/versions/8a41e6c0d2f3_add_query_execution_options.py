@@ -0,0 +1,24 @@
+"""Add execution options to queries
+
+Revision ID: 8a41e6c0d2f3
+Revises: 3f9c2a7d41b8
+Create Date: 2026-10-19 10:02:17.540118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a41e6c0d2f3'
+down_revision = '3f9c2a7d41b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('queries', sa.Column('execution_options', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('queries', 'execution_options')
@@ -0,0 +1,24 @@
+"""Add execution weight to workspaces
+
+Revision ID: b7e2d94c3a15
+Revises: 8a41e6c0d2f3
+Create Date: 2026-10-19 14:26:05.219837
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e2d94c3a15'
+down_revision = '8a41e6c0d2f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('workspaces', sa.Column('execution_weight', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('workspaces', 'execution_weight')
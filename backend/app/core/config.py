@@ -19,13 +19,111 @@ class Settings(BaseSettings):
     # Server
     HOST: str = "0.0.0.0"
     PORT: int = 8006
+    WEB_CONCURRENCY: int = 1  # Worker processes on the host; gunicorn_config.py exports its count
     
     # Environment
     ENVIRONMENT: str = "development"
     
     # Scheduler
     AUTO_CLOSE_DAYS_DEFAULT: int = 90
-    
+
+    # Circuit breaker (per target database connection)
+    CIRCUIT_BREAKER_FAILURE_RATE: float = 0.5
+    CIRCUIT_BREAKER_SLOW_CALL_RATE: float = 1.0
+    CIRCUIT_BREAKER_SLOW_CALL_MS: int = 10000
+    CIRCUIT_BREAKER_WINDOW_SIZE: int = 20
+    CIRCUIT_BREAKER_MIN_CALLS: int = 5
+    CIRCUIT_BREAKER_OPEN_SECONDS: float = 30.0
+    CIRCUIT_BREAKER_HALF_OPEN_PROBES: int = 1
+
+    # Read replicas
+    REPLICA_HEALTH_CHECK_SECONDS: int = 15
+    REPLICA_HEDGE_PERCENTILE: float = 95.0  # 0 disables hedged reads
+
+    # Query deadlines (kept below the gunicorn worker timeout)
+    QUERY_DEFAULT_TIMEOUT_MS: int = 20000
+    QUERY_MAX_TIMEOUT_MS: int = 25000
+    QUERY_DISCONNECT_POLL_MS: int = 500
+    QUERY_CANCEL_GRACE_MS: int = 2000
+
+    # Result fetching (per connection overrides in additional_params)
+    FETCH_ARRAY_SIZE: int = 1000
+    FETCH_PREFETCH_ROWS: Optional[int] = None  # cx_Oracle; defaults to the array size + 1
+    FETCH_STREAM_RESULTS: bool = True  # Server-side cursors on PostgreSQL and MySQL
+    FETCH_CONVERT_WORKERS: int = 2
+
+    # Result budgets (per execution; queries can set lower max_rows / max_bytes)
+    RESULT_MAX_ROWS: int = 1000000
+    RESULT_MAX_BYTES: int = 256 * 1024 * 1024  # Estimated size of the rows held in memory
+
+    # Cursor sessions (results kept open on the server and pulled in chunks)
+    CURSOR_SESSION_MAX_PER_CONNECTION: int = 4
+    CURSOR_SESSION_IDLE_TTL_SECONDS: int = 300
+    CURSOR_SESSION_REAP_INTERVAL_SECONDS: int = 30
+    CURSOR_SESSION_CHUNK_ROWS: int = 1000  # When the request does not set page_size
+    CURSOR_SESSION_DIR: str = "/tmp/max_queryhub/cursor_sessions"  # Shared by the workers serving pulls
+    CURSOR_SESSION_SEGMENT_ROWS: int = 10000  # Rows per spooled columnar file
+    CURSOR_SESSION_SPOOL_AHEAD_ROWS: int = 100000  # Spooled rows waiting for the client before spooling pauses
+    CURSOR_SESSION_POLL_MS: int = 50  # How often a pull checks for newly spooled rows
+
+    # Execution queue (weighted fair queuing of workspaces sharing a database connection)
+    EXECUTION_QUEUE_MAX_CONCURRENT: int = 10  # Running executions per database connection, split across the workers
+    EXECUTION_QUEUE_MAX_DEPTH: int = 200  # Queued executions per workspace and database connection
+    EXECUTION_QUEUE_DEFAULT_COST_MS: int = 100  # Assumed cost of a workspace's first executions
+
+    # Batch execution (many parameter sets of one query)
+    BATCH_MAX_PARAM_SETS: int = 1000
+    BATCH_CONCURRENCY: int = 4
+
+    # Dashboard bundles (many queries of one workspace in one call)
+    BUNDLE_MAX_QUERIES: int = 50
+    BUNDLE_CONCURRENCY: int = 6
+
+    # Table-valued parameters (bulk-loaded into temp tables)
+    TABLE_PARAM_MAX_ROWS: int = 1000000
+
+    # Server-side prepared statements (queries can opt in or out with prepare_statements)
+    PREPARED_STATEMENTS_ENABLED: bool = False
+    PREPARED_STATEMENTS_PER_CONNECTION: int = 64
+
+    # PostgreSQL COPY exports
+    EXPORT_TIMEOUT_MS: int = 30 * 60 * 1000  # 30 minutes
+    EXPORT_CHUNK_BYTES: int = 256 * 1024
+    EXPORT_MAX_BUFFERED_CHUNKS: int = 16
+
+    # Asynchronous jobs
+    JOB_RESULT_DIR: str = "/tmp/max_queryhub/jobs"
+    JOB_RESULT_TTL_SECONDS: int = 60 * 60 * 24  # 24 hours
+    JOB_WORKERS: int = 2  # Per worker process
+    JOB_DEFAULT_TIMEOUT_MS: int = 10 * 60 * 1000  # 10 minutes
+    JOB_MAX_TIMEOUT_MS: int = 60 * 60 * 1000  # 1 hour
+
+    # Materialized query snapshots
+    SNAPSHOT_DIR: str = "/tmp/max_queryhub/snapshots"
+    SNAPSHOT_MAX_SEGMENTS: int = 32  # Incremental refreshes merge the newer segments past this
+    MATERIALIZE_SYNC_MINUTES: int = 5
+    MATERIALIZE_TIMEOUT_MS: int = 60 * 60 * 1000  # 1 hour
+
+    # Result cache (L1 per worker, L2 shared by the workers on a host)
+    RESULT_CACHE_L1_MAX_ENTRIES: int = 256
+    RESULT_CACHE_L1_MAX_BYTES: int = 64 * 1024 * 1024
+    RESULT_CACHE_BACKEND: str = "sqlite"  # sqlite, redis or none
+    RESULT_CACHE_PATH: str = "/tmp/max_queryhub/result_cache.sqlite3"
+    RESULT_CACHE_REDIS_URL: str = "redis://localhost:6379/0"
+    RESULT_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+
+    # Encoded /execute response bodies (per worker)
+    RESPONSE_CACHE_MAX_ENTRIES: int = 512
+    RESPONSE_CACHE_MAX_BYTES: int = 128 * 1024 * 1024
+    RESPONSE_CACHE_SNAPSHOT_TTL_SECONDS: int = 300
+
+    # Result compression (zstd and br need the zstandard / brotli packages)
+    RESPONSE_COMPRESSION_ENABLED: bool = True
+    RESPONSE_COMPRESSION_MIN_BYTES: int = 1024
+    RESPONSE_COMPRESSION_GZIP_LEVEL: int = 5
+    RESPONSE_COMPRESSION_BROTLI_QUALITY: int = 4
+    RESPONSE_COMPRESSION_ZSTD_LEVEL: int = 3
+
     # CORS
     BACKEND_CORS_ORIGINS: list[str] = ["http://localhost:3006", "http://localhost:3000", "http://localhost:8000","http://localhost:8006"]
     
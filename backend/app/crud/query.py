@@ -2,7 +2,7 @@ from datetime import datetime
 from typing import List, Optional
 from uuid import UUID
 from sqlalchemy import select, update
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import joinedload, selectinload
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.crud.base import CRUDBase
 from app.models.query import Query, QueryStatus
@@ -65,6 +65,24 @@ class CRUDQuery(CRUDBase[Query, QueryCreate, QueryUpdate]):
         await db.refresh(query_obj)
         return query_obj
     
+    async def update_execution_options(
+        self,
+        db: AsyncSession,
+        *,
+        query_id: int,
+        execution_options: Optional[dict]
+    ) -> Optional[Query]:
+        """Replace query execution options."""
+        query_obj = await self.get(db, id=query_id)
+        if not query_obj:
+            return None
+            
+        query_obj.execution_options = execution_options or None
+        db.add(query_obj)
+        await db.commit()
+        await db.refresh(query_obj)
+        return query_obj
+    
     async def update_last_executed(
         self,
         db: AsyncSession,
@@ -80,6 +98,21 @@ class CRUDQuery(CRUDBase[Query, QueryCreate, QueryUpdate]):
         await db.execute(stmt)
         await db.commit()
     
+    async def update_last_executed_many(
+        self,
+        db: AsyncSession,
+        *,
+        query_ids: List[int]
+    ) -> None:
+        """Update last executed timestamp of several queries."""
+        stmt = (
+            update(Query)
+            .where(Query.id.in_(query_ids))
+            .values(last_executed_at=datetime.utcnow())
+        )
+        await db.execute(stmt)
+        await db.commit()
+    
     async def get_inactive_queries(
         self,
         db: AsyncSession,
@@ -117,6 +150,45 @@ class CRUDQuery(CRUDBase[Query, QueryCreate, QueryUpdate]):
         result = await db.execute(query)
         return result.scalar_one_or_none()
     
+    async def get_many_by_uuids_with_workspace(
+        self,
+        db: AsyncSession,
+        *,
+        uuids: List[UUID]
+    ) -> List[Query]:
+        """Get queries by UUID with workspace and database connection loaded, in one round trip."""
+        from app.models.workspace import Workspace
+        query = (
+            select(Query)
+            .options(
+                joinedload(Query.workspace)
+                .joinedload(Workspace.database_connection)
+            )
+            .where(Query.uuid.in_(uuids))
+        )
+        result = await db.execute(query)
+        return result.scalars().unique().all()
+    
+    async def get_materialized(self, db: AsyncSession) -> List[Query]:
+        """Get available queries with a materialization schedule, with database connections loaded."""
+        from app.models.workspace import Workspace
+        query = (
+            select(Query)
+            .options(
+                selectinload(Query.workspace)
+                .selectinload(Workspace.database_connection)
+            )
+            .where(
+                Query.status == QueryStatus.AVAILABLE,
+                Query.execution_options.isnot(None)
+            )
+        )
+        result = await db.execute(query)
+        return [
+            q for q in result.scalars().all()
+            if (q.execution_options or {}).get("materialization")
+        ]
+    
     async def create(self, db: AsyncSession, *, obj_in: QueryCreate, **kwargs) -> Query:
         """Create a query with initial version."""
         # Create the query first
@@ -54,6 +54,19 @@ class CRUDWorkspace(CRUDBase[Workspace, WorkspaceCreate, WorkspaceUpdate]):
         result = await db.execute(query)
         return result.scalars().all()
     
+    async def get_by_uuid_with_details(self, db: AsyncSession, *, uuid: UUID) -> Optional[Workspace]:
+        """Get a workspace with its queries and database connection loaded for a response."""
+        query = (
+            select(Workspace)
+            .options(selectinload(Workspace.queries))
+            .options(selectinload(Workspace.database_connection))
+            .where(Workspace.uuid == uuid)
+            # The workspace may already be in the session without its relationships
+            .execution_options(populate_existing=True)
+        )
+        result = await db.execute(query)
+        return result.scalar_one_or_none()
+    
     async def has_access(
         self,
         db: AsyncSession,
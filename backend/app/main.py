@@ -6,13 +6,16 @@ from app.core.config import settings
 from app.core.database import engine
 from app.core.rate_limit import rate_limit_middleware, execute_rate_limiter, api_rate_limiter
 from app.services.scheduler import scheduler_service
+from app.services.job_manager import job_manager
+from app.services.cursor_sessions import cursor_sessions
 from app.routers import (
     health_router,
     workspaces_router,
     queries_router,
     permissions_router,
     external_router,
-    execute_router
+    execute_router,
+    jobs_router
 )
 from app.routers.auth_proxy import router as auth_router
 from app.routers.database_connections import router as db_connections_router
@@ -35,11 +38,17 @@ async def lifespan(app: FastAPI):
     print("Starting Query Hub API Gateway...")
     # Start scheduler
     scheduler_service.start()
+    # Start asynchronous job workers
+    await job_manager.start()
+    # Start closing idle cursor sessions
+    cursor_sessions.start()
     # Start rate limiter cleanup tasks
     async with execute_rate_limiter, api_rate_limiter:
         yield
     # Shutdown
     print("Shutting down Query Hub API Gateway...")
+    await job_manager.shutdown()
+    await cursor_sessions.shutdown()
     scheduler_service.shutdown()
     await engine.dispose()
 
@@ -77,6 +86,7 @@ app.include_router(queries_router, prefix="/api/v1")
 app.include_router(permissions_router, prefix="/api/v1")
 app.include_router(external_router, prefix="/api/v1")
 app.include_router(execute_router, prefix="/api/v1")
+app.include_router(jobs_router, prefix="/api/v1")
 app.include_router(db_connections_router, prefix="/api/v1")  # Database connections
 app.include_router(query_versions_router, prefix="/api/v1")  # Query versions
 
@@ -1,7 +1,7 @@
 from enum import Enum as PyEnum
 from datetime import datetime
 import uuid
-from sqlalchemy import Column, String, Enum, DateTime, Text, Boolean, Integer
+from sqlalchemy import Column, String, Enum, DateTime, Text, Boolean, Integer, JSON
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from app.core.database import Base
@@ -15,6 +15,11 @@ class DatabaseType(str, PyEnum):
     SQLITE = "SQLITE"
 
 
+class EndpointRole(str, PyEnum):
+    PRIMARY = "PRIMARY"
+    REPLICA = "REPLICA"
+
+
 class DatabaseConnection(Base):
     __tablename__ = "database_connections"
     
@@ -28,6 +33,7 @@ class DatabaseConnection(Base):
     username = Column(String(100), nullable=False)
     password_encrypted = Column(Text, nullable=False)  # 암호화된 비밀번호
     additional_params = Column(Text, nullable=True)  # JSON 형태의 추가 연결 파라미터
+    endpoints = Column(JSON, nullable=True)  # 추가 엔드포인트 목록 [{host, port, weight, role}]
     is_active = Column(Boolean, default=True, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
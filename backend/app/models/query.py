@@ -22,6 +22,7 @@ class Query(Base):
     description = Column(Text, nullable=True)
     sql_template = Column(Text, nullable=False)
     params_info = Column(JSON, nullable=True)
+    execution_options = Column(JSON, nullable=True)  # timeout_ms and other execution settings
     status = Column(Enum(QueryStatus), default=QueryStatus.UNAVAILABLE, nullable=False)
     created_by = Column(String(255), nullable=False)
     last_executed_at = Column(DateTime, nullable=True)
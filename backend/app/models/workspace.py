@@ -22,6 +22,8 @@ class Workspace(Base):
     owner_id = Column(String(255), nullable=False, index=True)
     database_connection_id = Column(Integer, ForeignKey("database_connections.id"), nullable=True)
     auto_close_days = Column(Integer, nullable=True, default=90)
+    # Share of its database connection's capacity while other workspaces have executions queued
+    execution_weight = Column(Integer, nullable=False, default=1, server_default="1")
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     
     # Relationships
@@ -4,6 +4,7 @@ from app.routers.queries import router as queries_router
 from app.routers.permissions import router as permissions_router
 from app.routers.external import router as external_router
 from app.routers.execute import router as execute_router
+from app.routers.jobs import router as jobs_router
 
 __all__ = [
     "health_router",
@@ -11,5 +12,6 @@ __all__ = [
     "queries_router", 
     "permissions_router",
     "external_router",
-    "execute_router"
+    "execute_router",
+    "jobs_router"
 ]
\ No newline at end of file
@@ -1,26 +1,43 @@
+import time
+import json
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Header, Request, Response, status, Query as QueryParam
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.datastructures import UploadFile
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
 from app.core.database import get_db
 from app.crud import query_crud
-from app.schemas import QueryExecuteRequest, QueryExecuteResponse
+from app.schemas import (
+    QueryExecuteRequest, QueryExecuteResponse, QueryBatchExecuteRequest, QueryBatchExecuteResponse,
+    QueryBundleRequest, QueryExportRequest
+)
 from app.services import QueryExecutorService
-from app.models.query import QueryStatus
+from app.services.compression import compress_async_stream, compress_body, negotiate, stream_headers
+from app.services.execution_control import resolve_timeout_ms
+from app.services.result_encoder import encode_json, encode_response
+from app.services.response_cache import encoded_response, response_cache, response_cache_key, to_response
+from app.services.result_cache import result_cache, result_cache_key
+from app.services.snapshot_store import snapshot_store
+from app.services.table_params import parse_table_upload
+from app.services.copy_export import MEDIA_TYPES
+from app.services.pagination import PageRequest
+from app.services.projection import Projection
+from app.models.query import Query, QueryStatus
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=["execute"])
 query_executor = QueryExecutorService()
 
 
-@router.post("/execute/{query_id}", response_model=QueryExecuteResponse)
-async def execute_query(
-    query_id: UUID,
-    request: QueryExecuteRequest,
-    db: AsyncSession = Depends(get_db)
-) -> QueryExecuteResponse:
-    """
-    Execute a published query (no authentication required).
-    This is the public API endpoint for data consumption.
-    """
+async def get_published_query(db: AsyncSession, query_id: UUID) -> Query:
+    """Load a query available for public execution with its workspace and database connection."""
     # Get query by UUID first
     query = await query_crud.get_by_uuid(db, uuid=query_id)
     if not query:
@@ -44,21 +61,524 @@ async def execute_query(
             detail="Query is not available for public execution"
         )
     
-    # Execute query
-    result = await query_executor.execute_query(
-        db,
+    return query
+
+
+async def _bundle_result(
+    query: Query,
+    params: Dict[str, Any],
+    timeout_ms: int,
+    is_disconnected
+) -> Dict[str, Any]:
+    """Result of one bundled query, from its snapshot, the result cache or the database."""
+    options = query.execution_options or {}
+    if options.get("materialization"):
+        snapshot = snapshot_store.get(query.id, query.current_version_id, params)
+        if snapshot:
+            return {
+                "executed_at": snapshot["snapshot_at"],
+                "row_count": snapshot["row_count"],
+                "data": snapshot["data"],
+                "execution_time_ms": snapshot["execution_time_ms"],
+                "snapshot_at": snapshot["snapshot_at"]
+            }
+    
+    cache_ttl = options.get("cache_ttl_seconds")
+    cache_key = result_cache_key(query.id, query.current_version_id, params)
+    result = await result_cache.get(cache_key) if cache_ttl else None
+    if result is None:
+        result = await query_executor.execute_query(
+            None,
+            sql_template=query.sql_template,
+            params=params,
+            params_info=query.params_info,
+            database_connection=query.workspace.database_connection,
+            timeout_ms=timeout_ms,
+            is_disconnected=is_disconnected,
+            version_id=query.current_version_id,
+            prepare=options.get("prepare_statements"),
+            max_rows=options.get("max_rows"),
+            max_bytes=options.get("max_bytes"),
+            workspace=query.workspace
+        )
+        if cache_ttl:
+            result = await result_cache.set(cache_key, result, cache_ttl)
+    return result
+
+
+@router.post("/execute/bundle")
+async def execute_bundle(
+    request: QueryBundleRequest,
+    http_request: Request,
+    x_timeout_ms: Optional[int] = Header(None, alias="X-Timeout-Ms"),
+    db: AsyncSession = Depends(get_db)
+) -> StreamingResponse:
+    """
+    Execute several published queries of one workspace (no authentication required).
+    Queries run concurrently, up to BUNDLE_CONCURRENCY at a time, and each
+    result is streamed as one NDJSON line as soon as it is ready. Lines carry
+    the index of the query in the request; failed queries get an error line.
+    """
+    if len(request.queries) > settings.BUNDLE_MAX_QUERIES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A bundle can contain at most {settings.BUNDLE_MAX_QUERIES} queries"
+        )
+    
+    # Resolve every query, workspace and database connection in one round trip
+    queries = {
+        query.uuid: query
+        for query in await query_crud.get_many_by_uuids_with_workspace(
+            db, uuids=list({item.query_id for item in request.queries})
+        )
+    }
+    workspace_ids = {query.workspace_id for query in queries.values()}
+    if len(workspace_ids) > 1:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="All queries of a bundle must belong to the same workspace"
+        )
+    
+    available = [query.id for query in queries.values() if query.status == QueryStatus.AVAILABLE]
+    if available:
+        await query_crud.update_last_executed_many(db, query_ids=available)
+    
+    encoding = negotiate(http_request.headers.get("Accept-Encoding"))
+    semaphore = asyncio.Semaphore(settings.BUNDLE_CONCURRENCY)
+    closed = False
+    
+    async def client_gone() -> bool:
+        return closed
+    
+    def error_line(index: int, query_id: UUID, status_code: int, detail: Any) -> bytes:
+        return encode_json({
+            "index": index, "query_uuid": query_id, "error": detail, "status_code": status_code
+        }) + b"\n"
+    
+    async def run(index: int, query_id: UUID, params: Dict[str, Any]) -> bytes:
+        query = queries.get(query_id)
+        if query is None:
+            return error_line(index, query_id, status.HTTP_404_NOT_FOUND,
+                              "Query not found or not available for public access")
+        if query.status != QueryStatus.AVAILABLE:
+            return error_line(index, query_id, status.HTTP_403_FORBIDDEN,
+                              "Query is not available for public execution")
+        
+        async with semaphore:
+            if closed:
+                return b""
+            timeout_ms = resolve_timeout_ms((query.execution_options or {}).get("timeout_ms"), x_timeout_ms)
+            try:
+                result = await _bundle_result(query, params, timeout_ms, client_gone)
+            except HTTPException as e:
+                return error_line(index, query_id, e.status_code, e.detail)
+            except Exception as e:
+                logger.exception(f"Bundle query {query_id} failed: {str(e)}")
+                return error_line(index, query_id, status.HTTP_500_INTERNAL_SERVER_ERROR,
+                                  f"Unexpected error: {str(e)}")
+        
+        return encode_json({
+            "index": index,
+            "query_id": query.id,
+            "query_uuid": query.uuid,
+            "query_name": query.name,
+            "executed_at": result["executed_at"],
+            "row_count": result["row_count"],
+            "data": result["data"],
+            "execution_time_ms": result["execution_time_ms"],
+            "snapshot_at": result.get("snapshot_at"),
+            "truncated": result.get("truncated", False)
+        }) + b"\n"
+    
+    async def lines() -> AsyncIterator[bytes]:
+        nonlocal closed
+        tasks: List[asyncio.Future] = [
+            asyncio.ensure_future(run(index, item.query_id, item.params))
+            for index, item in enumerate(request.queries)
+        ]
+        try:
+            for next_line in asyncio.as_completed(tasks):
+                yield await next_line
+        finally:
+            # On disconnect, running statements notice through client_gone and are cancelled
+            closed = True
+            for task in tasks:
+                task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    
+    return StreamingResponse(
+        compress_async_stream(lines(), encoding),
+        media_type="application/x-ndjson",
+        headers=stream_headers(encoding)
+    )
+
+
+@router.post("/execute/{query_id}", response_model=QueryExecuteResponse)
+async def execute_query(
+    query_id: UUID,
+    request: QueryExecuteRequest,
+    http_request: Request,
+    x_timeout_ms: Optional[int] = Header(None, alias="X-Timeout-Ms"),
+    db: AsyncSession = Depends(get_db)
+) -> Response:
+    """
+    Execute a published query (no authentication required).
+    This is the public API endpoint for data consumption.
+    X-Timeout-Ms can shorten the query's configured deadline, never extend it.
+    With page_size, one page is returned; pass its next_cursor as cursor for the next one.
+    With session, the query runs once and its result stays open on the server;
+    pull the next chunks from /execute/sessions/{session_token}.
+    """
+    query = await get_published_query(db, query_id)
+    options = query.execution_options or {}
+    if request.session:
+        return await _open_cursor_session(query, request, http_request, x_timeout_ms, db)
+    cache_ttl = options.get("cache_ttl_seconds")
+    encoding = negotiate(http_request.headers.get("Accept-Encoding"))
+    # Every page and projection is cached on its own
+    view = request.model_dump(include={"page_size", "cursor", "fields", "filters"}, exclude_none=True)
+    key_params = {**request.params, "__view": view} if view else request.params
+    filters = [f.model_dump() for f in request.filters] if request.filters else None
+    
+    # Materialized queries are served from their latest snapshot
+    snapshot = None
+    if options.get("materialization"):
+        snapshot = snapshot_store.open(query.id, query.current_version_id, request.params)
+    
+    # Hot results reuse the body encoded for an earlier request
+    body_key = None
+    if snapshot or cache_ttl:
+        body_key = response_cache_key(
+            query, key_params, snapshot.metadata["snapshot_at"] if snapshot else "live", encoding=encoding
+        )
+        encoded = response_cache.get(body_key)
+        if encoded:
+            await query_crud.update_last_executed(db, query_id=query.id)
+            return to_response(encoded, http_request.headers.get("If-None-Match"))
+    
+    if snapshot:
+        next_cursor = projection = page = None
+        try:
+            if request.fields or filters:
+                projection = Projection(options.get("output_columns"), request.fields, filters)
+            if request.page_size:
+                # Snapshots keep their row order, so offsets are stable
+                page = PageRequest(request.page_size, request.cursor, version_id=query.current_version_id)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        if projection is not None:
+            # Snapshots are local files; narrowing them in place needs no database
+            snapshot = snapshot_store.read(snapshot)
+            snapshot["data"] = projection.apply(snapshot["data"])
+            if page is not None:
+                snapshot["data"] = snapshot["data"][page.offset:page.offset + page.page_size + 1]
+        elif page is not None:
+            snapshot = snapshot_store.read(snapshot, page.offset, page.page_size + 1)
+        else:
+            snapshot = snapshot_store.read(snapshot)
+        if page is not None:
+            snapshot["data"], next_cursor = page.finish(snapshot["data"])
+        if projection is not None or page is not None:
+            snapshot["row_count"] = len(snapshot["data"])
+        body_ttl = settings.RESPONSE_CACHE_SNAPSHOT_TTL_SECONDS
+        body = encode_response(
+            QueryExecuteResponse,
+            query_id=query.id,
+            query_uuid=query.uuid,
+            query_name=query.name,
+            executed_at=snapshot["snapshot_at"],
+            row_count=snapshot["row_count"],
+            data=snapshot["data"],
+            execution_time_ms=snapshot["execution_time_ms"],
+            snapshot_at=snapshot["snapshot_at"],
+            next_cursor=next_cursor
+        )
+    else:
+        cache_key = result_cache_key(query.id, query.current_version_id, key_params)
+        result = await result_cache.get(cache_key) if cache_ttl else None
+        
+        if result is None:
+            # Execute query
+            result = await query_executor.execute_query(
+                db,
+                sql_template=query.sql_template,
+                params=request.params,
+                params_info=query.params_info,
+                database_connection=query.workspace.database_connection,
+                timeout_ms=resolve_timeout_ms(options.get("timeout_ms"), x_timeout_ms),
+                is_disconnected=http_request.is_disconnected,
+                version_id=query.current_version_id,
+                prepare=options.get("prepare_statements"),
+                page_size=request.page_size,
+                cursor=request.cursor,
+                order_key=options.get("order_key"),
+                fields=request.fields,
+                filters=filters,
+                output_columns=options.get("output_columns"),
+                max_rows=options.get("max_rows"),
+                max_bytes=options.get("max_bytes"),
+                workspace=query.workspace
+            )
+            if cache_ttl:
+                result = await result_cache.set(cache_key, result, cache_ttl)
+        
+        # The encoded body must not outlive the cached result it was built from
+        body_ttl = result["expires_at"] - time.time() if cache_ttl else 0
+        body = encode_response(
+            QueryExecuteResponse,
+            query_id=query.id,
+            query_uuid=query.uuid,
+            query_name=query.name,
+            **result
+        )
+    
+    # Update last executed timestamp
+    await query_crud.update_last_executed(db, query_id=query.id)
+    
+    # Cached bodies are stored compressed, so hot hits skip compression too
+    body, headers = await compress_body(body, encoding)
+    if body_key is None:
+        return Response(content=body, media_type="application/json", headers=headers)
+    encoded = encoded_response(body, headers=headers)
+    response_cache.put(body_key, encoded, body_ttl)
+    return to_response(encoded, http_request.headers.get("If-None-Match"))
+
+
+async def _open_cursor_session(
+    query: Query,
+    request: QueryExecuteRequest,
+    http_request: Request,
+    x_timeout_ms: Optional[int],
+    db: AsyncSession
+) -> Response:
+    """Run a query into a cursor session and return its first chunk. Sessions bypass caches and snapshots."""
+    if request.cursor:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="cursor cannot be combined with session"
+        )
+    options = query.execution_options or {}
+    result = await query_executor.open_session(
         sql_template=query.sql_template,
         params=request.params,
+        query={"query_id": query.id, "query_uuid": query.uuid, "query_name": query.name},
+        params_info=query.params_info,
+        database_connection=query.workspace.database_connection,
+        chunk_rows=request.page_size,
+        timeout_ms=resolve_timeout_ms(options.get("timeout_ms"), x_timeout_ms),
+        is_disconnected=http_request.is_disconnected,
+        version_id=query.current_version_id,
+        fields=request.fields,
+        filters=[f.model_dump() for f in request.filters] if request.filters else None,
+        output_columns=options.get("output_columns"),
+        workspace=query.workspace
+    )
+    await query_crud.update_last_executed(db, query_id=query.id)
+    
+    encoding = negotiate(http_request.headers.get("Accept-Encoding"))
+    body = encode_response(
+        QueryExecuteResponse, query_id=query.id, query_uuid=query.uuid, query_name=query.name, **result
+    )
+    body, headers = await compress_body(body, encoding)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.get("/execute/sessions/{session_token}", response_model=QueryExecuteResponse)
+async def fetch_cursor_session(
+    session_token: str,
+    http_request: Request,
+    rows: Optional[int] = QueryParam(None, ge=1, le=10000),
+    x_timeout_ms: Optional[int] = Header(None, alias="X-Timeout-Ms")
+) -> Response:
+    """
+    Pull the next chunk of a cursor session (no authentication required; the token is the credential).
+    session_token is null in the last chunk, after which the session is closed.
+    """
+    result = await query_executor.fetch_session(
+        session_token,
+        chunk_rows=rows,
+        timeout_ms=resolve_timeout_ms(None, x_timeout_ms),
+        is_disconnected=http_request.is_disconnected
+    )
+    encoding = negotiate(http_request.headers.get("Accept-Encoding"))
+    body, headers = await compress_body(encode_response(QueryExecuteResponse, **result), encoding)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.delete("/execute/sessions/{session_token}", status_code=status.HTTP_204_NO_CONTENT)
+async def close_cursor_session(session_token: str) -> Response:
+    """Close a cursor session before its result is exhausted."""
+    await query_executor.close_session(session_token)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.post("/execute/{query_id}/batch", response_model=QueryBatchExecuteResponse)
+async def execute_query_batch(
+    query_id: UUID,
+    request: QueryBatchExecuteRequest,
+    http_request: Request,
+    x_timeout_ms: Optional[int] = Header(None, alias="X-Timeout-Ms"),
+    db: AsyncSession = Depends(get_db)
+) -> Response:
+    """
+    Execute a published query once per parameter set (no authentication required).
+    The query is looked up and its parameters compiled once for the whole batch.
+    Each set gets its own result or error; the deadline covers the whole batch.
+    """
+    if len(request.param_sets) > settings.BATCH_MAX_PARAM_SETS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A batch can contain at most {settings.BATCH_MAX_PARAM_SETS} parameter sets"
+        )
+    
+    query = await get_published_query(db, query_id)
+    options = query.execution_options or {}
+    encoding = negotiate(http_request.headers.get("Accept-Encoding"))
+    
+    started = time.time()
+    results = await query_executor.execute_batch(
+        sql_template=query.sql_template,
+        param_sets=request.param_sets,
         params_info=query.params_info,
-        database_connection=query.workspace.database_connection
+        database_connection=query.workspace.database_connection,
+        timeout_ms=resolve_timeout_ms(options.get("timeout_ms"), x_timeout_ms),
+        is_disconnected=http_request.is_disconnected,
+        version_id=query.current_version_id,
+        prepare=options.get("prepare_statements"),
+        max_rows=options.get("max_rows"),
+        max_bytes=options.get("max_bytes"),
+        workspace=query.workspace
+    )
+    failed = sum(1 for result in results if "error" in result)
+    
+    body = encode_response(
+        QueryBatchExecuteResponse,
+        query_id=query.id,
+        query_uuid=query.uuid,
+        query_name=query.name,
+        executed_at=datetime.utcnow(),
+        succeeded=len(results) - failed,
+        failed=failed,
+        results=results,
+        execution_time_ms=int((time.time() - started) * 1000)
     )
     
-    # Update last executed timestamp
     await query_crud.update_last_executed(db, query_id=query.id)
     
-    return QueryExecuteResponse(
+    body, headers = await compress_body(body, encoding)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.post("/execute/{query_id}/upload", response_model=QueryExecuteResponse)
+async def execute_query_with_upload(
+    query_id: UUID,
+    http_request: Request,
+    x_timeout_ms: Optional[int] = Header(None, alias="X-Timeout-Ms"),
+    db: AsyncSession = Depends(get_db)
+) -> Response:
+    """
+    Execute a published query with table parameters uploaded as files (no authentication required).
+    The multipart body has a ``params`` field with the JSON parameters and one
+    CSV or Arrow file per table parameter, named after the parameter.
+    """
+    query = await get_published_query(db, query_id)
+    form = await http_request.form()
+    
+    try:
+        params = json.loads(form.get("params") or "{}")
+    except ValueError:
+        params = None
+    if not isinstance(params, dict):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="The params field must be a JSON object"
+        )
+    
+    for name, value in form.multi_items():
+        if not isinstance(value, UploadFile):
+            continue
+        if ((query.params_info or {}).get(name) or {}).get("type") != "table":
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Uploaded file '{name}' does not match a table parameter of this query"
+            )
+        content = await value.read()
+        try:
+            params[name] = await asyncio.to_thread(parse_table_upload, content, value.filename, value.content_type)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid upload for parameter '{name}': {str(e)}"
+            )
+    
+    options = query.execution_options or {}
+    result = await query_executor.execute_query(
+        db,
+        sql_template=query.sql_template,
+        params=params,
+        params_info=query.params_info,
+        database_connection=query.workspace.database_connection,
+        timeout_ms=resolve_timeout_ms(options.get("timeout_ms"), x_timeout_ms),
+        is_disconnected=http_request.is_disconnected,
+        version_id=query.current_version_id,
+        prepare=options.get("prepare_statements"),
+        max_rows=options.get("max_rows"),
+        max_bytes=options.get("max_bytes"),
+        workspace=query.workspace
+    )
+    body = encode_response(
+        QueryExecuteResponse,
         query_id=query.id,
         query_uuid=query.uuid,
         query_name=query.name,
         **result
-    )
\ No newline at end of file
+    )
+    
+    await query_crud.update_last_executed(db, query_id=query.id)
+    
+    body, headers = await compress_body(body, encoding=negotiate(http_request.headers.get("Accept-Encoding")))
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.post("/execute/{query_id}/export")
+async def export_query(
+    query_id: UUID,
+    request: QueryExportRequest,
+    http_request: Request,
+    x_timeout_ms: Optional[int] = Header(None, alias="X-Timeout-Ms"),
+    db: AsyncSession = Depends(get_db)
+) -> StreamingResponse:
+    """
+    Export the full result of a published PostgreSQL query (no authentication required).
+    The database's COPY output (CSV with a header row, or COPY binary) is
+    streamed as is, without decoding rows.
+    """
+    query = await get_published_query(db, query_id)
+    
+    chunks = await query_executor.export_copy(
+        sql_template=query.sql_template,
+        params=request.params,
+        params_info=query.params_info,
+        database_connection=query.workspace.database_connection,
+        export_format=request.format,
+        timeout_ms=x_timeout_ms if x_timeout_ms and x_timeout_ms > 0 else None,
+        version_id=query.current_version_id,
+        workspace=query.workspace
+    )
+    
+    try:
+        await query_crud.update_last_executed(db, query_id=query.id)
+    except BaseException:
+        await chunks.aclose()
+        raise
+    
+    encoding = negotiate(http_request.headers.get("Accept-Encoding")) if request.format == "csv" else "identity"
+    headers = stream_headers(encoding)
+    extension = "csv" if request.format == "csv" else "bin"
+    headers["Content-Disposition"] = f'attachment; filename="{query.uuid}.{extension}"'
+    return StreamingResponse(
+        compress_async_stream(chunks, encoding),
+        media_type=MEDIA_TYPES[request.format],
+        headers=headers,
+        # Ends the export even if the client disconnects before the stream is read
+        background=BackgroundTask(chunks.aclose)
+    )
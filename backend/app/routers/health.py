@@ -2,6 +2,13 @@ from fastapi import APIRouter, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from app.core.database import get_db
+from app.services.circuit_breaker import circuit_breakers, CircuitState
+from app.services.cursor_sessions import cursor_sessions
+from app.services.execution_queue import execution_scheduler
+from app.services.prepared_statements import prepared_stats
+from app.services.replica_router import replica_router
+from app.services.response_cache import response_cache
+from app.services.result_cache import result_cache
 
 router = APIRouter()
 
@@ -9,10 +16,19 @@ router = APIRouter()
 @router.get("/health")
 async def health_check():
     """Health check endpoint."""
+    breakers = circuit_breakers.snapshot()
+    degraded = any(b["state"] != CircuitState.CLOSED.value for b in breakers)
     return {
-        "status": "healthy",
+        "status": "degraded" if degraded else "healthy",
         "service": "max_queryhub",
-        "version": "1.0.0"
+        "version": "1.0.0",
+        "circuit_breakers": breakers,
+        "replicas": replica_router.snapshot(),
+        "result_cache": result_cache.snapshot(),
+        "response_cache": response_cache.snapshot(),
+        "prepared_statements": prepared_stats.snapshot(),
+        "cursor_sessions": cursor_sessions.snapshot(),
+        "execution_queue": execution_scheduler.snapshot()
     }
 
 
@@ -0,0 +1,131 @@
+from uuid import UUID
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, Query as QueryParam
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.database import get_db
+from app.crud import query_crud
+from app.routers.execute import get_published_query
+from app.schemas import JobSubmitRequest, JobResponse, JobResultPage
+from app.schemas.job import JobStatus
+from app.services.compression import compress_body, compress_stream, negotiate, stream_headers
+from app.services.job_manager import job_manager
+from app.services.result_encoder import encode_response
+
+router = APIRouter(tags=["jobs"])
+
+
+def _get_job_status(job_id: str) -> dict:
+    try:
+        job_status = job_manager.get_status(job_id)
+    except ValueError:
+        job_status = None
+    if not job_status:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found or expired"
+        )
+    return job_status
+
+
+def _get_finished_job(job_id: str) -> dict:
+    job_status = _get_job_status(job_id)
+    if job_status["status"] == JobStatus.FAILED.value:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Job failed: {job_status['error']}"
+        )
+    if job_status["status"] != JobStatus.SUCCEEDED.value:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Job is {job_status['status']}, results are not ready"
+        )
+    return job_status
+
+
+@router.post("/execute/{query_id}/jobs", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def submit_job(
+    query_id: UUID,
+    request: JobSubmitRequest,
+    db: AsyncSession = Depends(get_db)
+) -> JobResponse:
+    """
+    Submit a published query for asynchronous execution (no authentication required).
+    Poll the returned job id for status and fetch results once it has succeeded.
+    """
+    query = await get_published_query(db, query_id)
+    
+    if not query.workspace.database_connection:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No database connection configured for this workspace"
+        )
+    
+    timeout_ms = (query.execution_options or {}).get("timeout_ms") or settings.JOB_DEFAULT_TIMEOUT_MS
+    job_status = await job_manager.submit(
+        query_id=query.id,
+        query_uuid=query.uuid,
+        query_name=query.name,
+        sql_template=query.sql_template,
+        version_id=query.current_version_id,
+        params=request.params,
+        params_info=query.params_info,
+        database_connection=query.workspace.database_connection,
+        timeout_ms=min(timeout_ms, settings.JOB_MAX_TIMEOUT_MS),
+        priority=request.priority,
+        max_rows=(query.execution_options or {}).get("max_rows"),
+        max_bytes=(query.execution_options or {}).get("max_bytes"),
+        workspace=query.workspace
+    )
+    
+    # Update last executed timestamp
+    await query_crud.update_last_executed(db, query_id=query.id)
+    
+    return JobResponse(**job_status)
+
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str) -> JobResponse:
+    """Get the status of an execution job."""
+    return JobResponse(**_get_job_status(job_id))
+
+
+@router.get("/jobs/{job_id}/result", response_model=JobResultPage)
+async def get_job_result(
+    job_id: str,
+    request: Request,
+    offset: int = QueryParam(0, ge=0),
+    limit: int = QueryParam(1000, ge=1, le=10000)
+) -> Response:
+    """Get one page of rows from a finished job."""
+    job_status = _get_finished_job(job_id)
+    
+    row_count = job_status["row_count"] or 0
+    data = job_manager.read_page(job_id, offset, limit) if offset < row_count else []
+    next_offset = offset + len(data)
+    
+    body, headers = await compress_body(
+        encode_response(
+            JobResultPage,
+            job_id=job_id,
+            offset=offset,
+            limit=limit,
+            row_count=row_count,
+            data=data,
+            next_offset=next_offset if next_offset < row_count else None
+        ),
+        negotiate(request.headers.get("Accept-Encoding"))
+    )
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.get("/jobs/{job_id}/result/stream")
+async def stream_job_result(job_id: str, request: Request) -> StreamingResponse:
+    """Stream all rows of a finished job as newline-delimited JSON."""
+    _get_finished_job(job_id)
+    encoding = negotiate(request.headers.get("Accept-Encoding"))
+    return StreamingResponse(
+        compress_stream(job_manager.iter_rows(job_id), encoding),
+        media_type="application/x-ndjson",
+        headers=stream_headers(encoding)
+    )
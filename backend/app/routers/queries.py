@@ -1,15 +1,19 @@
 from typing import List
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException, status, Query as QueryParam
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, Query as QueryParam
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.database import get_db
 from app.core.security import get_current_user
 from app.crud import workspace_crud, query_crud
 from app.schemas import (
     QueryCreate, QueryResponse, QueryListResponse,
-    QueryStatusUpdate, QueryExecuteRequest, QueryExecuteResponse
+    QueryStatusUpdate, QueryExecuteRequest, QueryExecuteResponse,
+    QueryExecutionOptions
 )
 from app.services import QueryExecutorService
+from app.services.compression import compress_body, negotiate
+from app.services.execution_control import resolve_timeout_ms
+from app.services.result_encoder import encode_response
 from app.models.query import QueryStatus
 
 router = APIRouter(tags=["queries"])
@@ -238,13 +242,59 @@ async def update_query_status(
     return QueryResponse(**response_dict)
 
 
+@router.put("/queries/{query_id}/execution-options", response_model=QueryResponse)
+async def update_query_execution_options(
+    query_id: UUID,
+    options_in: QueryExecutionOptions,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+) -> QueryResponse:
+    """Replace the execution options (deadline etc.) of a query."""
+    query = await query_crud.get_by_uuid(db, uuid=query_id)
+    if not query:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Query not found"
+        )
+    
+    # Check workspace access
+    has_access = await workspace_crud.has_access(
+        db,
+        workspace_id=query.workspace_id,
+        user_id=current_user["user_id"],
+        user_groups=current_user.get("groups", [])
+    )
+    
+    if not has_access:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied to this query"
+        )
+    
+    updated_query = await query_crud.update_execution_options(
+        db,
+        query_id=query.id,
+        execution_options=options_in.model_dump(exclude_none=True)
+    )
+    
+    # Get workspace to include UUID
+    workspace = await workspace_crud.get(db, id=updated_query.workspace_id)
+    
+    # Add workspace UUID to response
+    response = QueryResponse.model_validate(updated_query)
+    response_dict = response.model_dump()
+    response_dict['workspace_uuid'] = workspace.uuid if workspace else None
+    return QueryResponse(**response_dict)
+
+
 @router.post("/internal/execute/{query_id}", response_model=QueryExecuteResponse)
 async def execute_query_internal(
     query_id: UUID,
     request: QueryExecuteRequest,
+    http_request: Request,
     db: AsyncSession = Depends(get_db),
     current_user: dict = Depends(get_current_user)
-) -> QueryExecuteResponse:
+) -> Response:
     """Execute a query internally (for testing in UI)."""
     import logging
     logger = logging.getLogger(__name__)
@@ -315,7 +365,19 @@ async def execute_query_internal(
             sql_template=query.sql_template,
             params=request.params,
             params_info=query.params_info,
-            database_connection=query.workspace.database_connection
+            database_connection=query.workspace.database_connection,
+            timeout_ms=resolve_timeout_ms((query.execution_options or {}).get("timeout_ms")),
+            is_disconnected=http_request.is_disconnected,
+            version_id=query.current_version_id,
+            page_size=request.page_size,
+            cursor=request.cursor,
+            order_key=(query.execution_options or {}).get("order_key"),
+            fields=request.fields,
+            filters=[f.model_dump() for f in request.filters] if request.filters else None,
+            output_columns=(query.execution_options or {}).get("output_columns"),
+            max_rows=(query.execution_options or {}).get("max_rows"),
+            max_bytes=(query.execution_options or {}).get("max_bytes"),
+            workspace=query.workspace
         )
         
         logger.info(f"Query executed successfully, row_count={result.get('row_count', 0)}")
@@ -323,12 +385,17 @@ async def execute_query_internal(
         # Update last executed timestamp using integer ID
         await query_crud.update_last_executed(db, query_id=query.id)
         
-        return QueryExecuteResponse(
-            query_id=query.id,
-            query_uuid=query.uuid,
-            query_name=query.name,
-            **result
+        body, headers = await compress_body(
+            encode_response(
+                QueryExecuteResponse,
+                query_id=query.id,
+                query_uuid=query.uuid,
+                query_name=query.name,
+                **result
+            ),
+            negotiate(http_request.headers.get("Accept-Encoding"))
         )
+        return Response(content=body, media_type="application/json", headers=headers)
     
     except HTTPException:
         # Re-raise HTTP exceptions
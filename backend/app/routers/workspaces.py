@@ -5,7 +5,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.database import get_db
 from app.core.security import get_current_user, require_admin
 from app.crud import workspace_crud
-from app.schemas import WorkspaceCreate, WorkspaceResponse, WorkspaceListResponse
+from app.schemas import WorkspaceCreate, WorkspaceUpdate, WorkspaceResponse, WorkspaceListResponse
 from app.models.workspace import WorkspaceType
 
 router = APIRouter(prefix="/workspaces", tags=["workspaces"])
@@ -36,6 +36,7 @@ async def get_workspaces(
             "type": ws.type,
             "owner_id": ws.owner_id,
             "auto_close_days": ws.auto_close_days,
+            "execution_weight": ws.execution_weight,
             "database_connection_id": ws.database_connection_id,
             "database_connection_name": ws.database_connection.name if ws.database_connection else None,
             "created_at": ws.created_at,
@@ -68,6 +69,7 @@ async def create_workspace(
         type=workspace.type,
         owner_id=workspace.owner_id,
         auto_close_days=workspace.auto_close_days,
+        execution_weight=workspace.execution_weight,
         database_connection_id=workspace.database_connection_id,
         database_connection_name=workspace.database_connection.name if workspace.database_connection else None,
         created_at=workspace.created_at,
@@ -111,9 +113,44 @@ async def get_workspace(
         type=workspace.type,
         owner_id=workspace.owner_id,
         auto_close_days=workspace.auto_close_days,
+        execution_weight=workspace.execution_weight,
         database_connection_id=workspace.database_connection_id,
         database_connection_name=workspace.database_connection.name if workspace.database_connection else None,
         created_at=workspace.created_at,
         query_count=len(workspace.queries) if workspace.queries else 0,
         uuid=workspace.uuid
-    )
\ No newline at end of file
+    )
+
+
+@router.put("/{workspace_id}", response_model=WorkspaceResponse)
+async def update_workspace(
+    workspace_id: UUID,
+    workspace_in: WorkspaceUpdate,
+    db: AsyncSession = Depends(get_db),
+    current_user: dict = Depends(require_admin)
+) -> WorkspaceResponse:
+    """Update a workspace (admin only)."""
+    workspace = await workspace_crud.get_by_uuid(db, uuid=workspace_id)
+    if not workspace:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Workspace not found"
+        )
+    
+    await workspace_crud.update(db, db_obj=workspace, obj_in=workspace_in)
+    # Relationships cannot be lazy-loaded outside the session's greenlet
+    workspace = await workspace_crud.get_by_uuid_with_details(db, uuid=workspace_id)
+    
+    return WorkspaceResponse(
+        id=workspace.id,
+        name=workspace.name,
+        type=workspace.type,
+        owner_id=workspace.owner_id,
+        auto_close_days=workspace.auto_close_days,
+        execution_weight=workspace.execution_weight,
+        database_connection_id=workspace.database_connection_id,
+        database_connection_name=workspace.database_connection.name if workspace.database_connection else None,
+        created_at=workspace.created_at,
+        query_count=len(workspace.queries) if workspace.queries else 0,
+        uuid=workspace.uuid
+    )
@@ -11,13 +11,26 @@ from app.schemas.query import (
     QueryListResponse,
     QueryStatusUpdate,
     QueryExecuteRequest,
-    QueryExecuteResponse
+    QueryFilter,
+    QueryExecuteResponse,
+    QueryExecutionOptions,
+    QueryBatchExecuteRequest,
+    QueryBatchItemResult,
+    QueryBatchExecuteResponse,
+    QueryBundleItem,
+    QueryBundleRequest,
+    QueryExportRequest
 )
 from app.schemas.permission import (
     PermissionCreate,
     PermissionResponse,
     PermissionBulkCreate
 )
+from app.schemas.job import (
+    JobSubmitRequest,
+    JobResponse,
+    JobResultPage
+)
 
 __all__ = [
     "WorkspaceCreate",
@@ -30,8 +43,19 @@ __all__ = [
     "QueryListResponse",
     "QueryStatusUpdate",
     "QueryExecuteRequest",
+    "QueryFilter",
     "QueryExecuteResponse",
+    "QueryExecutionOptions",
+    "QueryBatchExecuteRequest",
+    "QueryBatchItemResult",
+    "QueryBatchExecuteResponse",
+    "QueryBundleItem",
+    "QueryBundleRequest",
+    "QueryExportRequest",
     "PermissionCreate",
     "PermissionResponse",
-    "PermissionBulkCreate"
+    "PermissionBulkCreate",
+    "JobSubmitRequest",
+    "JobResponse",
+    "JobResultPage"
 ]
\ No newline at end of file
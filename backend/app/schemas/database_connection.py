@@ -1,8 +1,15 @@
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from uuid import UUID
 from pydantic import BaseModel, Field, field_validator
-from app.models.database_connection import DatabaseType
+from app.models.database_connection import DatabaseType, EndpointRole
+
+
+class DatabaseEndpoint(BaseModel):
+    host: str = Field(..., min_length=1, max_length=255)
+    port: int = Field(..., gt=0, le=65535)
+    weight: int = Field(1, ge=0, le=100)  # 0 keeps the endpoint out of rotation
+    role: EndpointRole = EndpointRole.REPLICA
 
 
 class DatabaseConnectionBase(BaseModel):
@@ -13,6 +20,7 @@ class DatabaseConnectionBase(BaseModel):
     database_name: str = Field(..., min_length=1, max_length=100)
     username: str = Field(..., min_length=0, max_length=100)  # Changed min_length=1 to min_length=0 for SQLite
     additional_params: Optional[Dict[str, Any]] = None
+    endpoints: Optional[List[DatabaseEndpoint]] = None
     is_active: bool = True
 
 
@@ -44,6 +52,7 @@ class DatabaseConnectionUpdate(BaseModel):
     username: Optional[str] = Field(None, min_length=0, max_length=100)  # Changed min_length=1 to min_length=0 for SQLite
     password: Optional[str] = Field(None, min_length=0)  # 평문 비밀번호 (min_length=0 for SQLite)
     additional_params: Optional[Dict[str, Any]] = None
+    endpoints: Optional[List[DatabaseEndpoint]] = None
     is_active: Optional[bool] = None
 
 
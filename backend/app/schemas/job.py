@@ -0,0 +1,44 @@
+from enum import Enum
+from datetime import datetime
+from typing import Optional, Dict, Any, List
+from uuid import UUID
+from pydantic import BaseModel, Field
+
+
+class JobStatus(str, Enum):
+    QUEUED = "QUEUED"
+    RUNNING = "RUNNING"
+    SUCCEEDED = "SUCCEEDED"
+    FAILED = "FAILED"
+
+
+class JobSubmitRequest(BaseModel):
+    params: Dict[str, Any] = Field(default_factory=dict)
+    priority: int = Field(5, ge=0, le=9)  # 0 runs first
+
+
+class JobResponse(BaseModel):
+    job_id: str
+    query_id: int
+    query_uuid: UUID
+    query_name: str
+    status: JobStatus
+    priority: int
+    submitted_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    expires_at: datetime
+    row_count: Optional[int] = None
+    columns: Optional[List[str]] = None
+    execution_time_ms: Optional[int] = None
+    truncated: Optional[bool] = None  # The result budget cut the result short
+    error: Optional[str] = None
+
+
+class JobResultPage(BaseModel):
+    job_id: str
+    offset: int
+    limit: int
+    row_count: int
+    data: List[Dict[str, Any]]
+    next_offset: Optional[int] = None
@@ -1,15 +1,62 @@
 from datetime import datetime
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Literal
 from uuid import UUID
-from pydantic import BaseModel, Field
+from apscheduler.triggers.cron import CronTrigger
+from pydantic import BaseModel, Field, field_validator
 from app.models.query import QueryStatus
 
 
+def _validate_cron(v: str) -> str:
+    try:
+        CronTrigger.from_crontab(v)
+    except ValueError as e:
+        raise ValueError(f"Invalid cron expression: {e}")
+    return v
+
+
+class QueryIncrementalRefresh(BaseModel):
+    watermark_column: str = Field(..., pattern=r"^[A-Za-z_][A-Za-z0-9_]*$")  # Monotonically increasing result column
+    key_columns: Optional[List[str]] = None  # Rows with the same key are replaced instead of appended
+    full_refresh_cron: str = "0 3 * * 0"  # Full rebuild cadence (weekly by default)
+    
+    @field_validator('full_refresh_cron')
+    def validate_full_refresh_cron(cls, v):
+        return _validate_cron(v)
+
+
+class QueryMaterialization(BaseModel):
+    cron: str = Field(..., min_length=1)  # crontab expression, e.g. "0 2 * * *"
+    param_sets: List[Dict[str, Any]] = Field(default_factory=lambda: [{}])  # Parameter sets to pre-execute
+    incremental: Optional[QueryIncrementalRefresh] = None  # Refresh by watermark on cron, rebuild on full_refresh_cron
+    
+    @field_validator('cron')
+    def validate_cron(cls, v):
+        return _validate_cron(v)
+
+
+class QueryExecutionOptions(BaseModel):
+    timeout_ms: Optional[int] = Field(None, gt=0)  # Deadline for one execution; capped by server settings
+    materialization: Optional[QueryMaterialization] = None  # Serve /execute from scheduled snapshots
+    cache_ttl_seconds: Optional[int] = Field(None, ge=1, le=86400)  # Reuse live results for this long
+    prepare_statements: Optional[bool] = None  # Reuse a server-side prepared statement; defaults to the server setting
+    order_key: Optional[List[str]] = None  # Unique ordering for keyset pages, e.g. ["created_at", "-id"]
+    output_columns: Optional[Dict[str, str]] = None  # Result column -> type; enables fields= and filters
+    max_rows: Optional[int] = Field(None, ge=1)  # Result budget; capped by RESULT_MAX_ROWS
+    max_bytes: Optional[int] = Field(None, ge=1)  # Estimated result size; capped by RESULT_MAX_BYTES
+    
+    @field_validator('output_columns')
+    def validate_output_columns(cls, v):
+        # Imported here: importing app.services loads the crud modules, which import these schemas
+        from app.services.projection import output_columns
+        return output_columns(v) or None
+
+
 class QueryBase(BaseModel):
     name: str = Field(..., min_length=1, max_length=100)
     description: Optional[str] = None
     sql_template: str = Field(..., min_length=1)
     params_info: Optional[Dict[str, Any]] = None
+    execution_options: Optional[QueryExecutionOptions] = None
 
 
 class QueryCreate(QueryBase):
@@ -21,6 +68,7 @@ class QueryUpdate(BaseModel):
     description: Optional[str] = None
     sql_template: Optional[str] = Field(None, min_length=1)
     params_info: Optional[Dict[str, Any]] = None
+    execution_options: Optional[QueryExecutionOptions] = None
 
 
 class QueryStatusUpdate(BaseModel):
@@ -49,9 +97,25 @@ class QueryListResponse(BaseModel):
     total: int
 
 
+class QueryFilter(BaseModel):
+    column: str  # One of the query's output_columns
+    op: Literal["eq", "in", "range"] = "eq"
+    value: Any = None  # eq; null matches NULL
+    values: Optional[List[Any]] = None  # in
+    gte: Any = None  # range bounds; set at least one
+    gt: Any = None
+    lte: Any = None
+    lt: Any = None
+
+
 class QueryExecuteRequest(BaseModel):
     params: Dict[str, Any] = Field(default_factory=dict)
     version_id: Optional[int] = None  # Optional version to execute
+    page_size: Optional[int] = Field(None, ge=1, le=10000)  # Return one page of this many rows
+    cursor: Optional[str] = None  # next_cursor of the previous page
+    fields: Optional[List[str]] = Field(None, min_length=1)  # Output columns to return
+    filters: Optional[List[QueryFilter]] = None  # Conditions on output columns, combined with AND
+    session: bool = False  # Keep the result open and return it in chunks of page_size rows
 
 
 class QueryExecuteResponse(BaseModel):
@@ -61,4 +125,48 @@ class QueryExecuteResponse(BaseModel):
     executed_at: datetime
     row_count: int
     data: List[Dict[str, Any]]
-    execution_time_ms: int
\ No newline at end of file
+    execution_time_ms: int
+    snapshot_at: Optional[datetime] = None  # Set when served from a materialized snapshot
+    next_cursor: Optional[str] = None  # Set when a paged request has more rows
+    truncated: bool = False  # The result budget cut the result short
+    session_token: Optional[str] = None  # Set while a cursor session has more rows
+
+
+class QueryBatchExecuteRequest(BaseModel):
+    param_sets: List[Dict[str, Any]] = Field(..., min_length=1)
+
+
+class QueryBatchItemResult(BaseModel):
+    index: int  # Position of the parameter set in the request
+    row_count: Optional[int] = None
+    columns: Optional[List[str]] = None
+    data: Optional[List[Dict[str, Any]]] = None
+    execution_time_ms: Optional[int] = None
+    truncated: Optional[bool] = None  # The batch's result budget cut this set short
+    error: Optional[str] = None  # Set instead of the result fields when this set failed
+    status_code: Optional[int] = None
+
+
+class QueryBatchExecuteResponse(BaseModel):
+    query_id: int
+    query_uuid: UUID
+    query_name: str
+    executed_at: datetime
+    succeeded: int
+    failed: int
+    results: List[QueryBatchItemResult]
+    execution_time_ms: int
+
+
+class QueryBundleItem(BaseModel):
+    query_id: UUID
+    params: Dict[str, Any] = Field(default_factory=dict)
+
+
+class QueryBundleRequest(BaseModel):
+    queries: List[QueryBundleItem] = Field(..., min_length=1)
+
+
+class QueryExportRequest(BaseModel):
+    params: Dict[str, Any] = Field(default_factory=dict)
+    format: Literal["csv", "binary"] = "csv"  # binary is PostgreSQL's COPY binary format
@@ -10,6 +10,7 @@ class WorkspaceBase(BaseModel):
     type: WorkspaceType
     auto_close_days: Optional[int] = Field(90, ge=1, le=365)
     database_connection_id: Optional[int] = None
+    execution_weight: int = Field(1, ge=1, le=100)  # Relative share of the database connection
 
 
 class WorkspaceCreate(WorkspaceBase):
@@ -20,6 +21,7 @@ class WorkspaceUpdate(BaseModel):
     name: Optional[str] = Field(None, min_length=1, max_length=100)
     auto_close_days: Optional[int] = Field(None, ge=1, le=365)
     database_connection_id: Optional[int] = None
+    execution_weight: Optional[int] = Field(None, ge=1, le=100)
 
 
 class WorkspaceResponse(WorkspaceBase):
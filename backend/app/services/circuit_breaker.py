@@ -0,0 +1,201 @@
+"""
+Circuit breakers for target database connections.
+
+Each DatabaseConnection gets its own breaker. While a target database is
+healthy the breaker stays CLOSED and only records outcomes. Once the failure
+rate (or slow call rate) over the sliding window crosses its threshold the
+breaker OPENs and every call fails fast without touching the driver. After the
+open period a limited number of probe calls are let through (HALF_OPEN); their
+outcome decides whether the breaker closes again or re-opens.
+"""
+import threading
+import time
+from collections import deque
+from enum import Enum
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+
+class CircuitState(str, Enum):
+    CLOSED = "CLOSED"
+    OPEN = "OPEN"
+    HALF_OPEN = "HALF_OPEN"
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the circuit is open."""
+
+    def __init__(self, name: str, retry_after: float):
+        self.name = name
+        self.retry_after = retry_after
+        super().__init__(f"Circuit for '{name}' is open, retry after {retry_after:.1f}s")
+
+
+class CircuitBreaker:
+    """Sliding-window circuit breaker with failure-rate and latency thresholds."""
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate_threshold: float = 0.5,
+        slow_call_rate_threshold: float = 1.0,
+        slow_call_duration_ms: int = 10000,
+        window_size: int = 20,
+        minimum_calls: int = 5,
+        open_duration_seconds: float = 30.0,
+        half_open_max_probes: int = 1
+    ):
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.slow_call_duration_ms = slow_call_duration_ms
+        self.minimum_calls = minimum_calls
+        self.open_duration_seconds = open_duration_seconds
+        self.half_open_max_probes = half_open_max_probes
+
+        self._lock = threading.Lock()
+        self._state = CircuitState.CLOSED
+        # Each entry is (failed, slow)
+        self._window: Deque[Tuple[bool, bool]] = deque(maxlen=window_size)
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self._rejected_count = 0
+        self._last_failure: Optional[str] = None
+
+    @property
+    def state(self) -> CircuitState:
+        return self._state
+
+    def allow_request(self) -> None:
+        """Admit a call or raise CircuitOpenError without blocking."""
+        with self._lock:
+            if self._state == CircuitState.CLOSED:
+                return
+
+            if self._state == CircuitState.OPEN:
+                remaining = self._opened_at + self.open_duration_seconds - time.monotonic()
+                if remaining > 0:
+                    self._rejected_count += 1
+                    raise CircuitOpenError(self.name, remaining)
+                self._transition(CircuitState.HALF_OPEN)
+
+            # HALF_OPEN: admit a bounded number of probe calls
+            if self._probes_in_flight >= self.half_open_max_probes:
+                self._rejected_count += 1
+                raise CircuitOpenError(self.name, self.open_duration_seconds)
+            self._probes_in_flight += 1
+
+    def record_success(self, duration_ms: float) -> None:
+        """Record a call that reached the database and completed."""
+        slow = duration_ms >= self.slow_call_duration_ms
+        with self._lock:
+            if self._state == CircuitState.HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if slow:
+                    self._trip()
+                    return
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_max_probes:
+                    self._transition(CircuitState.CLOSED)
+                return
+
+            self._window.append((False, slow))
+            self._evaluate()
+
+    def record_failure(self, duration_ms: float, error: Optional[str] = None) -> None:
+        """Record a call that failed because the database was unreachable."""
+        with self._lock:
+            self._last_failure = error
+            if self._state == CircuitState.HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                self._trip()
+                return
+
+            self._window.append((True, duration_ms >= self.slow_call_duration_ms))
+            self._evaluate()
+
+    def release(self) -> None:
+        """Release an admitted probe whose outcome says nothing about availability."""
+        with self._lock:
+            if self._state == CircuitState.HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def _evaluate(self) -> None:
+        calls = len(self._window)
+        if self._state != CircuitState.CLOSED or calls < self.minimum_calls:
+            return
+        failures = sum(1 for failed, _ in self._window if failed)
+        slow_calls = sum(1 for _, slow in self._window if slow)
+        if (failures / calls >= self.failure_rate_threshold
+                or slow_calls / calls >= self.slow_call_rate_threshold):
+            self._trip()
+
+    def _trip(self) -> None:
+        self._transition(CircuitState.OPEN)
+        self._opened_at = time.monotonic()
+
+    def _transition(self, state: CircuitState) -> None:
+        self._state = state
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        if state == CircuitState.CLOSED:
+            self._window.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return the breaker state for health reporting."""
+        with self._lock:
+            calls = len(self._window)
+            failures = sum(1 for failed, _ in self._window if failed)
+            slow_calls = sum(1 for _, slow in self._window if slow)
+            retry_after = None
+            if self._state == CircuitState.OPEN:
+                retry_after = max(
+                    0.0, self._opened_at + self.open_duration_seconds - time.monotonic()
+                )
+            return {
+                "name": self.name,
+                "state": self._state.value,
+                "window_calls": calls,
+                "failure_rate": round(failures / calls, 3) if calls else 0.0,
+                "slow_call_rate": round(slow_calls / calls, 3) if calls else 0.0,
+                "rejected_count": self._rejected_count,
+                "retry_after_seconds": round(retry_after, 1) if retry_after is not None else None,
+                "last_failure": self._last_failure
+            }
+
+
+class CircuitBreakerRegistry:
+    """Process-wide registry of circuit breakers keyed by connection id."""
+
+    def __init__(self):
+        self._breakers: Dict[Any, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Any, name: Optional[str] = None) -> CircuitBreaker:
+        breaker = self._breakers.get(key)
+        if breaker is not None:
+            return breaker
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                breaker = CircuitBreaker(
+                    name=name or str(key),
+                    failure_rate_threshold=settings.CIRCUIT_BREAKER_FAILURE_RATE,
+                    slow_call_rate_threshold=settings.CIRCUIT_BREAKER_SLOW_CALL_RATE,
+                    slow_call_duration_ms=settings.CIRCUIT_BREAKER_SLOW_CALL_MS,
+                    window_size=settings.CIRCUIT_BREAKER_WINDOW_SIZE,
+                    minimum_calls=settings.CIRCUIT_BREAKER_MIN_CALLS,
+                    open_duration_seconds=settings.CIRCUIT_BREAKER_OPEN_SECONDS,
+                    half_open_max_probes=settings.CIRCUIT_BREAKER_HALF_OPEN_PROBES
+                )
+                self._breakers[key] = breaker
+            return breaker
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        return [breaker.snapshot() for breaker in list(self._breakers.values())]
+
+
+# Shared by every QueryExecutorService instance in the worker
+circuit_breakers = CircuitBreakerRegistry()
@@ -0,0 +1,299 @@
+"""
+Columnar on-disk format for query results, read through a read-only mmap.
+
+Fixed-width column types (integers, floats, booleans, dates, datetimes) are
+stored as packed arrays with a one-byte validity flag per row. Strings and
+other values are dictionary-encoded: an int32 code per row pointing into a
+table of distinct values, stored as UTF-8 text (binary values as they are).
+Dictionary values are decoded per read, once for each distinct value in the
+row range, so readers hold no decoded copies. Every worker process that opens the same
+file maps the same pages, so a snapshot or cached result is shared through
+the page cache instead of being copied into each worker's heap, and a row
+range can be decoded without reading the rest of the file.
+
+Layout:
+
+    MAGIC (8 bytes) | header length (uint64 LE) | header JSON | buffers
+
+Buffer offsets in the header are relative to the first buffer, which starts
+at the next 8-byte boundary after the header. Each buffer is 8-byte aligned.
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import uuid
+from array import array
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+
+from app.services.result_encoder import to_jsonable
+
+MAGIC = b"MQHCOL01"
+ALIGN = 8
+INT64_MIN, INT64_MAX = -(2 ** 63), 2 ** 63 - 1
+EPOCH = datetime(1970, 1, 1)
+
+# Kinds stored through the dictionary, with their decoders from the stored bytes
+DICTIONARY_KINDS = {
+    "string": lambda v: v.decode("utf-8"),
+    "decimal": lambda v: Decimal(v.decode("ascii")),
+    "uuid": lambda v: uuid.UUID(v.decode("ascii")),
+    "json": json.loads,
+    "bytes": bytes
+}
+FIXED_KINDS = {
+    "int64": "q",
+    "float64": "d",
+    "bool": "b",
+    "date": "i",
+    "datetime": "q",
+    "datetime_utc": "q"
+}
+
+
+def _padding(length: int) -> int:
+    return (-length) % ALIGN
+
+
+def _infer_kind(values: List[Any]) -> str:
+    kinds = set()
+    for value in values:
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            kinds.add("bool")
+        elif isinstance(value, int):
+            kinds.add("int64" if INT64_MIN <= value <= INT64_MAX else "json")
+        elif isinstance(value, float):
+            kinds.add("float64")
+        elif isinstance(value, datetime):
+            kinds.add("datetime" if value.tzinfo is None else "datetime_utc")
+        elif isinstance(value, date):
+            kinds.add("date")
+        elif isinstance(value, str):
+            kinds.add("string")
+        elif isinstance(value, Decimal):
+            kinds.add("decimal")
+        elif isinstance(value, uuid.UUID):
+            kinds.add("uuid")
+        elif isinstance(value, (bytes, bytearray, memoryview)):
+            kinds.add("bytes")
+        else:
+            kinds.add("json")
+        if len(kinds) > 1 and not kinds <= {"int64", "float64"}:
+            # Mixed beyond ints and floats: nothing but json holds them
+            return "json"
+    if not kinds:
+        return "string"
+    if len(kinds) == 1:
+        return kinds.pop()
+    if kinds == {"int64", "float64"}:
+        return "float64"
+    return "json"
+
+
+def _encode_fixed(kind: str, values: List[Any]) -> Dict[str, bytes]:
+    validity = bytearray(len(values))
+    packed = array(FIXED_KINDS[kind])
+    for i, value in enumerate(values):
+        if value is None:
+            packed.append(0)
+            continue
+        validity[i] = 1
+        if kind == "date":
+            packed.append(value.toordinal())
+        elif kind == "datetime":
+            packed.append((value - EPOCH) // timedelta(microseconds=1))
+        elif kind == "datetime_utc":
+            packed.append((value.astimezone(timezone.utc).replace(tzinfo=None) - EPOCH) // timedelta(microseconds=1))
+        else:
+            packed.append(value)
+    return {"values": packed.tobytes(), "validity": bytes(validity)}
+
+
+def _encode_dictionary(kind: str, values: List[Any]) -> Dict[str, bytes]:
+    codes = array("i")
+    lookup: Dict[bytes, int] = {}
+    offsets = array("Q", [0])
+    blob = bytearray()
+    for value in values:
+        if value is None:
+            codes.append(-1)
+            continue
+        if kind == "bytes":
+            raw = bytes(value)
+        elif kind == "json":
+            # Encoded like live responses, so bytes inside values that are not UTF-8 become base64
+            raw = json.dumps(to_jsonable(value)).encode("utf-8")
+        else:
+            raw = str(value).encode("utf-8")
+        code = lookup.get(raw)
+        if code is None:
+            code = lookup[raw] = len(lookup)
+            blob += raw
+            offsets.append(len(blob))
+        codes.append(code)
+    return {"codes": codes.tobytes(), "dict_offsets": offsets.tobytes(), "dict_data": bytes(blob)}
+
+
+def write_columnar(
+    path: str,
+    columns: List[str],
+    rows: List[Dict[str, Any]],
+    metadata: Optional[Dict[str, Any]] = None
+) -> None:
+    """Write rows to a columnar file, replacing any existing file atomically."""
+    write_columns(path, columns, lambda name: [row.get(name) for row in rows], len(rows), metadata)
+
+
+def write_columns(
+    path: str,
+    columns: List[str],
+    column_values: Callable[[str], List[Any]],
+    row_count: int,
+    metadata: Optional[Dict[str, Any]] = None
+) -> None:
+    """Write a columnar file from the values of one column at a time, replacing any existing file atomically.
+
+    Only one column's values are needed at once, so a file can be rewritten
+    from another without decoding whole rows.
+    """
+    column_headers = []
+    buffers: List[bytes] = []
+    position = 0
+    for name in columns:
+        values = column_values(name)
+        kind = _infer_kind(values)
+        encoded = _encode_dictionary(kind, values) if kind in DICTIONARY_KINDS else _encode_fixed(kind, values)
+        locations = {}
+        for buffer_name, data in encoded.items():
+            locations[buffer_name] = [position, len(data)]
+            buffers.append(data + b"\0" * _padding(len(data)))
+            position += len(data) + _padding(len(data))
+        column_headers.append({"name": name, "kind": kind, "buffers": locations})
+
+    header = json.dumps(jsonable_encoder({
+        "row_count": row_count,
+        "byteorder": sys.byteorder,
+        "columns": column_headers,
+        "metadata": metadata or {}
+    })).encode("utf-8")
+
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header + b"\0" * _padding(len(header)))
+        for data in buffers:
+            f.write(data)
+    os.replace(tmp_path, path)
+
+
+class ColumnarReader:
+    """Read-only, memory-mapped view of a columnar result file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"Not a columnar result file: {path}")
+        (header_length,) = struct.unpack_from("<Q", self._mm, len(MAGIC))
+        header_start = len(MAGIC) + 8
+        header = json.loads(self._mm[header_start:header_start + header_length])
+        if header["byteorder"] != sys.byteorder:
+            raise ValueError(f"Columnar file {path} was written with {header['byteorder']} byte order")
+
+        self._data_start = header_start + header_length + _padding(header_length)
+        self._columns = {c["name"]: c for c in header["columns"]}
+        self.columns: List[str] = [c["name"] for c in header["columns"]]
+        self.row_count: int = header["row_count"]
+        self.metadata: Dict[str, Any] = header["metadata"]
+
+    def _buffer(self, column: Dict[str, Any], name: str, fmt: str) -> memoryview:
+        offset, length = column["buffers"][name]
+        start = self._data_start + offset
+        return memoryview(self._mm)[start:start + length].cast(fmt)
+
+    def _decode_dictionary(self, column: Dict[str, Any], codes: List[int]) -> List[Any]:
+        """Look up the values of dictionary codes, decoding each distinct one once."""
+        offsets = self._buffer(column, "dict_offsets", "Q")
+        data_offset, _ = column["buffers"]["dict_data"]
+        start = self._data_start + data_offset
+        decode = DICTIONARY_KINDS[column["kind"]]
+        decoded = {
+            code: decode(self._mm[start + offsets[code]:start + offsets[code + 1]])
+            for code in set(codes) if code >= 0
+        }
+        return [None if code < 0 else decoded[code] for code in codes]
+
+    def read_column(self, name: str, start: int = 0, stop: Optional[int] = None) -> List[Any]:
+        """Decode one column for rows [start, stop)."""
+        column = self._columns[name]
+        kind = column["kind"]
+        stop = self.row_count if stop is None else min(stop, self.row_count)
+        if start >= stop:
+            return []
+
+        if kind in DICTIONARY_KINDS:
+            return self._decode_dictionary(column, self._buffer(column, "codes", "i")[start:stop].tolist())
+
+        values = self._buffer(column, "values", FIXED_KINDS[kind])[start:stop].tolist()
+        validity = self._buffer(column, "validity", "B")[start:stop].tobytes()
+        if kind == "bool":
+            values = [bool(v) for v in values]
+        elif kind == "date":
+            values = [date.fromordinal(v) if valid else None for v, valid in zip(values, validity)]
+        elif kind == "datetime":
+            values = [EPOCH + timedelta(microseconds=v) if valid else None for v, valid in zip(values, validity)]
+        elif kind == "datetime_utc":
+            values = [
+                (EPOCH + timedelta(microseconds=v)).replace(tzinfo=timezone.utc) if valid else None
+                for v, valid in zip(values, validity)
+            ]
+        if b"\0" in validity:
+            values = [v if valid else None for v, valid in zip(values, validity)]
+        return values
+
+    def read_rows(self, start: int = 0, stop: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Decode rows [start, stop) as dicts, touching only the pages of that range."""
+        columns = [self.read_column(name, start, stop) for name in self.columns]
+        names = self.columns
+        return [dict(zip(names, values)) for values in zip(*columns)]
+
+    def iter_rows(self, chunk_size: int = 10000) -> Iterable[List[Dict[str, Any]]]:
+        """Yield all rows in chunks."""
+        for start in range(0, self.row_count, chunk_size):
+            yield self.read_rows(start, start + chunk_size)
+
+
+_readers: "OrderedDict[Tuple, ColumnarReader]" = OrderedDict()
+_readers_lock = threading.Lock()
+
+
+def open_columnar(path: str, cache_size: int = 128) -> ColumnarReader:
+    """Open a columnar file, reusing the mapping while the file is unchanged.
+
+    Files are replaced atomically, so a new inode means new content; readers
+    of the old mapping keep working until they drop their reference.
+    """
+    stat = os.stat(path)
+    key = (path, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    with _readers_lock:
+        reader = _readers.get(key)
+        if reader is not None:
+            _readers.move_to_end(key)
+            return reader
+    reader = ColumnarReader(path)
+    with _readers_lock:
+        _readers[key] = reader
+        while len(_readers) > cache_size:
+            _readers.popitem(last=False)
+    return reader
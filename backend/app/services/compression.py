@@ -0,0 +1,135 @@
+"""
+Content-Encoding negotiation and compression for result payloads.
+
+gzip is always available. zstd and brotli are used when the optional
+``zstandard`` and ``brotli`` packages are installed. Whole bodies below
+RESPONSE_COMPRESSION_MIN_BYTES go out uncompressed; streams are compressed
+chunk by chunk and flushed after each one, so clients can decode rows as they
+arrive.
+"""
+import asyncio
+import zlib
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, Iterator, Optional, Tuple
+
+from app.core.config import settings
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+IDENTITY = "identity"
+
+# Preferred first when the client accepts several with the same quality
+SUPPORTED_ENCODINGS = [
+    name for name, available in (("zstd", zstandard), ("br", brotli), ("gzip", True)) if available
+]
+
+
+def negotiate(accept_encoding: Optional[str]) -> str:
+    """Pick the best supported encoding from an Accept-Encoding header."""
+    if not accept_encoding or not settings.RESPONSE_COMPRESSION_ENABLED:
+        return IDENTITY
+    qualities: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        qualities[name.strip().lower()] = quality
+    wildcard = qualities.get("*", 0.0)
+    best, best_quality = IDENTITY, 0.0
+    for name in SUPPORTED_ENCODINGS:
+        quality = qualities.get(name, wildcard)
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+
+class _Compressor:
+    """Incremental compressor for one stream."""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "gzip":
+            self._obj = zlib.compressobj(settings.RESPONSE_COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+        elif encoding == "br":
+            self._obj = brotli.Compressor(quality=settings.RESPONSE_COMPRESSION_BROTLI_QUALITY)
+        elif encoding == "zstd":
+            self._obj = zstandard.ZstdCompressor(level=settings.RESPONSE_COMPRESSION_ZSTD_LEVEL).compressobj()
+        else:
+            raise ValueError(f"Unsupported encoding: {encoding}")
+
+    def compress(self, data: bytes) -> bytes:
+        """Compress a chunk and flush it so the client can decode it right away."""
+        if self.encoding == "gzip":
+            return self._obj.compress(data) + self._obj.flush(zlib.Z_SYNC_FLUSH)
+        if self.encoding == "br":
+            return self._obj.process(data) + self._obj.flush()
+        return self._obj.compress(data) + self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        if self.encoding == "gzip":
+            return self._obj.flush(zlib.Z_FINISH)
+        if self.encoding == "br":
+            return self._obj.finish()
+        return self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "gzip":
+        compressor = zlib.compressobj(settings.RESPONSE_COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+        return compressor.compress(body) + compressor.flush()
+    if encoding == "br":
+        return brotli.compress(body, quality=settings.RESPONSE_COMPRESSION_BROTLI_QUALITY)
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=settings.RESPONSE_COMPRESSION_ZSTD_LEVEL).compress(body)
+    return body
+
+
+async def compress_body(body: bytes, encoding: str) -> Tuple[bytes, Dict[str, str]]:
+    """Compress a complete body if it is worth it; returns the body and headers to send."""
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding == IDENTITY or len(body) < settings.RESPONSE_COMPRESSION_MIN_BYTES:
+        return body, headers
+    body = await asyncio.to_thread(compress, body, encoding)
+    headers["Content-Encoding"] = encoding
+    return body, headers
+
+
+def compress_stream(chunks: Iterable[bytes], encoding: str) -> Iterator[bytes]:
+    """Compress a stream chunk by chunk."""
+    if encoding == IDENTITY:
+        yield from chunks
+        return
+    compressor = _Compressor(encoding)
+    for chunk in chunks:
+        if chunk:
+            yield compressor.compress(chunk)
+    yield compressor.finish()
+
+
+async def compress_async_stream(chunks: AsyncIterable[bytes], encoding: str) -> AsyncIterator[bytes]:
+    """Compress an async stream chunk by chunk."""
+    compressor = None if encoding == IDENTITY else _Compressor(encoding)
+    async for chunk in chunks:
+        if chunk:
+            yield compressor.compress(chunk) if compressor else chunk
+    if compressor:
+        yield compressor.finish()
+
+
+def stream_headers(encoding: str) -> Dict[str, Any]:
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding != IDENTITY:
+        headers["Content-Encoding"] = encoding
+    return headers
@@ -0,0 +1,235 @@
+"""
+PostgreSQL COPY export.
+
+Large exports skip row-by-row fetching: the published SELECT is wrapped in
+``COPY (...) TO STDOUT`` and the server's CSV or binary output is passed to
+the HTTP response as raw bytes, without decoding a single row in Python.
+
+COPY cannot take bind parameters, so the values are inlined with psycopg2's
+own quoting (``cursor.mogrify``), the same escaping it applies to every
+parameterized query. The COPY runs in a thread of its own (not the default
+executor, which long exports would starve) and hands chunks over through a
+bounded pipe, so a slow client applies backpressure to the server instead of
+buffering the whole export in memory. The response reads the pipe on the
+event loop, and the whole export is bounded by its execution's deadline.
+"""
+import asyncio
+import queue
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.sql.elements import TextClause
+
+from app.core.config import settings
+from app.services.execution_control import ClientDisconnected, DeadlineExceeded, ExecutionContext
+from app.services.table_params import table_params
+
+EXPORT_FORMATS = ("csv", "binary")
+MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "binary": "application/octet-stream"}
+
+
+class CopyPipe:
+    """File-like sink for ``copy_expert`` that hands fixed-size chunks to a reader on the event loop."""
+
+    def __init__(
+        self,
+        context: ExecutionContext,
+        chunk_bytes: Optional[int] = None,
+        max_chunks: Optional[int] = None
+    ):
+        self._context = context
+        self._chunk_bytes = chunk_bytes or settings.EXPORT_CHUNK_BYTES
+        self._queue: "queue.Queue[bytes]" = queue.Queue(max_chunks or settings.EXPORT_MAX_BUFFERED_CHUNKS)
+        self._buffer = bytearray()
+        self._done = threading.Event()
+        self._loop = asyncio.get_running_loop()
+        self._ready = asyncio.Event()
+        self.error: Optional[BaseException] = None
+        self.closed = False
+
+    def write(self, data: Any) -> None:
+        # psycopg2 writes one CopyData message (usually one row) at a time
+        self._buffer += data
+        if len(self._buffer) >= self._chunk_bytes:
+            self._put(bytes(self._buffer))
+            self._buffer.clear()
+
+    def _put(self, chunk: bytes) -> None:
+        while not self.closed:
+            if self._context.expired():
+                # A client that stopped reading cannot hold the COPY open past the deadline
+                raise self._context.cancel_error()
+            try:
+                self._queue.put(chunk, timeout=0.1)
+                self._wake()
+                return
+            except queue.Full:
+                continue
+        # Aborts copy_expert once the reader has gone away
+        raise ClientDisconnected("client disconnected")
+
+    def _wake(self) -> None:
+        try:
+            self._loop.call_soon_threadsafe(self._ready.set)
+        except RuntimeError:
+            # The event loop is gone; nobody is reading any more
+            pass
+
+    @property
+    def finished(self) -> bool:
+        return self._done.is_set()
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        """Called by the writer when the COPY has ended, successfully or not."""
+        try:
+            if error is None and self._buffer:
+                self._put(bytes(self._buffer))
+        except ClientDisconnected:
+            pass
+        except DeadlineExceeded as e:
+            error = e
+        self.error = error
+        self._done.set()
+        self._wake()
+
+    async def get(self) -> Optional[bytes]:
+        """Next chunk, or None at the end of the export.
+
+        Waits on the event loop, not in a thread. Past the deadline the COPY
+        is cancelled and DeadlineExceeded raised.
+        """
+        while True:
+            self._ready.clear()
+            try:
+                return self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            if self._done.is_set():
+                # Everything the writer put is in the queue before it sets done
+                if not self._queue.empty():
+                    continue
+                if self.error is not None:
+                    raise self.error
+                return None
+            if self._context.expired():
+                self._context.cancel("deadline exceeded")
+                raise self._context.cancel_error()
+            try:
+                await asyncio.wait_for(self._ready.wait(), self._context.remaining_ms() / 1000)
+            except asyncio.TimeoutError:
+                pass
+
+    def close(self) -> None:
+        """Called by the reader when it stops consuming."""
+        self.closed = True
+
+
+class CopyStream:
+    """The chunks of a running export, as an async iterator.
+
+    The stream ends itself after the last chunk or the first error; aclose()
+    ends it early and cancels the COPY. on_close runs exactly once either way,
+    also for a stream that is never iterated, so the response can always end
+    it from a background task.
+    """
+
+    def __init__(
+        self,
+        pipe: CopyPipe,
+        context: ExecutionContext,
+        on_close: Callable[[Optional[BaseException]], None]
+    ):
+        self._pipe = pipe
+        self._context = context
+        self._on_close = on_close
+        self._pending: Optional[bytes] = None
+        self.closed = False
+
+    async def open(self) -> None:
+        """Wait for the first chunk, so that failures before any output raise here."""
+        self._pending = await self._next()
+
+    async def _next(self) -> Optional[bytes]:
+        try:
+            chunk = await self._pipe.get()
+        except BaseException as e:
+            self._close(e)
+            raise
+        if chunk is None:
+            self._close()
+        return chunk
+
+    def __aiter__(self) -> "CopyStream":
+        return self
+
+    async def __anext__(self) -> bytes:
+        chunk, self._pending = self._pending, None
+        if chunk is None and not self.closed:
+            chunk = await self._next()
+        if chunk is None:
+            raise StopAsyncIteration
+        return chunk
+
+    async def aclose(self) -> None:
+        self._close()
+
+    def _close(self, error: Optional[BaseException] = None) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        if not self._pipe.finished:
+            # The client went away before the end
+            self._pipe.close()
+            self._context.cancel("client disconnected")
+        self._on_close(error)
+
+
+def copy_sql(conn: Connection, statement: TextClause, params: Dict[str, Any], export_format: str) -> bytes:
+    """Render ``COPY (<statement with inlined values>) TO STDOUT`` for a psycopg2 connection."""
+    # render_postcompile expands IN lists into one bind per element
+    compiled = statement.params(**params).compile(
+        dialect=conn.dialect, compile_kwargs={"render_postcompile": True}
+    )
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        select = cursor.mogrify(compiled.string.strip().rstrip(";"), compiled.params or {})
+    finally:
+        cursor.close()
+    options = "FORMAT csv, HEADER" if export_format == "csv" else "FORMAT binary"
+    return b"COPY (" + select + b") TO STDOUT WITH (" + options.encode("ascii") + b")"
+
+
+def run_copy(
+    engine: Engine,
+    statement: TextClause,
+    params: Dict[str, Any],
+    export_format: str,
+    context: ExecutionContext,
+    pipe: CopyPipe
+) -> None:
+    """Run the COPY on a pooled connection, writing its output into the pipe (blocking)."""
+    handle = context.handle(engine)
+    error: Optional[BaseException] = None
+    try:
+        with engine.connect() as conn:
+            handle.attach(conn)
+            try:
+                with table_params(conn, statement, params) as (bound, values):
+                    sql = copy_sql(conn, bound, values, export_format)
+                    cursor = conn.connection.dbapi_connection.cursor()
+                    try:
+                        cursor.copy_expert(sql, pipe)
+                    finally:
+                        cursor.close()
+            except BaseException:
+                # An interrupted COPY leaves the session mid-protocol
+                conn.invalidate()
+                raise
+            finally:
+                handle.detach()
+    except BaseException as e:
+        error = context.cancel_error() if context.cancel_reason or context.expired() else e
+    finally:
+        context.release(handle)
+        pipe.finish(error)
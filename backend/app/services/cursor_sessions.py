@@ -0,0 +1,459 @@
+"""
+Server-side cursor sessions.
+
+A cursor session runs a query once and keeps its result on the server so a
+client can pull it in chunks across requests, for results too large for one
+response that cannot be paged by key.
+
+The worker that runs the query returns the first chunk and spools the rest
+of the result, segment by segment, into columnar files on disk, so any worker
+process on the host can serve the pulls:
+
+    <CURSOR_SESSION_DIR>/sessions/<token>/session.json  query, columns and slot
+    <CURSOR_SESSION_DIR>/sessions/<token>/spool.json    rows spooled so far, done, error
+    <CURSOR_SESSION_DIR>/sessions/<token>/read.json     rows pulled by the client
+    <CURSOR_SESSION_DIR>/sessions/<token>/<n>.mqc       segment n of the result
+    <CURSOR_SESSION_DIR>/slots/<connection_id>/<n>      token holding open-session slot n
+
+- The statement runs on a dedicated (unpooled) connection, with a server-side
+  cursor where the driver would otherwise buffer the whole result
+  (PostgreSQL, MySQL). Spooling pauses while CURSOR_SESSION_SPOOL_AHEAD_ROWS
+  rows wait for the client, so a slow reader holds neither the whole result
+  in memory nor on disk; pulled segments are deleted.
+- Each session is identified by an unguessable token and closed once its
+  result is exhausted, when the client closes it, or after
+  CURSOR_SESSION_IDLE_TTL_SECONDS without a pull.
+- Every database connection allows CURSOR_SESSION_MAX_PER_CONNECTION open
+  sessions (``max_cursor_sessions`` in its additional_params overrides it).
+  Slots are claimed as files, so the limit holds across the workers sharing
+  CURSOR_SESSION_DIR.
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+import secrets
+import shutil
+import threading
+import time
+from contextlib import ExitStack
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.engine import Connection, CursorResult
+
+from app.core.config import settings
+from app.models.database_connection import DatabaseConnection
+from app.services.columnar import ColumnarReader, write_columnar
+from app.services.execution_control import ClientDisconnected, ExecutionContext
+from app.services.fetch_pipeline import abandon_result
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r"^[A-Za-z0-9_-]{32}$")
+# Seconds between heartbeats of a paused spool, and without one before a spool counts as lost
+_HEARTBEAT_SECONDS = 1
+_SPOOL_LOST_SECONDS = 30
+
+
+class CursorSessionLimitError(Exception):
+    pass
+
+
+class CursorSessionNotFoundError(Exception):
+    pass
+
+
+class CursorSessionBusyError(Exception):
+    pass
+
+
+class CursorSessionFailedError(Exception):
+    pass
+
+
+class CursorSession:
+    """An open result on a dedicated connection, spooled by the worker that ran the query."""
+
+    def __init__(self, connection_id: int, query: Dict[str, Any]):
+        self.token = secrets.token_urlsafe(24)
+        self.connection_id = connection_id
+        # query_id, query_uuid and query_name of the executed query
+        self.query = query
+        self.slot: Optional[str] = None
+        self.conn: Optional[Connection] = None
+        self.result: Optional[CursorResult] = None
+        self.columns: List[str] = []
+        self.resources = ExitStack()
+        self.exhausted = False
+        self.closed = False
+        self.lock = threading.Lock()
+        self._lookahead: List[Any] = []
+
+    def fetch(self, size: int) -> Tuple[List[Dict[str, Any]], bool]:
+        """Next chunk of rows and whether the result is exhausted (blocking)."""
+        with self.lock:
+            if self.closed:
+                return [], True
+            raw = self._lookahead + list(self.result.fetchmany(size + 1 - len(self._lookahead)))
+            self._lookahead = raw[size:]
+            rows = [dict(zip(self.columns, row)) for row in raw[:size]]
+            self.exhausted = not self._lookahead
+            return rows, self.exhausted
+
+    def close(self) -> None:
+        """Release the cursor, any temp tables and the connection (blocking)."""
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            try:
+                if self.result is not None:
+                    if self.exhausted:
+                        self.result.close()
+                    else:
+                        abandon_result(self.conn, self.result)
+                self.resources.close()
+            except Exception as e:
+                logger.warning(f"Error closing cursor session: {str(e)}")
+            finally:
+                if self.conn is not None:
+                    self.conn.close()
+
+
+def _write_json(path: str, data: Dict[str, Any]) -> None:
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, default=str)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path: str) -> Dict[str, Any]:
+    with open(path) as f:
+        return json.load(f)
+
+
+class CursorSessionRegistry:
+    """Cursor sessions in CURSOR_SESSION_DIR, and the spools this worker runs for them."""
+
+    def __init__(self):
+        self._spools: Dict[str, asyncio.Task] = {}
+        self._reaper: Optional[asyncio.Task] = None
+
+    @property
+    def root(self) -> str:
+        return settings.CURSOR_SESSION_DIR
+
+    def _session_dir(self, token: str) -> str:
+        # Tokens come from the URL; reject anything that could escape the session dir
+        if not _TOKEN.match(token):
+            raise CursorSessionNotFoundError("Cursor session not found or expired")
+        return os.path.join(self.root, "sessions", token)
+
+    @staticmethod
+    def limit_for(db_conn: DatabaseConnection) -> int:
+        try:
+            params = json.loads(db_conn.additional_params or "{}") or {}
+        except ValueError:
+            params = {}
+        return int(params.get("max_cursor_sessions") or settings.CURSOR_SESSION_MAX_PER_CONNECTION)
+
+    def _slot_is_stale(self, path: str) -> bool:
+        try:
+            with open(path) as f:
+                token = f.read()
+        except OSError:
+            return False
+        # Session dirs are created before their slot, so a slot without one was left behind
+        return bool(token) and not os.path.isdir(os.path.join(self.root, "sessions", token))
+
+    def _claim_slot(self, connection_id: int, token: str, limit: int) -> Optional[str]:
+        slot_dir = os.path.join(self.root, "slots", str(connection_id))
+        os.makedirs(slot_dir, exist_ok=True)
+        for n in range(limit):
+            path = os.path.join(slot_dir, str(n))
+            for _ in range(2):
+                try:
+                    fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                except FileExistsError:
+                    if not self._slot_is_stale(path):
+                        break
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                    continue
+                with os.fdopen(fd, "w") as f:
+                    f.write(token)
+                return path
+        return None
+
+    def reserve(self, db_conn: DatabaseConnection, query: Dict[str, Any]) -> CursorSession:
+        """Claim a session slot on the database connection; raises CursorSessionLimitError when full."""
+        limit = self.limit_for(db_conn)
+        session = CursorSession(db_conn.id, query)
+        session_dir = self._session_dir(session.token)
+        os.makedirs(session_dir)
+        session.slot = self._claim_slot(db_conn.id, session.token, limit)
+        if session.slot is None:
+            shutil.rmtree(session_dir, ignore_errors=True)
+            raise CursorSessionLimitError(
+                f"Database connection already has {limit} open cursor sessions"
+            )
+        return session
+
+    def _remove(self, token: str) -> None:
+        session_dir = self._session_dir(token)
+        try:
+            slot = _read_json(os.path.join(session_dir, "session.json"))["slot"]
+        except (OSError, ValueError, KeyError):
+            slot = None
+        shutil.rmtree(session_dir, ignore_errors=True)
+        if slot:
+            try:
+                os.remove(slot)
+            except FileNotFoundError:
+                pass
+
+    async def discard(self, session: CursorSession) -> None:
+        """Close a session that never got to spooling, freeing its slot."""
+        await asyncio.to_thread(session.close)
+        shutil.rmtree(self._session_dir(session.token), ignore_errors=True)
+        if session.slot:
+            try:
+                os.remove(session.slot)
+            except FileNotFoundError:
+                pass
+
+    def start_spool(self, session: CursorSession) -> None:
+        """Publish an opened session and spool the rest of its result in the background."""
+        session_dir = self._session_dir(session.token)
+        _write_json(os.path.join(session_dir, "session.json"), {
+            "query": session.query,
+            "columns": session.columns,
+            "connection_id": session.connection_id,
+            "slot": session.slot,
+            "segment_rows": settings.CURSOR_SESSION_SEGMENT_ROWS
+        })
+        _write_json(os.path.join(session_dir, "read.json"), {"rows": 0})
+        _write_json(os.path.join(session_dir, "spool.json"), {"rows": 0, "done": False, "heartbeat": time.time()})
+        task = asyncio.create_task(self._spool(session))
+        self._spools[session.token] = task
+        task.add_done_callback(lambda _: self._spools.pop(session.token, None))
+
+    async def _spool(self, session: CursorSession) -> None:
+        session_dir = self._session_dir(session.token)
+        spool_path = os.path.join(session_dir, "spool.json")
+        segment_rows = settings.CURSOR_SESSION_SEGMENT_ROWS
+        spooled = segments = 0
+        done = False
+        heartbeat = time.time()
+        try:
+            while not done:
+                delivered = _read_json(os.path.join(session_dir, "read.json"))["rows"]
+                if spooled - delivered >= settings.CURSOR_SESSION_SPOOL_AHEAD_ROWS:
+                    # Wait for the client to catch up, telling the readers this worker is still here
+                    if time.time() - heartbeat >= _HEARTBEAT_SECONDS:
+                        heartbeat = time.time()
+                        _write_json(spool_path, {"rows": spooled, "done": False, "heartbeat": heartbeat})
+                    await asyncio.sleep(settings.CURSOR_SESSION_POLL_MS / 1000)
+                    continue
+                rows, done = await asyncio.to_thread(session.fetch, segment_rows)
+                if rows:
+                    path = os.path.join(session_dir, f"{segments}.mqc")
+                    await asyncio.to_thread(write_columnar, path, session.columns, rows)
+                    segments += 1
+                    spooled += len(rows)
+                heartbeat = time.time()
+                _write_json(spool_path, {"rows": spooled, "done": done, "heartbeat": heartbeat})
+        except FileNotFoundError:
+            # Closed or expired while spooling
+            pass
+        except asyncio.CancelledError:
+            if os.path.isdir(session_dir):
+                self._fail(spool_path, spooled, "The server shut down before the result was read")
+            raise
+        except Exception as e:
+            logger.error(f"Cursor session spool failed: {str(e)}")
+            self._fail(spool_path, spooled, f"Query execution error: {str(e)}")
+        finally:
+            await asyncio.to_thread(session.close)
+
+    @staticmethod
+    def _fail(spool_path: str, spooled: int, error: str) -> None:
+        try:
+            _write_json(spool_path, {"rows": spooled, "done": True, "error": error, "heartbeat": time.time()})
+        except OSError:
+            pass
+
+    @staticmethod
+    def _read_spooled(session_dir: str, segment_rows: int, start: int, count: int) -> List[Dict[str, Any]]:
+        """Rows [start, start + count) of the spooled result (blocking)."""
+        rows: List[Dict[str, Any]] = []
+        position, stop = start, start + count
+        while position < stop:
+            segment = position // segment_rows
+            offset = segment * segment_rows
+            reader = ColumnarReader(os.path.join(session_dir, f"{segment}.mqc"))
+            chunk = reader.read_rows(position - offset, stop - offset)
+            if not chunk:
+                break
+            rows.extend(chunk)
+            position += len(chunk)
+        # Segments before the read position are no longer needed
+        for segment in range(start // segment_rows, position // segment_rows):
+            try:
+                os.remove(os.path.join(session_dir, f"{segment}.mqc"))
+            except FileNotFoundError:
+                pass
+        return rows
+
+    def _lock(self, session_dir: str) -> str:
+        """Claim the right to read a session; raises CursorSessionBusyError while another pull holds it."""
+        path = os.path.join(session_dir, "reading")
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            raise CursorSessionBusyError("Cursor session is already being read")
+        except FileNotFoundError:
+            raise CursorSessionNotFoundError("Cursor session not found or expired")
+        return path
+
+    async def pull(
+        self,
+        token: str,
+        size: int,
+        context: ExecutionContext,
+        is_disconnected=None
+    ) -> Tuple[Dict[str, Any], List[str], List[Dict[str, Any]], bool]:
+        """
+        Next chunk of a session: (query, columns, rows, exhausted). Waits for
+        the spool to catch up within the context's deadline; the session
+        closes after its last chunk or when its query failed.
+        """
+        session_dir = self._session_dir(token)
+        lock = self._lock(session_dir)
+        try:
+            info = _read_json(os.path.join(session_dir, "session.json"))
+            read_path = os.path.join(session_dir, "read.json")
+            delivered = _read_json(read_path)["rows"]
+            while True:
+                spool = _read_json(os.path.join(session_dir, "spool.json"))
+                if spool.get("error"):
+                    raise CursorSessionFailedError(spool["error"])
+                available = spool["rows"] - delivered
+                # A paused spool waits for this pull, so a chunk larger than the lookahead comes out short
+                if available >= min(size, settings.CURSOR_SESSION_SPOOL_AHEAD_ROWS) or spool["done"]:
+                    break
+                if time.time() - spool["heartbeat"] > _SPOOL_LOST_SECONDS:
+                    raise CursorSessionFailedError("The server reading the result went away")
+                if context.expired():
+                    raise context.cancel_error()
+                if is_disconnected and await is_disconnected():
+                    raise ClientDisconnected("client disconnected")
+                await asyncio.sleep(settings.CURSOR_SESSION_POLL_MS / 1000)
+            rows = await asyncio.to_thread(
+                self._read_spooled, session_dir, info["segment_rows"], delivered, min(size, available)
+            )
+            delivered += len(rows)
+            exhausted = spool["done"] and delivered >= spool["rows"]
+            _write_json(read_path, {"rows": delivered})
+        except CursorSessionFailedError:
+            self._remove(token)
+            raise
+        except FileNotFoundError:
+            raise CursorSessionNotFoundError("Cursor session not found or expired")
+        finally:
+            try:
+                os.remove(lock)
+            except FileNotFoundError:
+                pass
+        if exhausted:
+            self._remove(token)
+        return info["query"], info["columns"], rows, exhausted
+
+    async def close(self, token: str) -> None:
+        """Close a session before its result is exhausted; the spooling worker stops at its next segment."""
+        session_dir = self._session_dir(token)
+        if not os.path.isfile(os.path.join(session_dir, "session.json")):
+            raise CursorSessionNotFoundError("Cursor session not found or expired")
+        self._lock(session_dir)
+        self._remove(token)
+
+    def reap(self) -> int:
+        """Close sessions idle for longer than the TTL, or whose spool was lost. Returns how many were closed."""
+        sessions_dir = os.path.join(self.root, "sessions")
+        if not os.path.isdir(sessions_dir):
+            return 0
+        now = time.time()
+        closed = 0
+        for token in os.listdir(sessions_dir):
+            session_dir = os.path.join(sessions_dir, token)
+            try:
+                # Pulls rewrite read.json, and a pull in progress holds the reading lock
+                last_used = max(
+                    os.path.getmtime(os.path.join(session_dir, name))
+                    for name in ("read.json", "reading") if os.path.exists(os.path.join(session_dir, name))
+                )
+            except (OSError, ValueError):
+                # Still opening, or removed meanwhile; fall back to the directory age
+                try:
+                    last_used = os.path.getmtime(session_dir)
+                except OSError:
+                    continue
+            if now - last_used > settings.CURSOR_SESSION_IDLE_TTL_SECONDS:
+                logger.info("Closing idle cursor session")
+                self._remove(token)
+                closed += 1
+        # Slots whose session was removed without them
+        slots_dir = os.path.join(self.root, "slots")
+        if os.path.isdir(slots_dir):
+            for connection_id in os.listdir(slots_dir):
+                for n in os.listdir(os.path.join(slots_dir, connection_id)):
+                    path = os.path.join(slots_dir, connection_id, n)
+                    if self._slot_is_stale(path):
+                        try:
+                            os.remove(path)
+                        except FileNotFoundError:
+                            pass
+        return closed
+
+    async def _reap_loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.CURSOR_SESSION_REAP_INTERVAL_SECONDS)
+            try:
+                await asyncio.to_thread(self.reap)
+            except Exception as e:
+                logger.error(f"Cursor session cleanup failed: {str(e)}")
+
+    def start(self) -> None:
+        os.makedirs(os.path.join(self.root, "sessions"), exist_ok=True)
+        self._reaper = asyncio.create_task(self._reap_loop())
+
+    async def shutdown(self) -> None:
+        if self._reaper is not None:
+            self._reaper.cancel()
+            await asyncio.gather(self._reaper, return_exceptions=True)
+            self._reaper = None
+        spools = list(self._spools.values())
+        for task in spools:
+            task.cancel()
+        await asyncio.gather(*spools, return_exceptions=True)
+
+    def snapshot(self) -> Dict[str, Any]:
+        sessions_dir = os.path.join(self.root, "sessions")
+        slots_dir = os.path.join(self.root, "slots")
+        per_connection = {}
+        if os.path.isdir(slots_dir):
+            for connection_id in os.listdir(slots_dir):
+                count = len(os.listdir(os.path.join(slots_dir, connection_id)))
+                if count:
+                    per_connection[connection_id] = count
+        return {
+            "open": len(os.listdir(sessions_dir)) if os.path.isdir(sessions_dir) else 0,
+            "spooling": len(self._spools),
+            "per_connection": per_connection
+        }
+
+
+cursor_sessions = CursorSessionRegistry()
@@ -0,0 +1,77 @@
+"""
+Classification of target database errors.
+
+Circuit breakers and replica health must only react to errors that say the
+database could not be reached or could not take the work, never to errors in
+the statement itself. The exception class does not tell them apart: SQLite
+and PyMySQL raise unknown columns, syntax errors and lock timeouts as
+OperationalError, just like a refused connection. So errors are classified by
+what SQLAlchemy learned about the connection (``connection_invalidated``) and
+by the driver's own error codes.
+"""
+import socket
+from typing import Any, Optional
+
+from sqlalchemy.exc import DBAPIError, DisconnectionError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+# PostgreSQL SQLSTATEs: connection exceptions (class 08), too many connections,
+# server shutting down or starting up
+_PG_CODES = {"53300", "57P01", "57P02", "57P03"}
+# MySQL: can't connect, server gone away, lost connection, too many connections
+_MYSQL_CODES = {1040, 1053, 2002, 2003, 2005, 2006, 2013, 2055}
+# ODBC SQLSTATEs: connection failures and connection timeout
+_ODBC_STATES = {"08001", "08004", "08S01", "HYT01"}
+# Oracle: end-of-file on channel, not connected, listener and network errors,
+# instance starting up or shutting down
+_ORACLE_CODES = {1033, 1034, 1089, 3113, 3114, 3135, 12170, 12514, 12537, 12541, 12543, 12547}
+# SQLite: I/O error, database file cannot be opened
+_SQLITE_CODES = {10, 14}
+
+
+def _driver_code(error: BaseException) -> Optional[Any]:
+    """The driver's error code or SQLSTATE, if it reports one."""
+    pgcode = getattr(error, "pgcode", None)
+    if pgcode is not None or type(error).__module__.startswith("psycopg2"):
+        return ("postgresql", pgcode)
+    sqlite_code = getattr(error, "sqlite_errorcode", None)
+    if sqlite_code is not None:
+        # Extended result codes carry the primary code in the low byte
+        return ("sqlite", sqlite_code & 0xFF)
+    args = getattr(error, "args", ())
+    module = type(error).__module__
+    if module.startswith("pymysql") and args and isinstance(args[0], int):
+        return ("mysql", args[0])
+    if module.startswith("pyodbc") and args and isinstance(args[0], str):
+        return ("odbc", args[0])
+    if module.startswith("cx_Oracle") and args and hasattr(args[0], "code"):
+        return ("oracle", args[0].code)
+    return None
+
+
+def is_availability_error(error: BaseException) -> bool:
+    """Whether an error means the database was unreachable or unable to serve, not that the statement failed."""
+    if isinstance(error, (PoolTimeoutError, DisconnectionError)):
+        return True
+    if isinstance(error, DBAPIError):
+        if error.connection_invalidated:
+            return True
+        error = error.orig
+    if isinstance(error, (ConnectionError, socket.timeout, socket.gaierror)):
+        return True
+    code = _driver_code(error)
+    if code is None:
+        return False
+    dialect, value = code
+    if dialect == "postgresql":
+        if value is None:
+            # psycopg2 reports no SQLSTATE when the connection itself failed
+            return type(error).__name__ in ("OperationalError", "InterfaceError")
+        return value.startswith("08") or value in _PG_CODES
+    if dialect == "mysql":
+        return value in _MYSQL_CODES
+    if dialect == "odbc":
+        return value in _ODBC_STATES
+    if dialect == "oracle":
+        return value in _ORACLE_CODES
+    return value in _SQLITE_CODES
@@ -0,0 +1,211 @@
+"""
+Deadlines and server-side cancellation for statements on target databases.
+
+Every execution gets an ExecutionContext carrying its deadline. Each attempt
+on a pooled connection registers a StatementHandle, which applies the
+dialect's statement timeout before the query runs and knows how to cancel the
+running statement from another thread when the deadline passes or the client
+goes away.
+"""
+import math
+import threading
+import time
+from typing import Any, List, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Connection, Engine
+
+from app.core.config import settings
+
+
+class ExecutionCancelled(Exception):
+    """Raised when a statement was cancelled before it finished."""
+
+    def __init__(self, reason: str):
+        self.reason = reason
+        super().__init__(reason)
+
+
+class DeadlineExceeded(ExecutionCancelled):
+    pass
+
+
+class ClientDisconnected(ExecutionCancelled):
+    pass
+
+
+def resolve_timeout_ms(query_timeout_ms: Optional[int], client_timeout_ms: Optional[int] = None) -> int:
+    """Combine the query's configured deadline with the client's X-Timeout-Ms cap."""
+    timeout_ms = query_timeout_ms or settings.QUERY_DEFAULT_TIMEOUT_MS
+    if client_timeout_ms and client_timeout_ms > 0:
+        timeout_ms = min(timeout_ms, client_timeout_ms)
+    return max(1, min(timeout_ms, settings.QUERY_MAX_TIMEOUT_MS))
+
+
+def _track_cursor(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info["active_cursor"] = cursor
+
+
+def install_cursor_tracking(engine: Engine) -> None:
+    """Remember the DBAPI cursor of the running statement so it can be cancelled."""
+    if not event.contains(engine, "before_cursor_execute", _track_cursor):
+        event.listen(engine, "before_cursor_execute", _track_cursor)
+
+
+class StatementHandle:
+    """One in-flight statement on one pooled connection."""
+
+    def __init__(self, context: "ExecutionContext", engine: Engine):
+        self.context = context
+        self.engine = engine
+        self.dialect = engine.dialect.name
+        self._lock = threading.Lock()
+        self._conn: Optional[Connection] = None
+        self._dbapi_conn: Any = None
+        self._timeout_applied = False
+
+    def attach(self, conn: Connection, apply_timeout: bool = True) -> None:
+        """Bind to a checked-out connection and apply the statement timeout.
+
+        Without apply_timeout the deadline is only enforced by cancel(), for
+        connections whose next statements must not inherit it.
+        """
+        with self._lock:
+            if self.context.cancel_reason:
+                raise self.context.cancel_error()
+            self._conn = conn
+            self._dbapi_conn = conn.connection.dbapi_connection
+        if apply_timeout:
+            self._apply_timeout(self.context.remaining_ms())
+
+    def detach(self) -> None:
+        """Clear the statement timeout before the connection goes back to the pool."""
+        with self._lock:
+            conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        conn.info.pop("active_cursor", None)
+        if self._timeout_applied and not conn.invalidated:
+            try:
+                self._clear_timeout(conn)
+            except Exception:
+                # A connection we cannot reset must not be reused
+                conn.invalidate()
+
+    def _apply_timeout(self, timeout_ms: int) -> None:
+        conn = self._conn
+        dbapi_conn = self._dbapi_conn
+        if self.dialect == "postgresql":
+            # SET LOCAL lasts until the transaction ends when the connection is returned
+            conn.execute(text(f"SET LOCAL statement_timeout = {int(timeout_ms)}"))
+        elif self.dialect == "mysql":
+            try:
+                conn.execute(text(f"SET SESSION max_execution_time = {int(timeout_ms)}"))
+            except Exception:
+                # MariaDB and MySQL < 5.7.8 lack the variable; KILL QUERY still enforces the deadline
+                return
+        elif self.dialect == "mssql":
+            dbapi_conn.timeout = max(1, math.ceil(timeout_ms / 1000))
+        elif self.dialect == "oracle":
+            dbapi_conn.call_timeout = int(timeout_ms)
+        elif self.dialect == "sqlite":
+            deadline = self.context.deadline
+            dbapi_conn.set_progress_handler(lambda: int(time.monotonic() >= deadline), 10000)
+        else:
+            return
+        self._timeout_applied = True
+
+    def _clear_timeout(self, conn: Connection) -> None:
+        dbapi_conn = self._dbapi_conn
+        if self.dialect == "mysql":
+            conn.execute(text("SET SESSION max_execution_time = DEFAULT"))
+        elif self.dialect == "mssql":
+            dbapi_conn.timeout = 0
+        elif self.dialect == "oracle":
+            dbapi_conn.call_timeout = 0
+        elif self.dialect == "sqlite":
+            dbapi_conn.set_progress_handler(None, 0)
+
+    def cancel(self) -> None:
+        """Ask the database to abort the running statement (called from another thread)."""
+        with self._lock:
+            conn = self._conn
+            dbapi_conn = self._dbapi_conn
+        if conn is None:
+            return
+        try:
+            if self.dialect in ("postgresql", "oracle"):
+                dbapi_conn.cancel()
+            elif self.dialect == "sqlite":
+                dbapi_conn.interrupt()
+            elif self.dialect == "mssql":
+                cursor = conn.info.get("active_cursor")
+                if cursor is not None:
+                    cursor.cancel()
+            elif self.dialect == "mysql":
+                # KILL QUERY has to be issued from a different session
+                with self.engine.connect() as killer:
+                    killer.execute(text(f"KILL QUERY {int(dbapi_conn.thread_id())}"))
+        except Exception:
+            # The statement may have just finished; the deadline still applies server-side
+            pass
+
+
+class ExecutionContext:
+    """Deadline and cancellation state shared by all attempts of one execution."""
+
+    def __init__(self, timeout_ms: int, deadline: Optional[float] = None):
+        self.timeout_ms = timeout_ms
+        self.deadline = deadline or time.monotonic() + timeout_ms / 1000
+        self.cancel_reason: Optional[str] = None
+        self._handles: List[StatementHandle] = []
+        self._children: List["ExecutionContext"] = []
+        self._lock = threading.Lock()
+
+    def child(self) -> "ExecutionContext":
+        """Create a context for one attempt that can be cancelled on its own."""
+        child = ExecutionContext(self.timeout_ms, self.deadline)
+        with self._lock:
+            self._children.append(child)
+            if self.cancel_reason:
+                child.cancel_reason = self.cancel_reason
+        return child
+
+    def remaining_ms(self) -> int:
+        return max(1, int((self.deadline - time.monotonic()) * 1000))
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.deadline
+
+    def handle(self, engine: Engine) -> StatementHandle:
+        handle = StatementHandle(self, engine)
+        with self._lock:
+            self._handles.append(handle)
+        return handle
+
+    def release(self, handle: StatementHandle) -> None:
+        with self._lock:
+            if handle in self._handles:
+                self._handles.remove(handle)
+
+    def cancel(self, reason: str) -> None:
+        """Cancel every statement still running for this execution."""
+        with self._lock:
+            if self.cancel_reason is None:
+                self.cancel_reason = reason
+            handles = list(self._handles)
+            children = list(self._children)
+        for handle in handles:
+            handle.cancel()
+        for child in children:
+            child.cancel(reason)
+
+    def cancel_error(self) -> ExecutionCancelled:
+        if self.cancel_reason == "client disconnected":
+            return ClientDisconnected(self.cancel_reason)
+        return DeadlineExceeded(f"Query exceeded its deadline of {self.timeout_ms} ms")
+
+    def check_cancelled(self) -> None:
+        """Translate a driver error into the cancellation that caused it, if any."""
+        if self.cancel_reason or self.expired():
+            raise self.cancel_error()
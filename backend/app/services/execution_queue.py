@@ -0,0 +1,251 @@
+"""
+Weighted fair queuing of executions across workspaces.
+
+Workspaces that share a database connection share its capacity. Each database
+connection runs at most EXECUTION_QUEUE_MAX_CONCURRENT executions at a time
+(``max_concurrent_executions`` in its additional_params overrides it); further
+executions wait in one queue per workspace.
+
+Queues live in each worker process and are not coordinated between them: the
+capacity is split evenly across the WEB_CONCURRENCY workers (at least one
+execution each), and fairness holds among the executions that land on the
+same worker. With requests spread evenly over the workers, that approximates
+the same shares across the host.
+
+When capacity frees up, the workspace with the lowest virtual clock goes next
+(start-time fair queuing). Every execution advances its workspace's clock by
+its cost divided by the workspace's execution_weight, so while several
+workspaces have work queued, a workspace with weight 3 gets three times the
+share of one with weight 1. A workspace that was idle starts again at the
+current virtual time, leaving its share to the others instead of saving it up;
+workspaces that are idle and not ahead of the virtual time are forgotten.
+
+The cost of an execution is how long it held its slots. That is only known
+once it finishes, so the clock is advanced by the workspace's recent average
+when the execution starts and corrected when it finishes: a workspace running
+long batch jobs falls behind one running short interactive queries.
+
+Queue waits count against the execution's deadline.
+"""
+import asyncio
+import json
+import math
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional
+
+from app.core.config import settings
+from app.models.database_connection import DatabaseConnection
+from app.models.workspace import Workspace
+from app.services.execution_control import DeadlineExceeded
+
+# Waits kept per workspace for the reported statistics
+_RECENT_WAITS = 256
+# Weight of the latest execution in a workspace's average cost
+_COST_SMOOTHING = 0.2
+
+
+class ExecutionQueueFullError(Exception):
+    pass
+
+
+class _Flow:
+    """The queue and virtual clock of one workspace on one database connection."""
+
+    def __init__(self, weight: int):
+        self.weight = weight
+        self.waiters: Deque["_Waiter"] = deque()
+        self.finish = 0.0
+        self.cost = settings.EXECUTION_QUEUE_DEFAULT_COST_MS / 1000
+        self.running = 0
+        self.dispatched = 0
+        self.waits: Deque[float] = deque(maxlen=_RECENT_WAITS)
+
+
+class _Waiter:
+    __slots__ = ("flow", "units", "estimate", "enqueued", "future")
+
+    def __init__(self, flow: _Flow, units: int):
+        self.flow = flow
+        self.units = units
+        self.estimate = 0.0
+        self.enqueued = time.monotonic()
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+
+class _ConnectionQueue:
+    """Capacity of one database connection and the workspace queues waiting for it."""
+
+    def __init__(self, capacity: int, on_idle: Callable[[], None]):
+        self.capacity = capacity
+        self.in_use = 0
+        self.virtual_time = 0.0
+        self.flows: Dict[Optional[int], _Flow] = {}
+        self._on_idle = on_idle
+
+    def dispatch(self) -> None:
+        while True:
+            heads = [flow for flow in self.flows.values() if flow.waiters]
+            if not heads:
+                return
+            flow = min(heads, key=lambda f: f.finish)
+            waiter = flow.waiters[0]
+            if waiter.future.done():
+                # Gave up waiting
+                flow.waiters.popleft()
+                continue
+            if self.in_use + waiter.units > self.capacity:
+                return
+            flow.waiters.popleft()
+            self.in_use += waiter.units
+            self.virtual_time = max(self.virtual_time, flow.finish)
+            waiter.estimate = flow.cost
+            flow.finish += waiter.estimate * waiter.units / flow.weight
+            flow.running += 1
+            flow.dispatched += 1
+            flow.waits.append(time.monotonic() - waiter.enqueued)
+            waiter.future.set_result(None)
+
+    def prune(self) -> None:
+        """Forget idle workspaces that have no unused share, and the whole queue once nothing runs."""
+        idle = self.in_use == 0
+        for workspace_id, flow in list(self.flows.items()):
+            if flow.waiters or flow.running:
+                idle = False
+            elif flow.finish <= self.virtual_time:
+                # Would restart at the virtual time anyway
+                del self.flows[workspace_id]
+        if idle:
+            # Nothing waits or runs: every workspace starts afresh
+            self.flows.clear()
+            self._on_idle()
+
+
+class ExecutionSlot:
+    """Capacity held by one running execution; release() hands it to the next queued one."""
+
+    def __init__(self, queue: _ConnectionQueue, waiter: _Waiter):
+        self._queue = queue
+        self._waiter = waiter
+        self._started = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        if self._released:
+            return
+        self._released = True
+        waiter, flow = self._waiter, self._waiter.flow
+        cost = time.monotonic() - self._started
+        # Charge the actual cost instead of the estimate it started with
+        flow.finish += (cost - waiter.estimate) * waiter.units / flow.weight
+        flow.cost += _COST_SMOOTHING * (cost - flow.cost)
+        flow.running -= 1
+        self._queue.in_use -= waiter.units
+        self._queue.dispatch()
+        self._queue.prune()
+
+
+class ExecutionScheduler:
+    """Per database connection execution queues of this worker."""
+
+    def __init__(self):
+        self._queues: Dict[int, _ConnectionQueue] = {}
+
+    @staticmethod
+    def capacity_for(db_conn: DatabaseConnection) -> int:
+        """This worker's share of the database connection's capacity."""
+        try:
+            params = json.loads(db_conn.additional_params or "{}") or {}
+        except ValueError:
+            params = {}
+        capacity = int(params.get("max_concurrent_executions") or settings.EXECUTION_QUEUE_MAX_CONCURRENT)
+        return max(1, math.ceil(capacity / max(1, settings.WEB_CONCURRENCY)))
+
+    def _remove_idle_queue(self, connection_id: int) -> None:
+        queue = self._queues.get(connection_id)
+        if queue is not None and not queue.in_use and not queue.flows:
+            del self._queues[connection_id]
+
+    async def acquire(
+        self,
+        db_conn: DatabaseConnection,
+        workspace: Optional[Workspace],
+        timeout_ms: int,
+        units: int = 1
+    ) -> ExecutionSlot:
+        """
+        Wait for ``units`` execution slots on the database connection.
+        Raises ExecutionQueueFullError when the workspace already has
+        EXECUTION_QUEUE_MAX_DEPTH executions queued, and DeadlineExceeded when
+        no slot frees up within timeout_ms.
+        """
+        capacity = self.capacity_for(db_conn)
+        queue = self._queues.get(db_conn.id)
+        if queue is None:
+            connection_id = db_conn.id
+            queue = self._queues[connection_id] = _ConnectionQueue(
+                capacity, lambda: self._remove_idle_queue(connection_id)
+            )
+        queue.capacity = capacity
+        workspace_id = workspace.id if workspace is not None else None
+        weight = max(1, (workspace.execution_weight if workspace is not None else None) or 1)
+        flow = queue.flows.get(workspace_id)
+        if flow is None:
+            flow = queue.flows[workspace_id] = _Flow(weight)
+        flow.weight = weight
+        if len(flow.waiters) >= settings.EXECUTION_QUEUE_MAX_DEPTH:
+            raise ExecutionQueueFullError(
+                f"Workspace already has {len(flow.waiters)} executions queued on this database connection"
+            )
+
+        if not flow.waiters:
+            # A workspace coming back from idle starts at the current virtual time
+            flow.finish = max(flow.finish, queue.virtual_time)
+        waiter = _Waiter(flow, min(units, queue.capacity))
+        flow.waiters.append(waiter)
+        queue.dispatch()
+
+        if not waiter.future.done():
+            try:
+                await asyncio.wait_for(waiter.future, timeout_ms / 1000)
+            except BaseException as e:
+                if waiter.future.cancelled():
+                    if waiter in flow.waiters:
+                        flow.waiters.remove(waiter)
+                    queue.dispatch()
+                    queue.prune()
+                else:
+                    # Granted just as the caller gave up
+                    ExecutionSlot(queue, waiter).release()
+                if isinstance(e, asyncio.TimeoutError):
+                    raise DeadlineExceeded(
+                        f"Query exceeded its deadline of {timeout_ms} ms waiting in the execution queue"
+                    )
+                raise
+        return ExecutionSlot(queue, waiter)
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        connections = {}
+        for connection_id, queue in self._queues.items():
+            workspaces = {}
+            for workspace_id, flow in queue.flows.items():
+                waits = sorted(flow.waits)
+                workspaces[str(workspace_id)] = {
+                    "weight": flow.weight,
+                    "queued": len(flow.waiters),
+                    "running": flow.running,
+                    "dispatched": flow.dispatched,
+                    "oldest_wait_ms": int((now - flow.waiters[0].enqueued) * 1000) if flow.waiters else 0,
+                    "wait_ms_avg": int(sum(waits) / len(waits) * 1000) if waits else 0,
+                    "wait_ms_p95": int(waits[int(len(waits) * 0.95)] * 1000) if waits else 0
+                }
+            connections[str(connection_id)] = {
+                "capacity": queue.capacity,
+                "in_use": queue.in_use,
+                "workspaces": workspaces
+            }
+        return connections
+
+
+execution_scheduler = ExecutionScheduler()
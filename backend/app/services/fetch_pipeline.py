@@ -0,0 +1,217 @@
+"""
+Chunked fetching of result rows.
+
+Rows are pulled with ``fetchmany`` in chunks of the connection's array size
+instead of one ``fetchall``:
+
+- cx_Oracle and pyodbc fetch ``arraysize`` rows per round trip (cx_Oracle
+  also prefetches ``prefetchrows`` with the execute), instead of their small
+  defaults.
+- psycopg2 and pymysql would otherwise buffer the whole result client-side
+  before the first row is returned; they use server-side cursors
+  (``stream_results``) so memory stays at one chunk.
+
+While the driver waits on the network for the next chunk, the previous one is
+turned into row dicts on a helper thread, so fetching and row building
+overlap.
+
+Sizes default to FETCH_ARRAY_SIZE / FETCH_PREFETCH_ROWS and can be set per
+database connection in its additional_params:
+
+    {"fetch_array_size": 5000, "prefetch_rows": 5001, "stream_results": true}
+
+Every fetch is held to a ResultBudget of rows and (estimated) bytes. The
+budget is checked after each chunk; once it is spent, fetching stops, the
+rest of the result is abandoned on the server and the result is marked
+truncated, so one execution never holds more than the budget plus one chunk.
+Drivers that buffer the whole result on execute (stream_results off) have
+already received it by then; the budget still bounds the rows built from it.
+"""
+import json
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Connection, Engine
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Dialects whose default cursors buffer the complete result on execute
+STREAMING_DIALECTS = ("postgresql", "mysql")
+
+# Result size estimates look at one row in this many
+_SAMPLE_EVERY = 16
+
+_converter = ThreadPoolExecutor(max_workers=settings.FETCH_CONVERT_WORKERS, thread_name_prefix="fetch-convert")
+
+
+class FetchOptions:
+    """Fetch tuning for one database connection."""
+
+    def __init__(self, array_size: int, prefetch_rows: Optional[int], stream_results: bool):
+        self.array_size = array_size
+        self.prefetch_rows = prefetch_rows
+        self.stream_results = stream_results
+
+    def execution_options(self, dialect: str) -> Dict[str, Any]:
+        if self.stream_results and dialect in STREAMING_DIALECTS:
+            return {"stream_results": True, "max_row_buffer": self.array_size}
+        return {}
+
+
+def fetch_options(additional_params: Optional[str]) -> FetchOptions:
+    """Read fetch tuning from a database connection's additional_params JSON."""
+    params: Dict[str, Any] = {}
+    if additional_params:
+        try:
+            params = json.loads(additional_params) or {}
+        except ValueError:
+            logger.warning("Ignoring additional_params that are not valid JSON")
+    array_size = int(params.get("fetch_array_size") or settings.FETCH_ARRAY_SIZE)
+    prefetch_rows = params.get("prefetch_rows", settings.FETCH_PREFETCH_ROWS)
+    return FetchOptions(
+        array_size=max(1, array_size),
+        # One more than the array size lets cx_Oracle detect the end without another round trip
+        prefetch_rows=array_size + 1 if prefetch_rows is None else int(prefetch_rows),
+        stream_results=bool(params.get("stream_results", settings.FETCH_STREAM_RESULTS))
+    )
+
+
+class ResultBudget:
+    """Row and byte limits for the result of one execution; can be shared by the sets of a batch."""
+
+    def __init__(self, max_rows: Optional[int] = None, max_bytes: Optional[int] = None):
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.rows = 0
+        self.bytes = 0
+        self.truncated = False
+        self._lock = threading.Lock()
+
+    def take(self, rows: List[Dict[str, Any]], size: int) -> List[Dict[str, Any]]:
+        """Account for a chunk of about ``size`` bytes; returns the rows that still fit."""
+        with self._lock:
+            if self.truncated:
+                return []
+            keep = len(rows)
+            if self.max_rows is not None and self.rows + keep > self.max_rows:
+                keep = self.max_rows - self.rows
+                self.truncated = True
+            if self.max_bytes is not None and self.bytes + size > self.max_bytes:
+                # Only the chunk that crosses the limit is measured row by row
+                size = 0
+                for i in range(keep):
+                    row_size = _row_bytes(rows[i].values())
+                    if self.bytes + size + row_size > self.max_bytes:
+                        keep = i
+                        self.truncated = True
+                        break
+                    size += row_size
+            self.rows += keep
+            self.bytes += size
+            return rows if keep == len(rows) else rows[:keep]
+
+
+def result_budget(max_rows: Optional[int] = None, max_bytes: Optional[int] = None) -> ResultBudget:
+    """A query's own limits, capped by RESULT_MAX_ROWS / RESULT_MAX_BYTES."""
+    return ResultBudget(
+        min(max_rows or settings.RESULT_MAX_ROWS, settings.RESULT_MAX_ROWS),
+        min(max_bytes or settings.RESULT_MAX_BYTES, settings.RESULT_MAX_BYTES)
+    )
+
+
+def abandon_result(conn: Connection, result: Any) -> None:
+    """Stop a partially fetched result without reading the rest of it."""
+    try:
+        if conn.dialect.name == "mysql" and result.context.execution_options.get("stream_results"):
+            # An unbuffered pymysql cursor would read every remaining row on close
+            conn.invalidate()
+            return
+        if conn.dialect.name == "mssql":
+            result.cursor.cancel()
+        result.close()
+    except Exception:
+        # A session with a half-read result must not be reused
+        conn.invalidate()
+
+
+def install_fetch_tuning(engine: Engine, options: FetchOptions) -> None:
+    """Apply the array size (and cx_Oracle prefetch) to every cursor of an engine."""
+
+    def tune_cursor(conn, cursor, statement, parameters, context, executemany) -> None:
+        if executemany:
+            return
+        try:
+            cursor.arraysize = options.array_size
+            if hasattr(cursor, "prefetchrows"):
+                cursor.prefetchrows = options.prefetch_rows
+            if hasattr(cursor, "itersize"):
+                # psycopg2 named (server-side) cursor
+                cursor.itersize = options.array_size
+        except Exception:
+            pass
+
+    event.listen(engine, "before_cursor_execute", tune_cursor)
+
+
+def _row_bytes(row: Iterable[Any]) -> int:
+    # Rough size of the row once encoded: text by its length, everything else as a number
+    return sum(len(value) + 8 if isinstance(value, (str, bytes)) else 16 for value in row)
+
+
+def _chunk_bytes(chunk: Sequence[Sequence[Any]]) -> int:
+    # Extrapolated from every _SAMPLE_EVERY-th row, to keep the estimate off the fetch path
+    sample = chunk[::_SAMPLE_EVERY]
+    return sum(_row_bytes(row) for row in sample) * len(chunk) // len(sample)
+
+
+def _convert(
+    columns: List[str],
+    chunk: Sequence[Sequence[Any]],
+    sized: bool
+) -> Tuple[List[Dict[str, Any]], int]:
+    return [dict(zip(columns, row)) for row in chunk], _chunk_bytes(chunk) if sized else 0
+
+
+def fetch_rows(
+    fetchmany: Callable[[int], Sequence[Sequence[Any]]],
+    columns: List[str],
+    array_size: int,
+    overlap: bool = True,
+    budget: Optional[ResultBudget] = None
+) -> List[Dict[str, Any]]:
+    """Fetch rows in chunks, building the dicts of one chunk while the next is fetched.
+
+    Without overlap (drivers that fetch in-process and hold the GIL, like
+    sqlite3) chunks are converted inline. Fetching stops early once the
+    budget is spent; the caller abandons the rest of the result.
+    """
+    rows: List[Dict[str, Any]] = []
+    sized = budget is not None and budget.max_bytes is not None
+
+    def accept(converted: Tuple[List[Dict[str, Any]], int]) -> bool:
+        chunk_rows, size = converted
+        rows.extend(chunk_rows if budget is None else budget.take(chunk_rows, size))
+        return budget is None or not budget.truncated
+
+    pending: Optional[Future] = None
+    while True:
+        chunk = fetchmany(array_size)
+        if pending is not None:
+            more = accept(pending.result())
+            pending = None
+            if not more:
+                break
+        if not chunk:
+            break
+        if not overlap or len(chunk) < array_size:
+            # A short chunk is most likely the last one; not worth a thread hop
+            if not accept(_convert(columns, chunk, sized)):
+                break
+        else:
+            pending = _converter.submit(_convert, columns, chunk, sized)
+    return rows
@@ -0,0 +1,324 @@
+"""
+Asynchronous execution jobs for long-running published queries.
+
+Jobs are queued by priority and run on a bounded pool of worker tasks so that
+long analytical queries cannot crowd out interactive /execute traffic. Job
+state and results live on local disk, one directory per job, so any worker
+process on the host can answer status polls and serve result pages:
+
+    <JOB_RESULT_DIR>/<job_id>/status.json   job metadata and state
+    <JOB_RESULT_DIR>/<job_id>/rows.mqc      result rows in the columnar format
+
+Result pages are decoded straight from the memory-mapped columns, so serving
+page N does not read or parse the rows before it.
+
+The queue and its JOB_WORKERS workers live in each worker process: a job
+runs in the process that accepted it, and a host runs up to JOB_WORKERS x
+WEB_CONCURRENCY jobs at once. Queued jobs are not persisted. Each process
+holds a lock file under ``<JOB_RESULT_DIR>/.owners`` while it runs, and
+stamps its jobs with it; queued or running jobs whose process has stopped
+(its lock is free) are marked failed when any process starts and by the
+periodic cleanup, so they do not stay QUEUED forever.
+"""
+import asyncio
+import fcntl
+import itertools
+import json
+import logging
+import os
+import shutil
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.models.database_connection import DatabaseConnection
+from app.models.workspace import Workspace
+from app.schemas.job import JobStatus
+from app.services.columnar import open_columnar, write_columnar
+from app.services.query_executor import QueryExecutorService
+from app.services.result_encoder import encode_ndjson
+
+logger = logging.getLogger(__name__)
+
+INTERRUPTED_ERROR = "The server process running this job stopped before it finished; submit the job again"
+
+
+class JobManager:
+    """Priority queue of execution jobs served by a fixed number of workers."""
+
+    def __init__(self, result_dir: str, workers: int, ttl_seconds: int):
+        self.result_dir = result_dir
+        self.worker_count = workers
+        self.ttl_seconds = ttl_seconds
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._workers: List[asyncio.Task] = []
+        self._sequence = itertools.count()
+        self._executor = QueryExecutorService()
+        self._owner = uuid.uuid4().hex
+        self._owner_lock: Optional[Any] = None
+
+    def _job_dir(self, job_id: str) -> str:
+        # Job ids are generated here; reject anything that could escape the result dir
+        if not job_id.isalnum():
+            raise ValueError("Invalid job id")
+        return os.path.join(self.result_dir, job_id)
+
+    def _write_status(self, job_id: str, status: Dict[str, Any]) -> None:
+        path = os.path.join(self._job_dir(job_id), "status.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(status, f, default=str)
+        os.replace(tmp_path, path)
+
+    def get_status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Read job metadata; returns None for unknown or expired jobs."""
+        try:
+            with open(os.path.join(self._job_dir(job_id), "status.json")) as f:
+                status = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if datetime.fromisoformat(status["expires_at"]) < datetime.utcnow():
+            return None
+        return status
+
+    def _owner_path(self, owner: str) -> str:
+        if not owner.isalnum():
+            raise ValueError("Invalid job owner")
+        return os.path.join(self.result_dir, ".owners", f"{owner}.lock")
+
+    def _owner_alive(self, owner: Optional[str]) -> bool:
+        """Whether the process that stamped a job still holds its lock."""
+        if owner == self._owner:
+            return self._owner_lock is not None
+        try:
+            lock_file = open(self._owner_path(owner or ""), "r+")
+        except (OSError, ValueError):
+            return False
+        with lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return True
+            # Nobody holds it any more; the owner is gone for good
+            try:
+                os.remove(lock_file.name)
+            except OSError:
+                pass
+            return False
+
+    def _finish_interrupted(self, status: Dict[str, Any]) -> None:
+        status.update({
+            "status": JobStatus.FAILED.value,
+            "error": INTERRUPTED_ERROR,
+            "finished_at": datetime.utcnow().isoformat()
+        })
+        self._write_status(status["job_id"], status)
+
+    def fail_orphaned(self) -> int:
+        """Mark queued and running jobs of stopped processes as failed. Returns how many."""
+        failed = 0
+        if not os.path.isdir(self.result_dir):
+            return failed
+        for job_id in os.listdir(self.result_dir):
+            if not job_id.isalnum():
+                continue
+            status = self.get_status(job_id)
+            if status is None or status["status"] not in (JobStatus.QUEUED.value, JobStatus.RUNNING.value):
+                continue
+            if self._owner_alive(status.get("owner")):
+                continue
+            self._finish_interrupted(status)
+            failed += 1
+        return failed
+
+    async def start(self) -> None:
+        os.makedirs(os.path.join(self.result_dir, ".owners"), exist_ok=True)
+        # Held until this process stops; the OS releases it if the process dies
+        self._owner_lock = open(self._owner_path(self._owner), "w")
+        fcntl.flock(self._owner_lock, fcntl.LOCK_EX)
+        failed = await asyncio.to_thread(self.fail_orphaned)
+        if failed:
+            logger.warning(f"Marked {failed} jobs of stopped server processes as failed")
+        self._queue = asyncio.PriorityQueue()
+        self._workers = [
+            asyncio.create_task(self._worker_loop(i)) for i in range(self.worker_count)
+        ]
+        logger.info(f"Job manager started with {self.worker_count} workers")
+
+    async def shutdown(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        # Jobs still queued here would never run
+        while self._queue is not None and not self._queue.empty():
+            _, _, job = self._queue.get_nowait()
+            self._finish_interrupted(job["status"])
+        if self._owner_lock is not None:
+            self._owner_lock.close()
+            self._owner_lock = None
+            try:
+                os.remove(self._owner_path(self._owner))
+            except OSError:
+                pass
+        logger.info("Job manager shutdown")
+
+    async def submit(
+        self,
+        *,
+        query_id: int,
+        query_uuid: Any,
+        query_name: str,
+        sql_template: str,
+        version_id: Optional[int],
+        params: Dict[str, Any],
+        params_info: Optional[Dict[str, Any]],
+        database_connection: DatabaseConnection,
+        timeout_ms: int,
+        priority: int,
+        max_rows: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        workspace: Optional[Workspace] = None
+    ) -> Dict[str, Any]:
+        """Queue a job and return its initial status."""
+        job_id = uuid.uuid4().hex
+        now = datetime.utcnow()
+        status = {
+            "job_id": job_id,
+            "query_id": query_id,
+            "query_uuid": str(query_uuid),
+            "query_name": query_name,
+            "status": JobStatus.QUEUED.value,
+            "priority": priority,
+            "submitted_at": now.isoformat(),
+            "started_at": None,
+            "finished_at": None,
+            "expires_at": (now + timedelta(seconds=self.ttl_seconds)).isoformat(),
+            "row_count": None,
+            "columns": None,
+            "execution_time_ms": None,
+            "truncated": None,
+            "error": None,
+            "owner": self._owner
+        }
+        os.makedirs(self._job_dir(job_id))
+        self._write_status(job_id, status)
+
+        job = {
+            "status": status,
+            "sql_template": sql_template,
+            "version_id": version_id,
+            "params": params,
+            "params_info": params_info,
+            "database_connection": database_connection,
+            "timeout_ms": timeout_ms,
+            "max_rows": max_rows,
+            "max_bytes": max_bytes,
+            "workspace": workspace
+        }
+        # Lower numbers run first; the sequence keeps FIFO order within a priority
+        await self._queue.put((priority, next(self._sequence), job))
+        return status
+
+    async def _worker_loop(self, worker_id: int) -> None:
+        while True:
+            _, _, job = await self._queue.get()
+            try:
+                await self._run_job(job)
+            except Exception as e:
+                logger.exception(f"Job worker {worker_id} failed: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    async def _run_job(self, job: Dict[str, Any]) -> None:
+        status = job["status"]
+        job_id = status["job_id"]
+        status["status"] = JobStatus.RUNNING.value
+        status["started_at"] = datetime.utcnow().isoformat()
+        self._write_status(job_id, status)
+
+        try:
+            result = await self._executor.execute_query(
+                None,
+                sql_template=job["sql_template"],
+                params=job["params"],
+                params_info=job["params_info"],
+                database_connection=job["database_connection"],
+                timeout_ms=job["timeout_ms"],
+                version_id=job["version_id"],
+                max_rows=job["max_rows"],
+                max_bytes=job["max_bytes"],
+                workspace=job["workspace"]
+            )
+            await asyncio.to_thread(self._write_rows, job_id, result["columns"], result["data"])
+            status.update({
+                "status": JobStatus.SUCCEEDED.value,
+                "row_count": result["row_count"],
+                "columns": result["columns"],
+                "execution_time_ms": result["execution_time_ms"],
+                "truncated": result["truncated"]
+            })
+        except HTTPException as e:
+            status.update({"status": JobStatus.FAILED.value, "error": str(e.detail)})
+        except Exception as e:
+            logger.exception(f"Job {job_id} failed")
+            status.update({"status": JobStatus.FAILED.value, "error": str(e)})
+        except asyncio.CancelledError:
+            # The process is shutting down
+            status.update({"status": JobStatus.FAILED.value, "error": INTERRUPTED_ERROR})
+            raise
+        finally:
+            status["finished_at"] = datetime.utcnow().isoformat()
+            self._write_status(job_id, status)
+
+    def _rows_path(self, job_id: str) -> str:
+        return os.path.join(self._job_dir(job_id), "rows.mqc")
+
+    def _write_rows(self, job_id: str, columns: List[str], rows: List[Dict[str, Any]]) -> None:
+        write_columnar(self._rows_path(job_id), columns, rows)
+
+    def read_page(self, job_id: str, offset: int, limit: int) -> List[Dict[str, Any]]:
+        """Read rows [offset, offset + limit) of a finished job."""
+        return open_columnar(self._rows_path(job_id)).read_rows(offset, offset + limit)
+
+    def iter_rows(self, job_id: str, chunk_rows: int = 1000) -> Iterator[bytes]:
+        """Yield the result of a finished job as NDJSON, a chunk of rows at a time."""
+        for rows in open_columnar(self._rows_path(job_id)).iter_rows(chunk_rows):
+            yield encode_ndjson(rows)
+
+    def cleanup_expired(self) -> Tuple[int, int]:
+        """Remove job directories past their TTL. Returns (removed, kept)."""
+        removed = kept = 0
+        if not os.path.isdir(self.result_dir):
+            return removed, kept
+        now = datetime.utcnow()
+        for job_id in os.listdir(self.result_dir):
+            if not job_id.isalnum():
+                continue
+            job_dir = os.path.join(self.result_dir, job_id)
+            try:
+                with open(os.path.join(job_dir, "status.json")) as f:
+                    expires_at = datetime.fromisoformat(json.load(f)["expires_at"])
+            except (OSError, ValueError, KeyError):
+                # Unreadable metadata: fall back to the directory age
+                try:
+                    created = datetime.utcfromtimestamp(os.path.getmtime(job_dir))
+                except OSError:
+                    continue
+                expires_at = created + timedelta(seconds=self.ttl_seconds)
+            if expires_at <= now:
+                shutil.rmtree(job_dir, ignore_errors=True)
+                removed += 1
+            else:
+                kept += 1
+        return removed, kept
+
+
+job_manager = JobManager(
+    result_dir=settings.JOB_RESULT_DIR,
+    workers=settings.JOB_WORKERS,
+    ttl_seconds=settings.JOB_RESULT_TTL_SECONDS
+)
@@ -0,0 +1,346 @@
+"""
+Paged execution of published queries.
+
+A page request wraps the version's SQL so the database computes and returns
+only the requested page (plus one row, to tell whether another page exists):
+
+- PostgreSQL, MySQL, SQLite: ``LIMIT ... OFFSET ...``
+- SQL Server: ``TOP (n)`` for the first page, ``OFFSET ... FETCH NEXT`` after
+- Oracle: ``ROWNUM <= n`` for the first page, ``OFFSET ... FETCH NEXT`` after
+  (Oracle 12c+)
+
+Queries that declare an ordering key (execution option ``order_key``, e.g.
+``["created_at", "-id"]`` with ``-`` for descending) use keyset pagination
+instead: the continuation token carries the key of the last row, and the
+next page starts with ``WHERE (key) > (last key)``, so deep pages cost the
+same as the first one. The key should be unique and not null.
+
+Otherwise pages are cut by offset in the order of the query's trailing
+``ORDER BY``, which is moved out of the wrapped SQL (see split_order_by).
+Queries with neither cannot be paged: without an order the database may
+return rows in a different order for every page.
+
+Continuation tokens are opaque, URL-safe strings bound to the query version.
+"""
+import base64
+import json
+import re
+import uuid
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.models.database_connection import DatabaseType
+
+DIALECTS = {
+    DatabaseType.MYSQL: "mysql",
+    DatabaseType.POSTGRESQL: "postgresql",
+    DatabaseType.MSSQL: "mssql",
+    DatabaseType.ORACLE: "oracle",
+    DatabaseType.SQLITE: "sqlite"
+}
+
+LIMIT_PARAM = "qh_page_limit"
+OFFSET_PARAM = "qh_page_offset"
+KEY_PARAM = "qh_page_key_{}"
+
+_IDENTIFIER = re.compile(r"[A-Za-z_][\w$#]*")
+_NAME = r'(?:"[^"]+"|\[[^\]]+\]|`[^`]+`|[A-Za-z_][\w$#]*)'
+# A plain (optionally qualified) column with its direction, which can be applied outside a derived table
+_ORDER_ITEM = re.compile(
+    rf"^(?:{_NAME}\s*\.\s*)*({_NAME})(\s+(?:ASC|DESC))?(\s+NULLS\s+(?:FIRST|LAST))?$", re.IGNORECASE
+)
+_ORDER_BY = re.compile(r"(?<![\w$#])ORDER\s+BY(?![\w$#])", re.IGNORECASE)
+# Row limits after an ORDER BY depend on it, so that ORDER BY has to stay where it is
+_ROW_LIMIT = re.compile(r"(?<![\w$#])(?:LIMIT|OFFSET|FETCH|FOR)(?![\w$#])", re.IGNORECASE)
+_SELECT_TOP = re.compile(r"(?<![\w$#])SELECT\s+(?:ALL\s+|DISTINCT\s+)?TOP(?![\w$#])", re.IGNORECASE)
+_COMMENT = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+_SELECT = re.compile(r"(?<![\w$#])SELECT(?![\w$#])", re.IGNORECASE)
+_FROM = re.compile(r"(?<![\w$#])FROM(?![\w$#])", re.IGNORECASE)
+_SELECT_MODIFIERS = re.compile(r"^(?:(?:ALL|DISTINCT)\s+)?(?:TOP\s+\S+(?:\s+PERCENT)?\s+)?", re.IGNORECASE)
+# A select item's output name: a plain (optionally qualified) column, or an alias after an expression
+_SELECT_ITEM = re.compile(rf"^(?:{_NAME}\s*\.\s*)*({_NAME})$")
+_ALIAS = re.compile(rf"(?:[\w$#)'\"\]`]\s+(?:AS\s+)?|\s+AS\s+)({_NAME})$", re.IGNORECASE)
+
+# Typed encoding of key values, so the next page binds a date as a date
+_ENCODERS = [
+    (bool, "b", lambda v: v),
+    (int, "i", lambda v: v),
+    (float, "f", lambda v: v),
+    (Decimal, "n", str),
+    (datetime, "dt", datetime.isoformat),
+    (date, "d", date.isoformat),
+    (time, "t", time.isoformat),
+    (uuid.UUID, "u", str),
+    (str, "s", lambda v: v)
+]
+_DECODERS = {
+    "b": bool, "i": int, "f": float, "n": Decimal, "dt": datetime.fromisoformat,
+    "d": date.fromisoformat, "t": time.fromisoformat, "u": uuid.UUID, "s": str
+}
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+def parse_order_key(order_key: Optional[List[str]]) -> List[Tuple[str, bool]]:
+    """``["created_at", "-id"]`` -> ``[("created_at", False), ("id", True)]`` (column, descending)."""
+    parsed = []
+    for item in order_key or []:
+        descending = item.startswith("-")
+        column = item[1:] if descending else item
+        if not _IDENTIFIER.fullmatch(column):
+            raise ValueError(f"Invalid order_key column: {item}")
+        parsed.append((column, descending))
+    return parsed
+
+
+def _encode_value(value: Any) -> Any:
+    if value is None:
+        return None
+    for cls, tag, encode in _ENCODERS:
+        if isinstance(value, cls):
+            return [tag, encode(value)]
+    raise ValueError(f"Unsupported order_key value type: {type(value).__name__}")
+
+
+def _decode_value(value: Any) -> Any:
+    if value is None:
+        return None
+    tag, raw = value
+    return _DECODERS[tag](raw)
+
+
+def _top_level(sql: str) -> str:
+    """The SQL with literals, quoted names, comments and parenthesized parts blanked out, offsets kept."""
+    masked = list(sql)
+    depth = 0
+    i = 0
+    while i < len(sql):
+        char = sql[i]
+        end = None
+        if sql.startswith("--", i):
+            end = sql.find("\n", i)
+        elif sql.startswith("/*", i):
+            end = sql.find("*/", i + 2)
+            end = -1 if end < 0 else end + 1
+        elif char in "'\"`[":
+            closing = "]" if char == "[" else char
+            end = i + 1
+            while True:
+                end = sql.find(closing, end)
+                # A doubled quote is an escaped one
+                if end == -1 or closing == "]" or not sql.startswith(closing * 2, end):
+                    break
+                end += 2
+        if end is not None:
+            end = len(sql) - 1 if end < 0 else end
+            masked[i:end + 1] = " " * (end + 1 - i)
+            i = end + 1
+            continue
+        if char == "(":
+            depth += 1
+        if depth:
+            masked[i] = " "
+        if char == ")":
+            depth -= 1
+        i += 1
+    return "".join(masked)
+
+
+def _unquoted(name: str) -> str:
+    return name.strip('"[]`').lower()
+
+
+def _output_names(sql: str, top_level: str, end: int) -> Optional[set]:
+    """Output column names of the (first) top-level SELECT before ``end``; None when it selects ``*``."""
+    select = _SELECT.search(top_level, 0, end)
+    if select is None:
+        return set()
+    source = _FROM.search(top_level, select.end(), end)
+    stop = source.start() if source else end
+    names, position = set(), select.end()
+    for part in top_level[select.end():stop].split(","):
+        item = " ".join(_COMMENT.sub(" ", sql[position:position + len(part)]).split())
+        position += len(part) + 1
+        item = _SELECT_MODIFIERS.sub("", item) if not names else item
+        if item.endswith("*"):
+            return None
+        match = _SELECT_ITEM.match(item) or _ALIAS.search(item)
+        if match is not None:
+            names.add(_unquoted(match.group(1)))
+    return names
+
+
+def split_order_by(sql: str, dialect: str) -> Tuple[str, Optional[str]]:
+    """
+    Take a trailing ORDER BY out of a SELECT that is about to become a derived table.
+
+    SQL Server rejects an ORDER BY in a derived table without TOP or OFFSET,
+    and no database keeps a derived table's order in the query around it. So
+    an ORDER BY on output columns is removed and returned, to be applied by
+    the outermost SELECT; qualifiers are dropped, as the derived table exposes
+    the columns by name. An ORDER BY on expressions, positions or columns the
+    SELECT does not return stays inside (made valid with ``OFFSET 0 ROWS`` on
+    SQL Server) and None is returned, as is the case for a statement without a
+    trailing ORDER BY.
+    """
+    sql = sql.strip().rstrip(";").rstrip()
+    top_level = _top_level(sql)
+    matches = list(_ORDER_BY.finditer(top_level))
+    if not matches or _ROW_LIMIT.search(top_level, matches[-1].end()):
+        return sql, None
+    start, end = matches[-1].span()
+    tail = top_level[end:]
+    items, position = [], 0
+    for part in tail.split(","):
+        items.append(_COMMENT.sub(" ", sql[end + position:end + position + len(part)]).strip())
+        position += len(part) + 1
+    outputs = _output_names(sql, top_level, start)
+    terms = []
+    for item in items:
+        match = _ORDER_ITEM.match(" ".join(item.split()))
+        if match is None or (outputs is not None and _unquoted(match.group(1)) not in outputs):
+            if dialect == "mssql" and not _SELECT_TOP.search(top_level):
+                # On its own line, after any trailing line comment
+                return f"{sql}\nOFFSET 0 ROWS", None
+            return sql, None
+        terms.append("".join(group or "" for group in match.groups()))
+    return sql[:start].rstrip(), ", ".join(terms)
+
+
+def paginate_sql(
+    sql: str,
+    dialect: str,
+    order_key: List[Tuple[str, bool]],
+    first_page: bool,
+    order_by: Optional[str] = None,
+    columns: Optional[List[str]] = None
+) -> str:
+    """
+    Wrap a SELECT so it returns one page; binds LIMIT_PARAM, OFFSET_PARAM and KEY_PARAM values.
+
+    Pages follow the order_key, or else the order_by taken out of the SELECT
+    by split_order_by; raises ValueError when there is neither. ``columns``
+    narrows the page to those columns, which need not include the ones it is
+    ordered by.
+    """
+    if not order_key and not order_by:
+        raise ValueError(
+            "Paging this query needs a stable row order: declare an order_key, "
+            "or end the query with an ORDER BY on its output columns"
+        )
+    inner = sql.strip().rstrip(";")
+    # On its own line, so a trailing line comment cannot swallow the closing parenthesis
+    select = ", ".join(columns) if columns else "*"
+    source = f"SELECT {select} FROM (\n{inner}\n) page_source"
+    if order_key and not first_page:
+        conditions = []
+        for i, (column, descending) in enumerate(order_key):
+            equal = [f"{c} = :{KEY_PARAM.format(j)}" for j, (c, _) in enumerate(order_key[:i])]
+            operator = "<" if descending else ">"
+            conditions.append(" AND ".join(equal + [f"{column} {operator} :{KEY_PARAM.format(i)}"]))
+        source += " WHERE " + " OR ".join(f"({condition})" for condition in conditions)
+    if order_key:
+        order_by = ", ".join(f"{c} {'DESC' if d else 'ASC'}" for c, d in order_key)
+    source += f" ORDER BY {order_by}"
+    offset = not order_key and not first_page
+
+    if dialect == "mssql":
+        if not offset:
+            return source.replace("SELECT ", f"SELECT TOP (:{LIMIT_PARAM}) ", 1)
+        return f"{source} OFFSET :{OFFSET_PARAM} ROWS FETCH NEXT :{LIMIT_PARAM} ROWS ONLY"
+    if dialect == "oracle":
+        if not offset:
+            return f"SELECT * FROM ({source}) WHERE ROWNUM <= :{LIMIT_PARAM}"
+        return f"{source} OFFSET :{OFFSET_PARAM} ROWS FETCH NEXT :{LIMIT_PARAM} ROWS ONLY"
+    if offset:
+        return f"{source} LIMIT :{LIMIT_PARAM} OFFSET :{OFFSET_PARAM}"
+    return f"{source} LIMIT :{LIMIT_PARAM}"
+
+
+class PageRequest:
+    """One requested page: its size and where it starts."""
+
+    def __init__(
+        self,
+        page_size: int,
+        cursor: Optional[str] = None,
+        order_key: Optional[List[str]] = None,
+        version_id: Optional[int] = None
+    ):
+        self.page_size = page_size
+        self.order_key = parse_order_key(order_key)
+        self.version_id = version_id
+        self.offset = 0
+        self.after: Optional[List[Any]] = None
+        if cursor:
+            self._load(cursor)
+
+    def check_fields(self, fields: Optional[List[str]]) -> None:
+        """Raise ValueError if a projection to ``fields`` would drop ordering key columns."""
+        missing = [column for column, _ in self.order_key if fields and column not in fields]
+        if missing:
+            raise ValueError(
+                f"Paged results must include the ordering key columns; add {', '.join(missing)} to fields"
+            )
+
+    @property
+    def first_page(self) -> bool:
+        return self.offset == 0 and self.after is None
+
+    def _load(self, cursor: str) -> None:
+        try:
+            token = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+            if token.get("v") != self.version_id:
+                raise InvalidCursorError("Cursor belongs to a different version of this query")
+            if self.order_key:
+                after = [_decode_value(v) for v in token["k"]]
+                if len(after) != len(self.order_key):
+                    raise InvalidCursorError("Cursor does not match the query's ordering key")
+                self.after = after
+            else:
+                self.offset = int(token["o"])
+                if self.offset < 0:
+                    raise InvalidCursorError("Invalid cursor")
+        except InvalidCursorError:
+            raise
+        except (ValueError, KeyError, TypeError, AttributeError):
+            raise InvalidCursorError("Invalid cursor")
+
+    def bind_params(self) -> Dict[str, Any]:
+        params: Dict[str, Any] = {LIMIT_PARAM: self.page_size + 1}
+        if self.order_key:
+            for i, value in enumerate(self.after or []):
+                params[KEY_PARAM.format(i)] = value
+        elif self.offset:
+            params[OFFSET_PARAM] = self.offset
+        return params
+
+    def _token(self, payload: Dict[str, Any]) -> str:
+        payload["v"] = self.version_id
+        raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+    def finish(
+        self,
+        rows: List[Dict[str, Any]],
+        truncated: bool = False
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Trim the look-ahead row and build the continuation token, if there is a next page.
+
+        A page cut short by the result budget continues after its last row.
+        """
+        if len(rows) > self.page_size:
+            rows = rows[:self.page_size]
+        elif not truncated or not rows:
+            return rows, None
+        if not self.order_key:
+            return rows, self._token({"o": self.offset + len(rows)})
+        last = rows[-1]
+        try:
+            key = [_encode_value(last[column]) for column, _ in self.order_key]
+        except KeyError as e:
+            raise ValueError(f"Ordering key column {e.args[0]} is not in the query's result")
+        return rows, self._token({"k": key})
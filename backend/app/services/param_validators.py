@@ -0,0 +1,215 @@
+"""
+Parameter validators compiled from a query's params_info.
+
+Each entry of params_info describes one parameter:
+
+    {
+        "type": "integer",        # string, integer, float, decimal, boolean,
+                                  # date, datetime, time or array
+        "required": true,         # default true
+        "default": 10,            # used when the parameter is omitted
+        "enum": [10, 20, 50],     # allowed values
+        "min": 1, "max": 100,     # inclusive bounds (length for strings)
+        "items": {"type": "integer"},      # element spec for arrays
+        "min_items": 1, "max_items": 100   # array length bounds
+    }
+
+Table parameters (``"type": "table"``) take a list of rows described by
+``"columns": {"name": "<type>", ...}``; each row may be an object, a list in
+column order, or a bare value for single-column tables.
+
+The whole spec is compiled into one pydantic model per query version, so a
+request is validated and coerced with a single call into pydantic-core.
+Only parameters the SQL template uses are validated; parameters that are not
+described pass through unchanged.
+"""
+import re
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Annotated, Any, Callable, Dict, List, Optional, Tuple
+
+from pydantic import (
+    AfterValidator, BeforeValidator, ConfigDict, Field, TypeAdapter, ValidationError, create_model
+)
+
+from app.core.config import settings
+
+_IDENTIFIER = re.compile(r"[A-Za-z_]\w*")
+
+SCALAR_TYPES: Dict[str, Any] = {
+    "string": str,
+    "integer": int,
+    "float": float,
+    "decimal": Decimal,
+    "boolean": bool,
+    "date": date,
+    "datetime": datetime,
+    "time": time
+}
+
+
+class ParamValidationError(ValueError):
+    """One or more parameters failed validation; ``errors`` maps name to message."""
+
+    def __init__(self, errors: Dict[str, str]):
+        self.errors = errors
+        super().__init__("; ".join(
+            f"Invalid value for parameter '{name}': {message}" for name, message in errors.items()
+        ))
+
+
+def _one_of(allowed: List[Any]) -> Callable[[Any], Any]:
+    allowed_set = set(allowed)
+
+    def check(value: Any) -> Any:
+        if value not in allowed_set:
+            raise ValueError(f"must be one of {', '.join(str(v) for v in allowed)}")
+        return value
+
+    return check
+
+
+def _split_list(value: Any) -> Any:
+    # Query-string friendly form: "a,b,c"
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(",") if item.strip()]
+    return value
+
+
+def _number_to_str(value: Any) -> Any:
+    # Clients have always been able to send 123 for a string parameter
+    if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+        return str(value)
+    return value
+
+
+def _blank_to_none(value: Any) -> Any:
+    # Form inputs send "" for optional parameters left empty
+    return None if value == "" else value
+
+
+def _to_row(columns: List[str]) -> Callable[[Any], Any]:
+    def convert(value: Any) -> Any:
+        if isinstance(value, dict):
+            return tuple(value.get(name) for name in columns)
+        if isinstance(value, (list, tuple)):
+            return value
+        return (value,)
+
+    return convert
+
+
+def table_columns(spec: Dict[str, Any]) -> Dict[str, str]:
+    """Column names and types of a table parameter spec."""
+    columns = spec.get("columns") or {"value": "string"}
+    if not isinstance(columns, dict):
+        raise ValueError("table columns must be an object mapping column names to types")
+    for name, type_name in columns.items():
+        if not _IDENTIFIER.fullmatch(str(name)):
+            raise ValueError(f"invalid table column name: {name}")
+        if type_name not in SCALAR_TYPES:
+            raise ValueError(f"unsupported type for table column {name}: {type_name}")
+    return columns
+
+
+def _table_annotation(spec: Dict[str, Any]) -> Any:
+    columns = table_columns(spec)
+    cells = [
+        Annotated[Optional[SCALAR_TYPES[type_name]], BeforeValidator(_blank_to_none)]
+        if type_name != "string" else Optional[Annotated[str, BeforeValidator(_number_to_str)]]
+        for type_name in columns.values()
+    ]
+    row = Annotated[Tuple[tuple(cells)], BeforeValidator(_to_row(list(columns)))]
+    constraints = {"max_length": min(spec.get("max_items") or settings.TABLE_PARAM_MAX_ROWS,
+                                     settings.TABLE_PARAM_MAX_ROWS)}
+    if spec.get("min_items") is not None:
+        constraints["min_length"] = spec["min_items"]
+    return Annotated[List[row], BeforeValidator(_split_list), Field(**constraints)]
+
+
+def _scalar_annotation(spec: Dict[str, Any]) -> Any:
+    base = SCALAR_TYPES.get(spec.get("type", "string"), Any)
+    constraints: Dict[str, Any] = {}
+    if base is str:
+        if spec.get("min") is not None:
+            constraints["min_length"] = spec["min"]
+        if spec.get("max") is not None:
+            constraints["max_length"] = spec["max"]
+    elif base is not Any:
+        if spec.get("min") is not None:
+            constraints["ge"] = TypeAdapter(base).validate_python(spec["min"])
+        if spec.get("max") is not None:
+            constraints["le"] = TypeAdapter(base).validate_python(spec["max"])
+
+    metadata: List[Any] = [Field(**constraints)] if constraints else []
+    if base is str:
+        metadata.append(BeforeValidator(_number_to_str))
+    if spec.get("enum"):
+        adapter = TypeAdapter(base)
+        metadata.append(AfterValidator(_one_of([adapter.validate_python(v) for v in spec["enum"]])))
+    return Annotated[tuple([base, *metadata])] if metadata else base
+
+
+def _annotation(spec: Dict[str, Any]) -> Any:
+    if spec.get("type") == "table":
+        return _table_annotation(spec)
+    if spec.get("type") != "array":
+        return _scalar_annotation(spec)
+    item = _scalar_annotation(spec.get("items") or {"type": "string"})
+    constraints = {}
+    if spec.get("min_items") is not None:
+        constraints["min_length"] = spec["min_items"]
+    if spec.get("max_items") is not None:
+        constraints["max_length"] = spec["max_items"]
+    return Annotated[List[item], BeforeValidator(_split_list), Field(**constraints)]
+
+
+class ParamValidator:
+    """Validates and coerces request parameters against a params_info spec."""
+
+    def __init__(self, params_info: Optional[Dict[str, Any]], names: Optional[List[str]] = None):
+        """``names`` limits validation to these parameters, e.g. the ones a template uses."""
+        fields: Dict[str, Tuple[Any, Any]] = {}
+        # Field names are remapped so parameters like "model_config" or "_x" are allowed
+        self._names: Dict[str, str] = {}
+        for index, (name, spec) in enumerate((params_info or {}).items()):
+            if not isinstance(spec, dict) or (names is not None and name not in names):
+                continue
+            field_name = f"p{index}"
+            self._names[field_name] = name
+            annotation = _annotation(spec)
+            if "default" in spec:
+                default = spec["default"]
+            elif spec.get("required", True):
+                default = ...
+            else:
+                default = None
+                annotation = Optional[annotation]
+                if spec.get("type", "string") != "string":
+                    annotation = Annotated[annotation, BeforeValidator(_blank_to_none)]
+            fields[field_name] = (annotation, Field(default, alias=name))
+        self._model = create_model(
+            "Params",
+            __config__=ConfigDict(populate_by_name=False, validate_default=True),
+            **fields
+        ) if fields else None
+
+    def validate(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Return params with described values coerced and defaults filled in."""
+        if self._model is None:
+            return params
+        try:
+            validated = self._model.model_validate(params)
+        except ValidationError as e:
+            errors: Dict[str, str] = {}
+            for error in e.errors(include_url=False):
+                name = str(error["loc"][0]) if error["loc"] else "params"
+                detail = str(error["ctx"]["error"]) if error["type"] == "value_error" else error["msg"]
+                if len(error["loc"]) > 1:
+                    detail = f"item {error['loc'][1]}: {detail}"
+                errors.setdefault(name, detail)
+            raise ParamValidationError(errors)
+        result = dict(params)
+        for field_name, name in self._names.items():
+            result[name] = getattr(validated, field_name)
+        return result
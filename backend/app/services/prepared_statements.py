@@ -0,0 +1,253 @@
+"""
+Server-side prepared statements, reused per pooled connection.
+
+Each query version's statement is prepared once on a pooled connection and
+executed by name afterwards, so the target database skips parsing and
+planning for repeated calls:
+
+- PostgreSQL (psycopg2): ``PREPARE name AS ...`` / ``EXECUTE name (...)``
+- MySQL (pymysql): ``PREPARE name FROM ...`` / ``EXECUTE name USING @...``
+- SQL Server (pyodbc) and Oracle (cx_Oracle): a cursor kept open per
+  statement, which reuses the driver's prepared handle while the SQL text is
+  unchanged
+
+Names are derived from the statement text and parameter types, so a new
+query version (or an in-place edit) gets a new statement; the old one ages
+out of the connection's LRU and is deallocated. Templates whose SQL text
+varies per call (expanding IN lists, table parameters) are never prepared.
+"""
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.sql.elements import TextClause
+
+from app.core.config import settings
+from app.services.fetch_pipeline import ResultBudget, fetch_rows
+
+SUPPORTED_DRIVERS = {
+    ("postgresql", "psycopg2"),
+    ("mysql", "pymysql"),
+    ("mssql", "pyodbc"),
+    ("oracle", "cx_oracle")
+}
+
+_PYFORMAT = re.compile(r"%\((\w+)\)s")
+_FORMAT = re.compile(r"%%|%s")
+
+
+def statement_name(sql: str, params_info: Optional[Dict[str, Any]]) -> str:
+    digest = hashlib.sha1(f"{sql}\0{sorted((params_info or {}).items())!r}".encode("utf-8")).hexdigest()
+    return f"qh_{digest[:20]}"
+
+
+class PreparedStats:
+    """Reuse counters per dialect in this worker."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: Dict[str, Dict[str, int]] = {}
+
+    def incr(self, dialect: str, counter: str) -> None:
+        with self._lock:
+            counts = self._counts.setdefault(dialect, {"prepared": 0, "reused": 0, "deallocated": 0})
+            counts[counter] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            result = {}
+            for dialect, counts in self._counts.items():
+                executions = counts["prepared"] + counts["reused"]
+                result[dialect] = dict(
+                    counts, reuse_rate=round(counts["reused"] / executions, 3) if executions else None
+                )
+            return result
+
+
+prepared_stats = PreparedStats()
+
+
+class _Prepared:
+    """One statement prepared on one connection."""
+
+    def __init__(self, name: str, sql: str, bind_names: List[str], cursor: Any = None):
+        self.name = name
+        self.sql = sql
+        self.bind_names = bind_names
+        self.cursor = cursor
+        self.stale = False
+
+
+def _registry(conn: Connection) -> "OrderedDict[str, _Prepared]":
+    # conn.info belongs to the pooled DBAPI connection and is dropped with it
+    return conn.info.setdefault("prepared_statements", OrderedDict())
+
+
+def _deallocate(conn: Connection, prepared: _Prepared) -> None:
+    dialect = conn.dialect.name
+    dbapi_conn = conn.connection.dbapi_connection
+    try:
+        if prepared.cursor is not None:
+            prepared.cursor.close()
+        elif dialect in ("postgresql", "mysql"):
+            cursor = dbapi_conn.cursor()
+            try:
+                keyword = "DEALLOCATE" if dialect == "postgresql" else "DEALLOCATE PREPARE"
+                cursor.execute(f"{keyword} {prepared.name}")
+            finally:
+                cursor.close()
+    except Exception:
+        # Freed with the session at the latest
+        pass
+    prepared_stats.incr(dialect, "deallocated")
+
+
+def _prepare(conn: Connection, name: str, statement: TextClause) -> _Prepared:
+    dialect = conn.dialect
+    dbapi_conn = conn.connection.dbapi_connection
+    compiled = statement.compile(dialect=dialect)
+    sql = compiled.string
+
+    if dialect.name in ("postgresql", "mysql"):
+        if compiled.positional:
+            # format paramstyle (pymysql): %s markers in bind order
+            bind_names = list(compiled.positiontup)
+            body = _FORMAT.sub(lambda m: "%" if m.group() == "%%" else "?", sql)
+        else:
+            # pyformat paramstyle (psycopg2): %(name)s markers, numbered in order of first use
+            bind_names = []
+            for bind in _PYFORMAT.findall(sql):
+                if bind not in bind_names:
+                    bind_names.append(bind)
+            body = _PYFORMAT.sub(lambda m: f"${bind_names.index(m.group(1)) + 1}", sql).replace("%%", "%")
+        cursor = dbapi_conn.cursor()
+        try:
+            if dialect.name == "postgresql":
+                # No arguments, so psycopg2 sends the text as is
+                cursor.execute(f"PREPARE {name} AS {body}")
+            else:
+                cursor.execute(f"PREPARE {name} FROM %s", (body,))
+        finally:
+            cursor.close()
+        return _Prepared(name, sql, bind_names)
+
+    cursor = dbapi_conn.cursor()
+    if dialect.name == "oracle":
+        cursor.prepare(sql)
+        return _Prepared(name, sql, [], cursor)
+    return _Prepared(name, sql, list(compiled.positiontup or []), cursor)
+
+
+def _run(conn: Connection, prepared: _Prepared, params: Dict[str, Any]) -> Any:
+    """Execute a prepared statement; returns a DBAPI cursor holding the result."""
+    dialect = conn.dialect.name
+    if prepared.cursor is not None:
+        cursor = prepared.cursor
+        conn.info["active_cursor"] = cursor
+        if dialect == "oracle":
+            cursor.execute(None, params)
+        else:
+            cursor.execute(prepared.sql, [params[name] for name in prepared.bind_names])
+        return cursor
+
+    cursor = conn.connection.dbapi_connection.cursor()
+    conn.info["active_cursor"] = cursor
+    values = [params[name] for name in prepared.bind_names]
+    if dialect == "postgresql":
+        arguments = f" ({', '.join('%s' for _ in values)})" if values else ""
+        cursor.execute(f"EXECUTE {prepared.name}{arguments}", values)
+    else:
+        if values:
+            cursor.execute(
+                "SET " + ", ".join(f"@{prepared.name}_{i} = %s" for i in range(len(values))), values
+            )
+        using = f" USING {', '.join(f'@{prepared.name}_{i}' for i in range(len(values)))}" if values else ""
+        cursor.execute(f"EXECUTE {prepared.name}{using}")
+    return cursor
+
+
+def supports(conn: Connection) -> bool:
+    return (conn.dialect.name, conn.dialect.driver) in SUPPORTED_DRIVERS
+
+
+def _wrap_error(conn: Connection, sql: str, params: Dict[str, Any], error: Exception) -> DBAPIError:
+    """Wrap a driver error the way SQLAlchemy wraps errors from Connection.execute."""
+    dialect = conn.dialect
+    dbapi_conn = conn.connection.dbapi_connection
+    disconnect = dialect.is_disconnect(error, dbapi_conn, None)
+    if disconnect:
+        # A dead connection must not go back to the pool
+        conn.invalidate(error)
+    return DBAPIError.instance(
+        sql, params, error, dialect.loaded_dbapi.Error,
+        connection_invalidated=disconnect, dialect=dialect
+    )
+
+
+def execute_prepared(
+    conn: Connection,
+    name: str,
+    statement: TextClause,
+    params: Dict[str, Any],
+    array_size: int,
+    budget: Optional[ResultBudget] = None
+) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """Run a statement through the connection's prepared statement and fetch its rows.
+
+    Driver errors are raised as SQLAlchemy DBAPIErrors, so deadlines, error
+    responses and the breaker treat them like errors of Connection.execute.
+    """
+    try:
+        return _execute_prepared(conn, name, statement, params, array_size, budget)
+    except conn.dialect.loaded_dbapi.Error as e:
+        raise _wrap_error(conn, str(statement), params, e) from e
+
+
+def _execute_prepared(
+    conn: Connection,
+    name: str,
+    statement: TextClause,
+    params: Dict[str, Any],
+    array_size: int,
+    budget: Optional[ResultBudget]
+) -> Tuple[List[str], List[Dict[str, Any]]]:
+    dialect = conn.dialect.name
+    registry = _registry(conn)
+    prepared = registry.get(name)
+    if prepared is not None and prepared.stale:
+        # Deallocated now rather than on failure: a failed statement aborts the PostgreSQL transaction
+        del registry[name]
+        _deallocate(conn, prepared)
+        prepared = None
+    if prepared is None:
+        prepared = _prepare(conn, name, statement)
+        registry[name] = prepared
+        prepared_stats.incr(dialect, "prepared")
+        while len(registry) > settings.PREPARED_STATEMENTS_PER_CONNECTION:
+            _, evicted = registry.popitem(last=False)
+            _deallocate(conn, evicted)
+    else:
+        registry.move_to_end(name)
+        prepared_stats.incr(dialect, "reused")
+
+    cursor = None
+    try:
+        cursor = _run(conn, prepared, params)
+        columns = [column[0] for column in cursor.description or []]
+        rows = fetch_rows(cursor.fetchmany, columns, array_size, budget=budget) if cursor.description else []
+        if budget is not None and budget.truncated and dialect == "mssql":
+            # Pending results would keep the connection busy
+            cursor.cancel()
+    except Exception:
+        # The plan may no longer fit the schema; prepare it again on next use
+        prepared.stale = True
+        raise
+    finally:
+        conn.info.pop("active_cursor", None)
+        if cursor is not None and prepared.cursor is None:
+            cursor.close()
+    return columns, rows
@@ -0,0 +1,160 @@
+"""
+Column projection and row filters for published queries.
+
+Callers can ask for a subset of a query's output columns (``fields``) and
+rows (``filters``). Both are validated against the output columns the query
+declares in its execution options:
+
+    "output_columns": {"id": "integer", "region": "string", "day": "date"}
+
+and compiled into a wrapper around the version's SQL, so the database does
+the reduction:
+
+    SELECT id, day FROM (<template>) q WHERE region IN :qh_filter_0 AND day >= :qh_filter_1
+
+Filter values are coerced to the column's declared type and always bound,
+never inlined. Supported operators:
+
+- ``eq``: ``{"column": "region", "op": "eq", "value": "EU"}`` (``null`` matches NULL)
+- ``in``: ``{"column": "region", "op": "in", "values": ["EU", "US"]}``
+- ``range``: ``{"column": "day", "op": "range", "gte": "2024-01-01", "lt": "2024-02-01"}``
+"""
+import operator
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import TypeAdapter, ValidationError
+
+from app.services.param_validators import SCALAR_TYPES
+
+FILTER_PARAM = "qh_filter_{}"
+MAX_IN_VALUES = 1000
+
+RANGE_OPERATORS = {"gte": ">=", "gt": ">", "lte": "<=", "lt": "<"}
+# The same comparisons in Python, for rows that are already materialized
+_CHECKS = {
+    "=": operator.eq, "IN": lambda a, b: a in b,
+    ">=": operator.ge, ">": operator.gt, "<=": operator.le, "<": operator.lt
+}
+
+_IDENTIFIER = re.compile(r"[A-Za-z_][\w$#]*")
+_adapters: Dict[str, TypeAdapter] = {name: TypeAdapter(type_) for name, type_ in SCALAR_TYPES.items()}
+
+
+def output_columns(spec: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    """Validate a query's declared output columns (name -> type)."""
+    if not spec:
+        return {}
+    if not isinstance(spec, dict):
+        raise ValueError("output_columns must be an object mapping column names to types")
+    for name, type_name in spec.items():
+        if not _IDENTIFIER.fullmatch(str(name)):
+            raise ValueError(f"invalid output column name: {name}")
+        if type_name not in SCALAR_TYPES:
+            raise ValueError(f"unsupported type for output column {name}: {type_name}")
+    return spec
+
+
+class Projection:
+    """The fields and filters of one call, checked against a query's output columns."""
+
+    def __init__(
+        self,
+        columns: Optional[Dict[str, Any]],
+        fields: Optional[List[str]] = None,
+        filters: Optional[List[Dict[str, Any]]] = None
+    ):
+        known = output_columns(columns)
+        if not known:
+            raise ValueError("This query does not declare output_columns, so fields and filters are not available")
+        unknown = [name for name in fields or [] if name not in known]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        # Duplicates would repeat the column in the select list
+        self.fields = list(dict.fromkeys(fields or []))
+
+        # (column, sql operator, bound value or None for IS NULL, expanding)
+        self.conditions: List[Tuple[str, str, Any, bool]] = []
+        for item in filters or []:
+            column = item.get("column")
+            if column not in known:
+                raise ValueError(f"Unknown filter column: {column}")
+            op = item.get("op", "eq")
+            if op == "eq":
+                value = item.get("value")
+                value = None if value is None else self._coerce(column, known, value)
+                self.conditions.append((column, "=", value, False))
+            elif op == "in":
+                values = item.get("values") or []
+                if not values or len(values) > MAX_IN_VALUES:
+                    raise ValueError(f"Filter on {column}: 'in' takes 1 to {MAX_IN_VALUES} values")
+                self.conditions.append((column, "IN", [self._coerce(column, known, v) for v in values], True))
+            elif op == "range":
+                bounds = [(key, item[key]) for key in RANGE_OPERATORS if item.get(key) is not None]
+                if not bounds:
+                    raise ValueError(f"Filter on {column}: 'range' needs at least one of gte, gt, lte, lt")
+                for key, value in bounds:
+                    self.conditions.append((column, RANGE_OPERATORS[key], self._coerce(column, known, value), False))
+            else:
+                raise ValueError(f"Filter on {column}: unsupported operator {op}")
+        self.types = {column: known[column] for column, *_ in self.conditions}
+
+    @staticmethod
+    def _coerce(column: str, known: Dict[str, str], value: Any) -> Any:
+        try:
+            return _adapters[known[column]].validate_python(value)
+        except ValidationError as e:
+            raise ValueError(f"Invalid value for filter on {column}: {e.errors(include_url=False)[0]['msg']}")
+
+    @property
+    def key(self) -> Tuple[Any, ...]:
+        """Shape of the compiled SQL; calls with the same key share one statement."""
+        return tuple(self.fields), tuple((c, op, value is None) for c, op, value, _ in self.conditions)
+
+    def wrap(self, sql: str, project: bool = True) -> str:
+        """Wrap a SELECT in the filters, and the fields unless ``project`` is False."""
+        select = ", ".join(self.fields) if project and self.fields else "*"
+        inner = sql.strip().rstrip(";")
+        wrapped = f"SELECT {select} FROM (\n{inner}\n) q"
+        conditions = []
+        for i, (column, op, value, _) in enumerate(self.conditions):
+            if value is None:
+                conditions.append(f"{column} IS NULL")
+            else:
+                conditions.append(f"{column} {op} :{FILTER_PARAM.format(i)}")
+        if conditions:
+            wrapped += " WHERE " + " AND ".join(conditions)
+        return wrapped
+
+    def binds(self) -> List[Tuple[str, str, bool]]:
+        """(name, type, expanding) of each bound filter value."""
+        return [
+            (FILTER_PARAM.format(i), self.types[column], expanding)
+            for i, (column, _, value, expanding) in enumerate(self.conditions)
+            if value is not None
+        ]
+
+    def bind_params(self) -> Dict[str, Any]:
+        return {
+            FILTER_PARAM.format(i): value
+            for i, (_, _, value, _) in enumerate(self.conditions)
+            if value is not None
+        }
+
+    def apply(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Filter and project rows in Python, for results that are already materialized."""
+        selected = []
+        for row in rows:
+            matches = True
+            for column, op, value, _ in self.conditions:
+                cell = row.get(column)
+                if value is None:
+                    matches = cell is None
+                else:
+                    # Like SQL, NULL never satisfies a comparison
+                    matches = cell is not None and _CHECKS[op](cell, value)
+                if not matches:
+                    break
+            if matches:
+                selected.append({name: row.get(name) for name in self.fields} if self.fields else row)
+        return selected
@@ -1,15 +1,46 @@
 import time
 import json
+import asyncio
+import threading
+import logging
 from datetime import datetime
-from typing import Dict, Any, List, Optional
-from sqlalchemy import text, create_engine
-from sqlalchemy.engine import Engine
+from collections import deque
+from typing import Dict, Any, Deque, List, Optional, Tuple, Callable, Awaitable
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.sql.elements import TextClause
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
 from fastapi import HTTPException, status
-import re
-from app.models.database_connection import DatabaseType, DatabaseConnection
+from app.models.database_connection import DatabaseType, DatabaseConnection, EndpointRole
+from app.models.workspace import Workspace
+from app.core.config import settings
 from app.core.security import decrypt_password
+from app.services.circuit_breaker import circuit_breakers, CircuitBreaker, CircuitOpenError
+from app.services.db_errors import is_availability_error
+from app.services.replica_router import replica_router, Endpoint
+from app.services.param_validators import ParamValidationError
+from app.services.sql_template import MissingParametersError, SqlTemplate, sql_templates
+from app.services.pagination import DIALECTS, PageRequest
+from app.services.projection import Projection
+from app.services.table_params import table_params
+from app.services.prepared_statements import execute_prepared, supports as supports_prepared
+from app.services.copy_export import CopyPipe, CopyStream, run_copy
+from app.services.execution_queue import ExecutionQueueFullError, ExecutionSlot, execution_scheduler
+from app.services.cursor_sessions import (
+    CursorSession, CursorSessionBusyError, CursorSessionFailedError, CursorSessionLimitError,
+    CursorSessionNotFoundError, cursor_sessions
+)
+from app.services.fetch_pipeline import (
+    FetchOptions, ResultBudget, abandon_result, fetch_options, fetch_rows, install_fetch_tuning, result_budget
+)
+from app.services.execution_control import (
+    ExecutionContext, ExecutionCancelled, DeadlineExceeded, ClientDisconnected,
+    install_cursor_tracking, resolve_timeout_ms
+)
+
+logger = logging.getLogger(__name__)
 
 
 class QueryExecutorService:
@@ -18,82 +49,290 @@ class QueryExecutorService:
     def __init__(self):
         self.engine_cache: Dict[int, Engine] = {}
     
-    def _get_connection_string(self, db_conn: DatabaseConnection) -> str:
+    def _get_connection_string(
+        self,
+        db_conn: DatabaseConnection,
+        host: Optional[str] = None,
+        port: Optional[int] = None
+    ) -> str:
         """Generate database connection string based on database type."""
         password = decrypt_password(db_conn.password_encrypted)
         
         # Replace localhost with 127.0.0.1 to force IPv4
-        host = db_conn.host
+        host = host or db_conn.host
+        port = port or db_conn.port
         if host.lower() == 'localhost':
             host = '127.0.0.1'
             
         if db_conn.database_type == DatabaseType.MYSQL:
-            return f"mysql+pymysql://{db_conn.username}:{password}@{host}:{db_conn.port}/{db_conn.database_name}"
+            return f"mysql+pymysql://{db_conn.username}:{password}@{host}:{port}/{db_conn.database_name}"
         elif db_conn.database_type == DatabaseType.POSTGRESQL:
-            return f"postgresql://{db_conn.username}:{password}@{host}:{db_conn.port}/{db_conn.database_name}"
+            return f"postgresql://{db_conn.username}:{password}@{host}:{port}/{db_conn.database_name}"
         elif db_conn.database_type == DatabaseType.MSSQL:
-            return f"mssql+pyodbc://{db_conn.username}:{password}@{host}:{db_conn.port}/{db_conn.database_name}?driver=ODBC+Driver+17+for+SQL+Server"
+            return f"mssql+pyodbc://{db_conn.username}:{password}@{host}:{port}/{db_conn.database_name}?driver=ODBC+Driver+17+for+SQL+Server"
         elif db_conn.database_type == DatabaseType.ORACLE:
-            return f"oracle+cx_oracle://{db_conn.username}:{password}@{host}:{db_conn.port}/{db_conn.database_name}"
+            return f"oracle+cx_oracle://{db_conn.username}:{password}@{host}:{port}/{db_conn.database_name}"
         elif db_conn.database_type == DatabaseType.SQLITE:
             return f"sqlite:///{db_conn.database_name}"
         else:
             raise ValueError(f"Unsupported database type: {db_conn.database_type}")
     
-    def _get_engine(self, db_conn: DatabaseConnection) -> Engine:
-        """Get or create database engine for connection."""
-        conn_id = db_conn.id
-        if conn_id not in self.engine_cache:
-            conn_string = self._get_connection_string(db_conn)
+    def _get_engine(self, db_conn: DatabaseConnection, endpoint: Optional[Endpoint] = None) -> Engine:
+        """Get or create database engine for a connection endpoint."""
+        cache_key = endpoint.key if endpoint else db_conn.id
+        if cache_key not in self.engine_cache:
+            if endpoint:
+                conn_string = self._get_connection_string(db_conn, endpoint.host, endpoint.port)
+            else:
+                conn_string = self._get_connection_string(db_conn)
+            # Fetch tuning travels with every connection of the engine
+            options = fetch_options(db_conn.additional_params)
             # Add connection pool settings
             if db_conn.database_type != DatabaseType.SQLITE:
-                self.engine_cache[conn_id] = create_engine(
+                self.engine_cache[cache_key] = create_engine(
                     conn_string,
                     pool_size=5,
                     max_overflow=10,
-                    pool_pre_ping=True
+                    pool_pre_ping=True,
+                    execution_options={"fetch_options": options}
                 )
             else:
-                self.engine_cache[conn_id] = create_engine(conn_string)
-        return self.engine_cache[conn_id]
+                self.engine_cache[cache_key] = create_engine(
+                    conn_string,
+                    execution_options={"fetch_options": options}
+                )
+            install_cursor_tracking(self.engine_cache[cache_key])
+            install_fetch_tuning(self.engine_cache[cache_key], options)
+        engine = self.engine_cache[cache_key]
+        if endpoint and endpoint.probe is None:
+            endpoint.probe = lambda: self._ping(engine)
+        return engine
+    
+    def _get_session_engine(self, db_conn: DatabaseConnection) -> Engine:
+        """Engine without a pool for cursor sessions, which hold their connection between requests."""
+        cache_key = f"session:{db_conn.id}"
+        if cache_key not in self.engine_cache:
+            options = fetch_options(db_conn.additional_params)
+            self.engine_cache[cache_key] = create_engine(
+                self._get_connection_string(db_conn),
+                poolclass=NullPool,
+                execution_options={"fetch_options": options}
+            )
+            install_cursor_tracking(self.engine_cache[cache_key])
+            install_fetch_tuning(self.engine_cache[cache_key], options)
+        return self.engine_cache[cache_key]
     
     @staticmethod
-    def validate_and_prepare_query(sql_template: str, params: Dict[str, Any]) -> tuple[str, Dict[str, Any]]:
-        """
-        Validate and prepare SQL query with parameters.
-        Converts :param style to :param_name for SQLAlchemy.
+    def _ping(engine: Engine) -> None:
+        """Run the dialect's ping statement on a fresh checkout."""
+        with engine.connect() as conn:
+            engine.dialect.do_ping(conn.connection.dbapi_connection)
+    
+    @staticmethod
+    def _fetch(
+        conn: Connection,
+        statement: TextClause,
+        params: Dict[str, Any],
+        budget: Optional[ResultBudget] = None
+    ) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """Execute on a checked-out connection and fetch the rows in chunks, up to the budget."""
+        options: FetchOptions = conn.get_execution_options().get("fetch_options") or fetch_options(None)
+        with table_params(conn, statement, params) as (statement, params):
+            prepared_name = statement.get_execution_options().get("prepared_statement")
+            if prepared_name and supports_prepared(conn):
+                return execute_prepared(conn, prepared_name, statement, params, options.array_size, budget)
+            result = conn.execute(
+                statement, params, execution_options=options.execution_options(conn.dialect.name)
+            )
+            if not result.returns_rows:
+                return [], []
+            columns = list(result.keys())
+            rows = fetch_rows(
+                result.fetchmany, columns, options.array_size,
+                overlap=conn.dialect.name != "sqlite", budget=budget
+            )
+            if budget is not None and budget.truncated:
+                abandon_result(conn, result)
+            return columns, rows
+    
+    @staticmethod
+    def _run_statement(
+        engine: Engine,
+        statement: TextClause,
+        params: Dict[str, Any],
+        context: ExecutionContext,
+        limits: ResultBudget
+    ) -> Tuple[List[str], List[Dict[str, Any]], bool]:
+        """Run a statement on a pooled connection and fetch rows up to the limits (blocking).
+
+        Returns the columns, the rows and whether the result was truncated.
         """
-        # Find all parameters in the template
-        param_pattern = r':(\w+)'
-        template_params = set(re.findall(param_pattern, sql_template))
-        
-        # Check if all template parameters are provided
-        missing_params = template_params - set(params.keys())
-        if missing_params:
+        budget = ResultBudget(limits.max_rows, limits.max_bytes)
+        handle = context.handle(engine)
+        try:
+            with engine.connect() as conn:
+                handle.attach(conn)
+                try:
+                    columns, rows = QueryExecutorService._fetch(conn, statement, params, budget)
+                    return columns, rows, budget.truncated
+                finally:
+                    handle.detach()
+        except SQLAlchemyError:
+            # A statement timeout or cancel surfaces as a driver error
+            context.check_cancelled()
+            raise
+        finally:
+            context.release(handle)
+    
+    async def _run_on_endpoint(
+        self,
+        db_conn: DatabaseConnection,
+        endpoint: Endpoint,
+        statement: TextClause,
+        params: Dict[str, Any],
+        context: ExecutionContext,
+        limits: ResultBudget
+    ) -> Tuple[List[str], List[Dict[str, Any]], bool]:
+        """Run a statement against a checked-out endpoint and release it afterwards."""
+        try:
+            engine = self._get_engine(db_conn, endpoint)
+        except Exception as e:
+            replica_router.release(endpoint)
+            logger.error(f"Failed to create engine: {str(e)}")
             raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Missing required parameters: {', '.join(missing_params)}"
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to connect to database: {str(e)}"
             )
         
-        # Filter params to only include those used in template
-        filtered_params = {k: v for k, v in params.items() if k in template_params}
-        
-        return sql_template, filtered_params
+        started = time.perf_counter()
+        try:
+            result = await asyncio.to_thread(self._run_statement, engine, statement, params, context, limits)
+        except BaseException as e:
+            replica_router.release(endpoint)
+            # Statement errors say nothing about the endpoint; only unreachable replicas leave the rotation
+            if endpoint.role == EndpointRole.REPLICA and is_availability_error(e):
+                replica_router.mark_unhealthy(endpoint, str(e))
+            raise
+        replica_router.release(endpoint, (time.perf_counter() - started) * 1000)
+        return result
     
-    async def execute_query(
+    def _hedge_delay_ms(self, db_conn: DatabaseConnection, endpoint: Endpoint) -> Optional[float]:
+        """Latency after which a read is duplicated to a second replica, if hedging applies."""
+        if not settings.REPLICA_HEDGE_PERCENTILE or endpoint.role != EndpointRole.REPLICA:
+            return None
+        if replica_router.healthy_replica_count(db_conn) < 2:
+            return None
+        return endpoint.latency_percentile(settings.REPLICA_HEDGE_PERCENTILE)
+    
+    async def _run_hedged(
         self,
-        db: AsyncSession,
-        sql_template: str,
+        db_conn: DatabaseConnection,
+        endpoint: Endpoint,
+        statement: TextClause,
         params: Dict[str, Any],
-        params_info: Optional[Dict[str, Any]] = None,
-        database_connection: Optional[DatabaseConnection] = None
-    ) -> Dict[str, Any]:
-        """Execute a parameterized SQL query and return results."""
-        import logging
-        logger = logging.getLogger(__name__)
+        context: ExecutionContext,
+        limits: ResultBudget,
+        tried: List[Endpoint]
+    ) -> Tuple[List[str], List[Dict[str, Any]], bool]:
+        """Run on an endpoint and race a second replica if it is slower than usual."""
+        hedge_after = self._hedge_delay_ms(db_conn, endpoint)
+        if hedge_after is None:
+            return await self._run_on_endpoint(db_conn, endpoint, statement, params, context, limits)
         
-        start_time = time.time()
+        attempts = {}
+        first_context = context.child()
+        first = asyncio.ensure_future(self._run_on_endpoint(db_conn, endpoint, statement, params, first_context, limits))
+        attempts[first] = first_context
+        
+        done, _ = await asyncio.wait({first}, timeout=hedge_after / 1000)
+        if done:
+            return first.result()
+        
+        backup = replica_router.checkout(db_conn, exclude=tried)
+        if backup is None:
+            return await first
+        if backup.role != EndpointRole.REPLICA:
+            replica_router.release(backup)
+            return await first
+        tried.append(backup)
+        logger.info(f"Hedging query on {backup.key} after {hedge_after:.0f}ms on {endpoint.key}")
+        
+        backup_context = context.child()
+        second = asyncio.ensure_future(self._run_on_endpoint(db_conn, backup, statement, params, backup_context, limits))
+        attempts[second] = backup_context
+        
+        pending = {first, second}
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    # Abort the slower attempt on the server and drop its outcome
+                    for loser in pending:
+                        attempts[loser].cancel("hedge lost")
+                        loser.add_done_callback(lambda t: t.cancelled() or t.exception())
+                    return task.result()
+                error = task.exception()
+        raise error
+    
+    async def _await_with_deadline(
+        self,
+        context: ExecutionContext,
+        awaitable: Awaitable,
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None
+    ) -> Any:
+        """Wait for an execution, cancelling it on the server at the deadline or on disconnect."""
+        task = asyncio.ensure_future(awaitable)
+        poll_seconds = settings.QUERY_DISCONNECT_POLL_MS / 1000
+        while True:
+            wait_seconds = context.remaining_ms() / 1000
+            if is_disconnected:
+                wait_seconds = min(wait_seconds, poll_seconds)
+            done, _ = await asyncio.wait({task}, timeout=wait_seconds)
+            if done:
+                return task.result()
+            if context.expired():
+                context.cancel("deadline exceeded")
+                break
+            if is_disconnected and await is_disconnected():
+                context.cancel("client disconnected")
+                break
         
+        logger.warning(f"Cancelling query: {context.cancel_reason}")
+        # Give the driver a moment to abort the statement and hand the connection back
+        done, _ = await asyncio.wait({task}, timeout=settings.QUERY_CANCEL_GRACE_MS / 1000)
+        if not done:
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        elif not task.cancelled() and not isinstance(task.exception(), ExecutionCancelled):
+            # Finished (or failed for another reason) while being cancelled
+            return task.result()
+        raise context.cancel_error()
+    
+    async def _execute_routed(
+        self,
+        db_conn: DatabaseConnection,
+        statement: TextClause,
+        params: Dict[str, Any],
+        context: ExecutionContext,
+        limits: ResultBudget
+    ) -> Tuple[List[str], List[Dict[str, Any]], bool]:
+        """Execute a read on the best endpoint, failing over to the next one on connect errors."""
+        tried: List[Endpoint] = []
+        endpoint = replica_router.checkout(db_conn)
+        while True:
+            tried.append(endpoint)
+            try:
+                return await self._run_hedged(db_conn, endpoint, statement, params, context, limits, tried)
+            except SQLAlchemyError as e:
+                if not is_availability_error(e):
+                    raise
+                endpoint = replica_router.checkout(db_conn, exclude=tried)
+                if endpoint is None:
+                    raise
+                logger.warning(f"Failing over to {endpoint.key} for database connection {db_conn.id}")
+    
+    @staticmethod
+    def _check_connection(database_connection: Optional[DatabaseConnection]) -> None:
         # Check if we have a database connection
         if not database_connection:
             logger.error("No database connection provided")
@@ -111,6 +350,109 @@ class QueryExecutorService:
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Database connection is not active"
             )
+    
+    @staticmethod
+    def _allow_request(database_connection: DatabaseConnection) -> CircuitBreaker:
+        """Fail fast while the target database is known to be down."""
+        breaker = circuit_breakers.get(database_connection.id, name=database_connection.name)
+        try:
+            breaker.allow_request()
+        except CircuitOpenError as e:
+            logger.warning(f"Circuit open for database connection {database_connection.id}")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Target database is temporarily unavailable",
+                headers={"Retry-After": str(max(1, int(e.retry_after)))}
+            )
+        return breaker
+    
+    @staticmethod
+    async def _queue_slot(
+        db_conn: DatabaseConnection,
+        workspace: Optional[Workspace],
+        context: ExecutionContext,
+        units: int = 1
+    ) -> ExecutionSlot:
+        """Wait for the workspace's turn on the database connection, within the execution's deadline."""
+        try:
+            return await execution_scheduler.acquire(db_conn, workspace, context.remaining_ms(), units)
+        except ExecutionQueueFullError as e:
+            raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=str(e))
+    
+    @staticmethod
+    def _get_template(
+        sql_template: str,
+        params_info: Optional[Dict[str, Any]] = None,
+        version_id: Optional[int] = None
+    ) -> SqlTemplate:
+        try:
+            return sql_templates.get(sql_template, params_info, version_id)
+        except (ValueError, TypeError) as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid params_info for this query: {str(e)}"
+            )
+    
+    @staticmethod
+    def validate_and_prepare_query(
+        sql_template: str,
+        params: Dict[str, Any],
+        params_info: Optional[Dict[str, Any]] = None,
+        version_id: Optional[int] = None,
+        prepare: bool = False
+    ) -> tuple[TextClause, Dict[str, Any]]:
+        """
+        Validate and prepare SQL query with parameters.
+        The template is parsed once per query version; this only binds values.
+        With prepare, the statement is run as a server-side prepared statement where possible.
+        """
+        template = QueryExecutorService._get_template(sql_template, params_info, version_id)
+        try:
+            return template.statement_to_run(prepare), template.bind(params)
+        except (MissingParametersError, ParamValidationError) as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+    
+    async def execute_query(
+        self,
+        db: AsyncSession,
+        sql_template: str,
+        params: Dict[str, Any],
+        params_info: Optional[Dict[str, Any]] = None,
+        database_connection: Optional[DatabaseConnection] = None,
+        timeout_ms: Optional[int] = None,
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+        version_id: Optional[int] = None,
+        prepare: Optional[bool] = None,
+        page_size: Optional[int] = None,
+        cursor: Optional[str] = None,
+        order_key: Optional[List[str]] = None,
+        fields: Optional[List[str]] = None,
+        filters: Optional[List[Dict[str, Any]]] = None,
+        output_columns: Optional[Dict[str, str]] = None,
+        max_rows: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        workspace: Optional[Workspace] = None
+    ) -> Dict[str, Any]:
+        """
+        Execute a parameterized SQL query and return results.
+        The query is cancelled on the server once timeout_ms elapses or
+        is_disconnected reports that the client went away. prepare overrides
+        PREPARED_STATEMENTS_ENABLED for this call.
+        With page_size, only the page starting at cursor is computed and
+        returned, along with the next_cursor (keyset when order_key is set).
+        fields and filters narrow the result in the database; both are checked
+        against the query's declared output_columns.
+        Fetching stops at max_rows / max_bytes (capped by RESULT_MAX_ROWS /
+        RESULT_MAX_BYTES) and the result is marked truncated.
+        Executions wait for their workspace's turn on the database connection
+        (see execution_queue); the wait counts against timeout_ms.
+        """
+        start_time = time.time()
+        
+        self._check_connection(database_connection)
         
         try:
             logger.info(f"SQL template: {sql_template}")
@@ -118,68 +460,75 @@ class QueryExecutorService:
             logger.info(f"Params info: {params_info}")
             
             # Validate and prepare query
-            prepared_sql, prepared_params = self.validate_and_prepare_query(sql_template, params)
-            
-            logger.info(f"Prepared params: {prepared_params}")
-            
-            # Convert parameter types based on params_info
-            if params_info:
-                print(f"Params info: {params_info}")  # Debug log
-                print(f"Prepared params: {prepared_params}")  # Debug log
-                for param_name, param_value in prepared_params.items():
-                    if param_name in params_info and isinstance(params_info[param_name], dict):
-                        param_type = params_info[param_name].get("type", "string")
-                        
-                        # Type conversion
-                        if param_type == "date" and isinstance(param_value, str):
-                            try:
-                                prepared_params[param_name] = datetime.strptime(param_value, "%Y-%m-%d").date()
-                            except ValueError:
-                                raise HTTPException(
-                                    status_code=status.HTTP_400_BAD_REQUEST,
-                                    detail=f"Invalid date format for parameter '{param_name}'. Expected YYYY-MM-DD"
-                                )
-                        elif param_type == "integer":
-                            try:
-                                prepared_params[param_name] = int(param_value)
-                            except ValueError:
-                                raise HTTPException(
-                                    status_code=status.HTTP_400_BAD_REQUEST,
-                                    detail=f"Invalid integer value for parameter '{param_name}'"
-                                )
-                        elif param_type == "float":
-                            try:
-                                prepared_params[param_name] = float(param_value)
-                            except ValueError:
-                                raise HTTPException(
-                                    status_code=status.HTTP_400_BAD_REQUEST,
-                                    detail=f"Invalid float value for parameter '{param_name}'"
-                                )
+            statement, prepared_params = self.validate_and_prepare_query(
+                sql_template, params, params_info, version_id,
+                prepare=settings.PREPARED_STATEMENTS_ENABLED if prepare is None else prepare
+            )
             
-            # Execute query using the database connection
-            logger.info(f"Getting engine for database connection {database_connection.id}")
+            projection = page = None
             try:
-                engine = self._get_engine(database_connection)
-            except Exception as e:
-                logger.error(f"Failed to create engine: {str(e)}")
+                if fields or filters:
+                    projection = Projection(output_columns, fields, filters)
+                if page_size:
+                    page = PageRequest(page_size, cursor, order_key, version_id)
+                if projection is not None or page is not None:
+                    template = self._get_template(sql_template, params_info, version_id)
+                    statement = template.view_statement(DIALECTS[database_connection.database_type], projection, page)
+                    prepared_params.update(template.view_params(projection, page))
+            except ValueError as e:
                 raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail=f"Failed to connect to database: {str(e)}"
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=str(e)
                 )
             
-            logger.info("Executing query...")
-            with engine.connect() as conn:
-                stmt = text(prepared_sql)
-                result = conn.execute(stmt, prepared_params)
-                
-                # Fetch results
-                columns = list(result.keys())
-                rows = result.fetchall()
+            logger.info(f"Prepared params: {prepared_params}")
+            
+            context = ExecutionContext(timeout_ms or resolve_timeout_ms(None))
+            slot = await self._queue_slot(database_connection, workspace, context)
+            try:
+                breaker = self._allow_request(database_connection)
                 
-                # Convert to list of dicts
-                data = [dict(zip(columns, row)) for row in rows]
+                logger.info(f"Executing query with {context.remaining_ms()} ms left of its deadline...")
+                call_started = time.perf_counter()
+                try:
+                    columns, data, truncated = await self._await_with_deadline(
+                        context,
+                        self._execute_routed(
+                            database_connection, statement, prepared_params, context, result_budget(max_rows, max_bytes)
+                        ),
+                        is_disconnected
+                    )
+                except DeadlineExceeded:
+                    # Counts towards the slow call rate, not the failure rate
+                    breaker.record_success((time.perf_counter() - call_started) * 1000)
+                    raise
+                except SQLAlchemyError as e:
+                    if is_availability_error(e):
+                        breaker.record_failure((time.perf_counter() - call_started) * 1000, str(e))
+                    else:
+                        # The database answered; the query itself is at fault
+                        breaker.record_success((time.perf_counter() - call_started) * 1000)
+                    raise
+                except BaseException:
+                    breaker.release()
+                    raise
+                breaker.record_success((time.perf_counter() - call_started) * 1000)
+            finally:
+                slot.release()
                 
             logger.info(f"Query executed successfully, fetched {len(data)} rows")
+            if truncated:
+                logger.warning(f"Result truncated at {len(data)} rows by the result budget")
+            
+            next_cursor = None
+            if page is not None:
+                try:
+                    data, next_cursor = page.finish(data, truncated)
+                except ValueError as e:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail=str(e)
+                    )
             
             # Calculate execution time
             execution_time = int((time.time() - start_time) * 1000)
@@ -187,20 +536,451 @@ class QueryExecutorService:
             return {
                 "executed_at": datetime.utcnow(),
                 "row_count": len(data),
+                "columns": columns,
                 "data": data,
-                "execution_time_ms": execution_time
+                "execution_time_ms": execution_time,
+                "next_cursor": next_cursor,
+                "truncated": truncated
             }
             
+        except HTTPException:
+            raise
+        except DeadlineExceeded as e:
+            raise HTTPException(
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                detail=str(e)
+            )
+        except ClientDisconnected:
+            raise HTTPException(
+                status_code=499,
+                detail="Client closed request"
+            )
         except SQLAlchemyError as e:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Query execution error: {str(e)}"
             )
         except Exception as e:
-            import traceback
-            error_detail = f"Unexpected error: {str(e)}\nTraceback: {traceback.format_exc()}"
-            print(f"Query execution error: {error_detail}")  # Log to console
+            logger.exception(f"Query execution error: {str(e)}")
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Unexpected error: {str(e)}"
-            )
\ No newline at end of file
+            )
+    
+    @staticmethod
+    def _run_batch_worker(
+        engine: Engine,
+        statement: TextClause,
+        queue: Deque[Tuple[int, Dict[str, Any]]],
+        results: List[Optional[Dict[str, Any]]],
+        context: ExecutionContext,
+        budget: ResultBudget
+    ) -> None:
+        """Run queued parameter sets one after another on a single pooled connection (blocking).
+
+        All sets draw from one budget; once it is spent, the remaining sets come back truncated.
+        """
+        with engine.connect() as conn:
+            while not context.cancel_reason and not context.expired():
+                try:
+                    index, params = queue.popleft()
+                except IndexError:
+                    return
+                handle = context.handle(engine)
+                started = time.perf_counter()
+                try:
+                    handle.attach(conn)
+                    try:
+                        columns, rows = QueryExecutorService._fetch(conn, statement, params, budget)
+                    finally:
+                        handle.detach()
+                    results[index] = {
+                        "index": index,
+                        "row_count": len(rows),
+                        "columns": columns,
+                        "data": rows,
+                        "execution_time_ms": int((time.perf_counter() - started) * 1000),
+                        "truncated": budget.truncated
+                    }
+                except SQLAlchemyError as e:
+                    context.check_cancelled()
+                    results[index] = {
+                        "index": index,
+                        "error": f"Query execution error: {str(e)}",
+                        "status_code": status.HTTP_400_BAD_REQUEST
+                    }
+                    if conn.invalidated:
+                        # The connection is gone; leave the rest of the queue to the other workers
+                        raise
+                finally:
+                    context.release(handle)
+                # End the read transaction so the next set gets a fresh snapshot and timeout
+                conn.rollback()
+    
+    async def execute_batch(
+        self,
+        sql_template: str,
+        param_sets: List[Dict[str, Any]],
+        params_info: Optional[Dict[str, Any]] = None,
+        database_connection: Optional[DatabaseConnection] = None,
+        timeout_ms: Optional[int] = None,
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+        version_id: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        prepare: Optional[bool] = None,
+        max_rows: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        workspace: Optional[Workspace] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Execute one query for many parameter sets.
+        Sets are validated with the version's compiled validator, then run on at
+        most ``concurrency`` pooled connections, each working through a shared
+        queue. One deadline covers the whole batch. Every set gets either a
+        result or an error; only an open circuit or a client disconnect fails
+        the batch as a whole. The result budget covers the whole batch.
+        """
+        self._check_connection(database_connection)
+        template = self._get_template(sql_template, params_info, version_id)
+        statement = template.statement_to_run(settings.PREPARED_STATEMENTS_ENABLED if prepare is None else prepare)
+        
+        results: List[Optional[Dict[str, Any]]] = [None] * len(param_sets)
+        queue: Deque[Tuple[int, Dict[str, Any]]] = deque()
+        for index, params in enumerate(param_sets):
+            try:
+                queue.append((index, template.bind(params)))
+            except (MissingParametersError, ParamValidationError) as e:
+                results[index] = {"index": index, "error": str(e), "status_code": status.HTTP_400_BAD_REQUEST}
+        
+        if queue:
+            context = ExecutionContext(timeout_ms or resolve_timeout_ms(None))
+            workers = min(concurrency or settings.BATCH_CONCURRENCY, len(queue))
+            # The batch holds one slot per connection it runs on
+            try:
+                slot = await self._queue_slot(database_connection, workspace, context, workers)
+            except DeadlineExceeded as e:
+                raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=str(e))
+            try:
+                breaker = self._allow_request(database_connection)
+                budget = result_budget(max_rows, max_bytes)
+                logger.info(f"Executing batch of {len(queue)} parameter sets on {workers} connections")
+                
+                async def run_worker() -> None:
+                    endpoint = replica_router.checkout(database_connection)
+                    started = time.perf_counter()
+                    try:
+                        engine = self._get_engine(database_connection, endpoint)
+                        await asyncio.to_thread(
+                            self._run_batch_worker, engine, statement, queue, results, context, budget
+                        )
+                    except SQLAlchemyError as e:
+                        if endpoint.role == EndpointRole.REPLICA and is_availability_error(e):
+                            replica_router.mark_unhealthy(endpoint, str(e))
+                        raise
+                    finally:
+                        replica_router.release(endpoint, (time.perf_counter() - started) * 1000)
+                
+                call_started = time.perf_counter()
+                outcomes: List[Any] = []
+                try:
+                    outcomes = await self._await_with_deadline(
+                        context,
+                        asyncio.gather(*[run_worker() for _ in range(workers)], return_exceptions=True),
+                        is_disconnected
+                    )
+                except DeadlineExceeded:
+                    pass
+                except ClientDisconnected:
+                    breaker.release()
+                    raise HTTPException(status_code=499, detail="Client closed request")
+                
+                errors = [o for o in outcomes if isinstance(o, BaseException)]
+                availability_errors = [e for e in errors if is_availability_error(e)]
+                if availability_errors:
+                    breaker.record_failure((time.perf_counter() - call_started) * 1000, str(availability_errors[0]))
+                else:
+                    breaker.record_success((time.perf_counter() - call_started) * 1000)
+                
+                # Sets that never ran: the deadline passed or every connection failed
+                if context.cancel_reason or context.expired():
+                    error, code = str(context.cancel_error()), status.HTTP_504_GATEWAY_TIMEOUT
+                elif errors:
+                    error, code = f"Database unavailable: {str(errors[0])}", status.HTTP_503_SERVICE_UNAVAILABLE
+                else:
+                    error, code = "Not executed", status.HTTP_500_INTERNAL_SERVER_ERROR
+                for index, result in enumerate(results):
+                    if result is None:
+                        results[index] = {"index": index, "error": error, "status_code": code}
+            finally:
+                slot.release()
+        
+        return results
+    
+    async def export_copy(
+        self,
+        sql_template: str,
+        params: Dict[str, Any],
+        params_info: Optional[Dict[str, Any]] = None,
+        database_connection: Optional[DatabaseConnection] = None,
+        export_format: str = "csv",
+        timeout_ms: Optional[int] = None,
+        version_id: Optional[int] = None,
+        workspace: Optional[Workspace] = None
+    ) -> CopyStream:
+        """
+        Export a query's full result with PostgreSQL COPY.
+        Returns once the first chunk has arrived, so failures before any output
+        still raise HTTPException; the returned stream yields the raw COPY
+        output. The export holds its execution slot until the stream ends or
+        is closed, and closing it early cancels the COPY on the server.
+        timeout_ms can shorten EXPORT_TIMEOUT_MS, which bounds the queue wait
+        and the whole export.
+        """
+        self._check_connection(database_connection)
+        if database_connection.database_type != DatabaseType.POSTGRESQL:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="COPY export is only available for PostgreSQL connections"
+            )
+        statement, prepared_params = self.validate_and_prepare_query(
+            sql_template, params, params_info, version_id
+        )
+        
+        context = ExecutionContext(min(timeout_ms or settings.EXPORT_TIMEOUT_MS, settings.EXPORT_TIMEOUT_MS))
+        try:
+            slot = await self._queue_slot(database_connection, workspace, context)
+        except DeadlineExceeded as e:
+            raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=str(e))
+        try:
+            breaker = self._allow_request(database_connection)
+        except BaseException:
+            slot.release()
+            raise
+        
+        endpoint = replica_router.checkout(database_connection)
+        try:
+            engine = self._get_engine(database_connection, endpoint)
+        except Exception as e:
+            replica_router.release(endpoint)
+            breaker.release()
+            slot.release()
+            logger.error(f"Failed to create engine: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to connect to database: {str(e)}"
+            )
+        
+        pipe = CopyPipe(context)
+        started = time.perf_counter()
+        streaming = False
+        
+        def finish(error: Optional[BaseException] = None) -> None:
+            slot.release()
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            replica_router.release(endpoint, None if error else elapsed_ms)
+            if error is not None and is_availability_error(error):
+                breaker.record_failure(elapsed_ms, str(error))
+            else:
+                breaker.record_success(elapsed_ms)
+            if streaming and isinstance(error, Exception):
+                logger.error(f"COPY export failed after output started: {str(error)}")
+        
+        stream = CopyStream(pipe, context, finish)
+        threading.Thread(
+            target=run_copy,
+            args=(engine, statement, prepared_params, export_format, context, pipe),
+            name=f"copy-export-{database_connection.id}",
+            daemon=True
+        ).start()
+        try:
+            await stream.open()
+        except BaseException as e:
+            await stream.aclose()
+            if isinstance(e, DeadlineExceeded):
+                raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=str(e))
+            if is_availability_error(e):
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail=f"Database unavailable: {str(e)}"
+                )
+            if isinstance(e, (SQLAlchemyError, engine.dialect.dbapi.Error)):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Query execution error: {str(e)}"
+                )
+            raise
+        streaming = True
+        return stream
+    
+    @staticmethod
+    def _open_cursor(
+        engine: Engine,
+        session: CursorSession,
+        statement: TextClause,
+        params: Dict[str, Any],
+        context: ExecutionContext,
+        size: int
+    ) -> Tuple[List[Dict[str, Any]], bool]:
+        """Run a session's statement on its dedicated connection and fetch the first chunk (blocking)."""
+        handle = context.handle(engine)
+        try:
+            session.conn = engine.connect()
+            # The deadline covers this call only; later pulls must not inherit a statement timeout
+            handle.attach(session.conn, apply_timeout=False)
+            try:
+                statement, params = session.resources.enter_context(table_params(session.conn, statement, params))
+                session.result = session.conn.execute(
+                    statement, params, execution_options={"stream_results": True, "max_row_buffer": size + 1}
+                )
+                if not session.result.returns_rows:
+                    raise ValueError("The query does not return rows")
+                session.columns = list(session.result.keys())
+                return session.fetch(size)
+            finally:
+                handle.detach()
+        except SQLAlchemyError:
+            context.check_cancelled()
+            raise
+        finally:
+            context.release(handle)
+    
+    @staticmethod
+    def _session_error(e: BaseException) -> BaseException:
+        if isinstance(e, DeadlineExceeded):
+            return HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=str(e))
+        if isinstance(e, ClientDisconnected):
+            return HTTPException(status_code=499, detail="Client closed request")
+        if isinstance(e, CursorSessionNotFoundError):
+            return HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+        if isinstance(e, CursorSessionBusyError):
+            return HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+        if isinstance(e, CursorSessionFailedError):
+            return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        if isinstance(e, (SQLAlchemyError, ValueError)):
+            return HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Query execution error: {str(e)}"
+            )
+        return e
+    
+    async def open_session(
+        self,
+        sql_template: str,
+        params: Dict[str, Any],
+        query: Dict[str, Any],
+        params_info: Optional[Dict[str, Any]] = None,
+        database_connection: Optional[DatabaseConnection] = None,
+        chunk_rows: Optional[int] = None,
+        timeout_ms: Optional[int] = None,
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+        version_id: Optional[int] = None,
+        fields: Optional[List[str]] = None,
+        filters: Optional[List[Dict[str, Any]]] = None,
+        output_columns: Optional[Dict[str, str]] = None,
+        workspace: Optional[Workspace] = None
+    ) -> Dict[str, Any]:
+        """
+        Run a query once and keep its result open in a cursor session.
+        Returns the first chunk with the session_token to pull the next ones
+        with (None once the result is exhausted). query carries the query_id,
+        query_uuid and query_name echoed in every chunk. Only running the
+        query waits in the execution queue, not the later pulls.
+        """
+        start_time = time.time()
+        self._check_connection(database_connection)
+        statement, prepared_params = self.validate_and_prepare_query(sql_template, params, params_info, version_id)
+        if fields or filters:
+            try:
+                projection = Projection(output_columns, fields, filters)
+            except ValueError as e:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+            template = self._get_template(sql_template, params_info, version_id)
+            statement = template.view_statement(DIALECTS[database_connection.database_type], projection)
+            prepared_params.update(template.view_params(projection))
+        size = chunk_rows or settings.CURSOR_SESSION_CHUNK_ROWS
+        
+        context = ExecutionContext(timeout_ms or resolve_timeout_ms(None))
+        try:
+            slot = await self._queue_slot(database_connection, workspace, context)
+        except DeadlineExceeded as e:
+            raise self._session_error(e)
+        try:
+            breaker = self._allow_request(database_connection)
+            try:
+                session = cursor_sessions.reserve(database_connection, query)
+            except CursorSessionLimitError as e:
+                breaker.release()
+                raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=str(e))
+            
+            call_started = time.perf_counter()
+            try:
+                engine = self._get_session_engine(database_connection)
+                rows, done = await self._await_with_deadline(
+                    context,
+                    asyncio.to_thread(self._open_cursor, engine, session, statement, prepared_params, context, size),
+                    is_disconnected
+                )
+            except BaseException as e:
+                await cursor_sessions.discard(session)
+                elapsed_ms = (time.perf_counter() - call_started) * 1000
+                if is_availability_error(e):
+                    breaker.record_failure(elapsed_ms, str(e))
+                elif isinstance(e, (DeadlineExceeded, SQLAlchemyError, ValueError)):
+                    # The database answered or was merely slow
+                    breaker.record_success(elapsed_ms)
+                else:
+                    breaker.release()
+                raise self._session_error(e)
+            breaker.record_success((time.perf_counter() - call_started) * 1000)
+        finally:
+            slot.release()
+        if done:
+            await cursor_sessions.discard(session)
+        else:
+            cursor_sessions.start_spool(session)
+        
+        return {
+            "executed_at": datetime.utcnow(),
+            "row_count": len(rows),
+            "columns": session.columns,
+            "data": rows,
+            "execution_time_ms": int((time.time() - start_time) * 1000),
+            "session_token": None if done else session.token
+        }
+    
+    async def fetch_session(
+        self,
+        token: str,
+        chunk_rows: Optional[int] = None,
+        timeout_ms: Optional[int] = None,
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None
+    ) -> Dict[str, Any]:
+        """
+        Pull the next chunk of a cursor session from its spool, on whichever
+        worker the request lands; the session closes after its last chunk.
+        A pull that passes its deadline waiting for rows leaves the session open.
+        """
+        start_time = time.time()
+        size = chunk_rows or settings.CURSOR_SESSION_CHUNK_ROWS
+        context = ExecutionContext(timeout_ms or resolve_timeout_ms(None))
+        try:
+            query, columns, rows, done = await cursor_sessions.pull(token, size, context, is_disconnected)
+        except BaseException as e:
+            raise self._session_error(e)
+        
+        return {
+            **query,
+            "executed_at": datetime.utcnow(),
+            "row_count": len(rows),
+            "columns": columns,
+            "data": rows,
+            "execution_time_ms": int((time.time() - start_time) * 1000),
+            "session_token": None if done else token
+        }
+    
+    async def close_session(self, token: str) -> None:
+        """Close a cursor session before its result is exhausted."""
+        try:
+            await cursor_sessions.close(token)
+        except BaseException as e:
+            raise self._session_error(e)
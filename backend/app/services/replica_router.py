@@ -0,0 +1,167 @@
+"""
+Endpoint routing for database connections with read replicas.
+
+A DatabaseConnection's own host/port is its primary endpoint. Additional
+endpoints declared in ``DatabaseConnection.endpoints`` join the rotation for
+published (read-only) queries. Among healthy replicas the endpoint with the
+fewest outstanding requests relative to its weight is chosen; the primary is
+only used when no replica is available.
+"""
+import asyncio
+import json
+import logging
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+from app.models.database_connection import DatabaseConnection, EndpointRole
+
+logger = logging.getLogger(__name__)
+
+
+class Endpoint:
+    """A single host/port that can serve queries for a connection."""
+
+    def __init__(self, connection_id: int, host: str, port: int, weight: int, role: EndpointRole):
+        self.connection_id = connection_id
+        self.host = host
+        self.port = port
+        self.weight = weight
+        self.role = role
+        self.key = f"{connection_id}:{host}:{port}"
+
+        self.outstanding = 0
+        self.dispatched = 0
+        self.healthy = True
+        self.last_error: Optional[str] = None
+        self.latencies: Deque[float] = deque(maxlen=200)
+        # Set by the executor; runs a trivial query against this endpoint
+        self.probe: Optional[Callable[[], None]] = None
+
+    def latency_percentile(self, percentile: float, min_samples: int = 20) -> Optional[float]:
+        """Return the observed latency at the given percentile, in milliseconds."""
+        if len(self.latencies) < min_samples:
+            return None
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * percentile / 100))
+        return ordered[index]
+
+    def snapshot(self) -> Dict[str, Any]:
+        p95 = self.latency_percentile(95)
+        return {
+            "host": self.host,
+            "port": self.port,
+            "role": self.role.value,
+            "weight": self.weight,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "dispatched": self.dispatched,
+            "p95_latency_ms": round(p95, 1) if p95 is not None else None,
+            "last_error": self.last_error
+        }
+
+
+class ReplicaRouter:
+    """Least-outstanding-requests balancer over a connection's endpoints."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # connection id -> (config signature, endpoints)
+        self._endpoints: Dict[int, Tuple[str, List[Endpoint]]] = {}
+
+    @staticmethod
+    def _signature(db_conn: DatabaseConnection) -> str:
+        return json.dumps([db_conn.host, db_conn.port, db_conn.endpoints or []], sort_keys=True)
+
+    def endpoints_for(self, db_conn: DatabaseConnection) -> List[Endpoint]:
+        """Return the endpoints of a connection, rebuilding them when its config changed."""
+        signature = self._signature(db_conn)
+        cached = self._endpoints.get(db_conn.id)
+        if cached and cached[0] == signature:
+            return cached[1]
+
+        with self._lock:
+            cached = self._endpoints.get(db_conn.id)
+            if cached and cached[0] == signature:
+                return cached[1]
+
+            endpoints = [Endpoint(db_conn.id, db_conn.host, db_conn.port, 1, EndpointRole.PRIMARY)]
+            for config in db_conn.endpoints or []:
+                endpoints.append(Endpoint(
+                    db_conn.id,
+                    config["host"],
+                    int(config["port"]),
+                    int(config.get("weight", 1)),
+                    EndpointRole(config.get("role", EndpointRole.REPLICA.value))
+                ))
+            self._endpoints[db_conn.id] = (signature, endpoints)
+            return endpoints
+
+    def checkout(self, db_conn: DatabaseConnection, exclude: Sequence[Endpoint] = ()) -> Optional[Endpoint]:
+        """Pick the endpoint for the next read and count it as outstanding.
+
+        Returns None if every candidate is excluded. Each checkout must be
+        paired with a release().
+        """
+        endpoints = self.endpoints_for(db_conn)
+        with self._lock:
+            candidates = [
+                e for e in endpoints
+                if e.role == EndpointRole.REPLICA and e.healthy and e.weight > 0 and e not in exclude
+            ]
+            if not candidates:
+                # Fall back to the primary; the connection's circuit breaker guards it
+                candidates = [e for e in endpoints if e.role == EndpointRole.PRIMARY and e not in exclude]
+            if not candidates:
+                return None
+            # Dispatch count breaks ties, giving weighted round robin when idle
+            endpoint = min(candidates, key=lambda e: ((e.outstanding + 1) / e.weight, e.dispatched / e.weight))
+            endpoint.outstanding += 1
+            endpoint.dispatched += 1
+            return endpoint
+
+    def healthy_replica_count(self, db_conn: DatabaseConnection) -> int:
+        return sum(
+            1 for e in self.endpoints_for(db_conn)
+            if e.role == EndpointRole.REPLICA and e.healthy and e.weight > 0
+        )
+
+    def release(self, endpoint: Endpoint, duration_ms: Optional[float] = None) -> None:
+        with self._lock:
+            endpoint.outstanding = max(0, endpoint.outstanding - 1)
+            if duration_ms is not None:
+                endpoint.latencies.append(duration_ms)
+
+    def mark_unhealthy(self, endpoint: Endpoint, error: str) -> None:
+        if endpoint.healthy:
+            logger.warning(f"Endpoint {endpoint.key} removed from rotation: {error}")
+        endpoint.healthy = False
+        endpoint.last_error = error
+
+    def mark_healthy(self, endpoint: Endpoint) -> None:
+        if not endpoint.healthy:
+            logger.info(f"Endpoint {endpoint.key} returned to rotation")
+        endpoint.healthy = True
+
+    async def check_health(self) -> None:
+        """Probe every known endpoint and update its rotation status."""
+        for _, endpoints in list(self._endpoints.values()):
+            for endpoint in endpoints:
+                if endpoint.probe is None:
+                    continue
+                try:
+                    await asyncio.to_thread(endpoint.probe)
+                    self.mark_healthy(endpoint)
+                except Exception as e:
+                    self.mark_unhealthy(endpoint, str(e))
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        return [
+            {"connection_id": connection_id, "endpoints": [e.snapshot() for e in endpoints]}
+            for connection_id, (_, endpoints) in list(self._endpoints.items())
+            if len(endpoints) > 1
+        ]
+
+
+# Shared by every QueryExecutorService instance in the worker
+replica_router = ReplicaRouter()
@@ -0,0 +1,81 @@
+"""
+Cache of fully encoded /execute response bodies.
+
+Hot published queries (materialized snapshots and queries with a result cache
+TTL) answer the same request many times a minute. Keeping the encoded body
+lets those requests skip response validation and JSON encoding entirely. The
+stored ETag lets clients revalidate with If-None-Match and get a 304.
+"""
+import hashlib
+import time
+from typing import Any, Dict, NamedTuple, Optional
+
+from fastapi import Response, status
+
+from app.core.config import settings
+from app.models.query import Query
+from app.services.result_cache import MemoryCache
+from app.services.snapshot_store import params_key
+
+
+class EncodedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    media_type: str
+    headers: Dict[str, str]
+
+
+def response_cache_key(
+    query: Query,
+    params: Dict[str, Any],
+    source: Any,
+    response_format: str = "json",
+    encoding: str = "identity"
+) -> str:
+    """Key for one encoded body; ``source`` identifies the data (snapshot time or "live")."""
+    # The name is part of the body and can change without a new version
+    name = hashlib.sha256(query.name.encode()).hexdigest()[:12]
+    return (
+        f"{query.id}:v{int(query.current_version_id or 0)}:{name}:{params_key(params)}:"
+        f"{source}:{response_format}:{encoding}"
+    )
+
+
+def make_etag(body: bytes) -> str:
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def encoded_response(
+    body: bytes,
+    media_type: str = "application/json",
+    headers: Optional[Dict[str, str]] = None
+) -> EncodedResponse:
+    return EncodedResponse(body, make_etag(body), media_type, headers or {})
+
+
+def to_response(encoded: EncodedResponse, if_none_match: Optional[str] = None) -> Response:
+    """Build a raw Response, or a 304 if the client already has this body."""
+    headers = {**encoded.headers, "ETag": encoded.etag}
+    if if_none_match and encoded.etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=encoded.body, media_type=encoded.media_type, headers=headers)
+
+
+class ResponseCache:
+    """Bounded TTL cache of encoded response bodies in this worker."""
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self._entries = MemoryCache(max_entries, max_bytes)
+
+    def get(self, key: str) -> Optional[EncodedResponse]:
+        return self._entries.get(key)
+
+    def put(self, key: str, encoded: EncodedResponse, ttl_seconds: float) -> None:
+        if ttl_seconds > 0:
+            self._entries.set(key, encoded, len(encoded.body), time.time() + ttl_seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return self._entries.snapshot()
+
+
+response_cache = ResponseCache(settings.RESPONSE_CACHE_MAX_ENTRIES, settings.RESPONSE_CACHE_MAX_BYTES)
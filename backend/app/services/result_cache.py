@@ -0,0 +1,263 @@
+"""
+Two-tier cache for live query results.
+
+L1 is an in-process LRU in each worker. L2 is shared by every worker on the
+host (a SQLite file by default) or by every host (a Redis-protocol server).
+Lookups go L1 -> L2 -> database; an L2 hit is promoted into L1. Values are
+stored in L2 as zlib-compressed JSON.
+
+Entries are keyed by query, version and parameters, so publishing a new
+version never serves results of the previous one.
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.services.result_encoder import to_jsonable
+from app.services.snapshot_store import params_key
+
+logger = logging.getLogger(__name__)
+
+
+def result_cache_key(query_id: int, version_id: Optional[int], params: Dict[str, Any]) -> str:
+    return f"result:{int(query_id)}:v{int(version_id or 0)}:{params_key(params)}"
+
+
+class TierStats:
+    """Counters for one cache tier in this worker."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.errors = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "errors": self.errors
+        }
+
+
+class MemoryCache:
+    """Per-process LRU bounded by entry count and encoded size."""
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.stats = TierStats()
+        self._lock = threading.Lock()
+        # key -> (expires_at, size, value)
+        self._entries: "OrderedDict[str, Tuple[float, int, Any]]" = OrderedDict()
+        self._bytes = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            expires_at, size, value = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                self._bytes -= size
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return value
+
+    def set(self, key: str, value: Any, size: int, expires_at: float) -> None:
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (expires_at, size, value)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.stats.evictions += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"backend": "memory", "entries": len(self._entries), "bytes": self._bytes, **self.stats.snapshot()}
+
+
+class SQLiteCacheBackend:
+    """Host-wide L2 tier in a SQLite file shared by all worker processes."""
+
+    name = "sqlite"
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.stats = TierStats()
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS result_cache ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, "
+                "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_result_cache_accessed_at ON result_cache (accessed_at)")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[bytes]:
+        conn = self._conn()
+        row = conn.execute("SELECT value, expires_at FROM result_cache WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        if row is None:
+            return None
+        if row[1] <= now:
+            conn.execute("DELETE FROM result_cache WHERE key = ?", (key,))
+            self.stats.expirations += 1
+            return None
+        conn.execute("UPDATE result_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def set(self, key: str, value: bytes, ttl_seconds: int) -> None:
+        conn = self._conn()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO result_cache (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+            (key, value, len(value), now + ttl_seconds, now)
+        )
+        self._evict(conn, now)
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        self.stats.expirations += conn.execute("DELETE FROM result_cache WHERE expires_at <= ?", (now,)).rowcount
+        (total,) = conn.execute("SELECT COALESCE(SUM(size), 0) FROM result_cache").fetchone()
+        if total <= self.max_bytes:
+            return
+        # Drop least recently used entries until the file is back under budget
+        for key, size in conn.execute("SELECT key, size FROM result_cache ORDER BY accessed_at").fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM result_cache WHERE key = ?", (key,))
+            total -= size
+            self.stats.evictions += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        try:
+            entries, size = self._conn().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM result_cache"
+            ).fetchone()
+        except sqlite3.Error:
+            entries = size = None
+        return {"backend": self.name, "entries": entries, "bytes": size, **self.stats.snapshot()}
+
+
+class RedisCacheBackend:
+    """L2 tier on any Redis-protocol server; requires the optional redis package."""
+
+    name = "redis"
+
+    def __init__(self, url: str):
+        import redis
+
+        self.stats = TierStats()
+        self._client = redis.Redis.from_url(url, socket_timeout=1, socket_connect_timeout=1)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._client.get(key)
+
+    def set(self, key: str, value: bytes, ttl_seconds: int) -> None:
+        # Expiry and eviction are handled by the server (maxmemory-policy)
+        self._client.set(key, value, ex=ttl_seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        try:
+            info = self._client.info()
+            server = {"entries": self._client.dbsize(), "bytes": info.get("used_memory"),
+                      "server_evictions": info.get("evicted_keys")}
+        except Exception:
+            server = {"entries": None, "bytes": None}
+        return {"backend": self.name, **server, **self.stats.snapshot()}
+
+
+def _create_backend() -> Optional[Any]:
+    backend = settings.RESULT_CACHE_BACKEND.lower()
+    if backend == "sqlite":
+        return SQLiteCacheBackend(settings.RESULT_CACHE_PATH, settings.RESULT_CACHE_MAX_BYTES)
+    if backend == "redis":
+        try:
+            return RedisCacheBackend(settings.RESULT_CACHE_REDIS_URL)
+        except ImportError:
+            logger.warning("RESULT_CACHE_BACKEND=redis but the redis package is not installed; L2 cache disabled")
+    return None
+
+
+class ResultCache:
+    """L1 in front of an optional shared L2."""
+
+    def __init__(self, l1: MemoryCache, l2: Optional[Any]):
+        self.l1 = l1
+        self.l2 = l2
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self.l1.get(key)
+        if value is not None or self.l2 is None:
+            return value
+        try:
+            payload = await asyncio.to_thread(self.l2.get, key)
+        except Exception as e:
+            self.l2.stats.errors += 1
+            logger.warning(f"L2 result cache read failed: {str(e)}")
+            return None
+        if payload is None:
+            self.l2.stats.misses += 1
+            return None
+        self.l2.stats.hits += 1
+        raw = zlib.decompress(payload)
+        value = json.loads(raw)
+        self.l1.set(key, value, len(raw), value["expires_at"])
+        return value
+
+    async def set(self, key: str, result: Dict[str, Any], ttl_seconds: int) -> Dict[str, Any]:
+        """Cache an execution result; returns the JSON-ready value that was stored."""
+        # Same encoding as live responses (bytes that are not UTF-8 as base64), so cached and live bodies match
+        value = to_jsonable(result)
+        value["expires_at"] = time.time() + ttl_seconds
+        raw = json.dumps(value, separators=(",", ":")).encode()
+        self.l1.set(key, value, len(raw), value["expires_at"])
+        if self.l2 is not None:
+            try:
+                await asyncio.to_thread(self.l2.set, key, zlib.compress(raw, 1), ttl_seconds)
+            except Exception as e:
+                self.l2.stats.errors += 1
+                logger.warning(f"L2 result cache write failed: {str(e)}")
+        return value
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"l1": self.l1.snapshot(), "l2": self.l2.snapshot() if self.l2 is not None else None}
+
+
+result_cache = ResultCache(
+    MemoryCache(settings.RESULT_CACHE_L1_MAX_ENTRIES, settings.RESULT_CACHE_L1_MAX_BYTES),
+    _create_backend()
+)
@@ -0,0 +1,110 @@
+"""
+Direct JSON encoding of query results.
+
+Returning ``QueryExecuteResponse`` from an endpoint makes FastAPI validate and
+convert every cell of every row before encoding. Result rows come straight
+from the database driver, so there is nothing to validate; this module hands
+them straight to pydantic-core's serializer, which writes Decimal, date and
+datetime, UUID, bytes and arbitrarily large ints in native code. The output
+matches what the response models produce.
+
+Results the serializer cannot write as valid JSON (bytes that are not UTF-8,
+NaN or infinite floats) go through the standard library encoder instead,
+which writes such bytes as base64 and non-finite floats as null.
+"""
+import base64
+import json
+import math
+import uuid
+from datetime import date, datetime, time, timezone
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Type
+
+from pydantic import BaseModel
+from pydantic_core import PydanticSerializationError, to_json, to_jsonable_python
+
+
+def _datetime(value: datetime) -> str:
+    text = value.isoformat()
+    # pydantic writes UTC as "Z"
+    if value.utcoffset() is not None and not value.utcoffset():
+        text = text[:-6] + "Z"
+    return text
+
+
+def _bytes(value: bytes) -> str:
+    try:
+        return value.decode("utf-8")
+    except UnicodeDecodeError:
+        return base64.b64encode(value).decode("ascii")
+
+
+_ENCODERS = {
+    Decimal: str,
+    datetime: _datetime,
+    date: date.isoformat,
+    time: time.isoformat,
+    uuid.UUID: str,
+    bytes: _bytes,
+    bytearray: _bytes,
+    memoryview: lambda v: _bytes(v.tobytes())
+}
+
+
+def _default(value: Any) -> Any:
+    encoder = _ENCODERS.get(type(value))
+    if encoder is not None:
+        return encoder(value)
+    for cls, encoder in _ENCODERS.items():
+        if isinstance(value, cls):
+            return encoder(value)
+    return to_jsonable_python(value)
+
+
+_fallback_encoder = json.JSONEncoder(default=_default, ensure_ascii=False, separators=(",", ":"))
+
+
+def _finite(value: Any) -> Any:
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {k: _finite(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_finite(v) for v in value]
+    return value
+
+
+def encode_json(value: Any) -> bytes:
+    """Encode result data (rows, or a response dict containing them) as JSON."""
+    try:
+        body = to_json(value, fallback=_default)
+    except PydanticSerializationError:
+        body = None
+    # A string containing "NaN" only costs a second, slower pass
+    if body is None or b"NaN" in body or b"Infinity" in body:
+        return _fallback_encoder.encode(_finite(value)).encode("utf-8")
+    return body
+
+
+def to_jsonable(value: Any) -> Any:
+    """Result data as the JSON-ready values encode_json writes, e.g. for storing it in a cache."""
+    try:
+        return to_jsonable_python(value, fallback=_default)
+    except (PydanticSerializationError, ValueError):
+        # bytes that are not UTF-8 (UnicodeDecodeError is a ValueError)
+        return json.loads(_fallback_encoder.encode(_finite(value)))
+
+
+def encode_response(model: Type[BaseModel], **fields: Any) -> bytes:
+    """Encode a response with the field order and defaults of ``model``, without validating it."""
+    return encode_json({
+        name: fields[name] if name in fields else info.get_default(call_default_factory=True)
+        for name, info in model.model_fields.items()
+    })
+
+
+def encode_ndjson(rows: Iterable[Dict[str, Any]]) -> bytes:
+    """Encode rows as newline-delimited JSON."""
+    lines: List[bytes] = [encode_json(row) for row in rows]
+    lines.append(b"")
+    return b"\n".join(lines)
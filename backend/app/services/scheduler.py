@@ -1,11 +1,18 @@
 from datetime import datetime
+from typing import Any, Dict, Optional
 import asyncio
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
 from app.core.database import AsyncSessionLocal
 from app.crud import query_crud, workspace_crud
 from app.models.query import QueryStatus
+from app.services.replica_router import replica_router
+from app.services.job_manager import job_manager
+from app.services.query_executor import QueryExecutorService
+from app.services.snapshot_store import decode_watermark, snapshot_store
 import logging
 
 logger = logging.getLogger(__name__)
@@ -16,6 +23,9 @@ class SchedulerService:
     
     def __init__(self):
         self.scheduler = AsyncIOScheduler()
+        self.query_executor = QueryExecutorService()
+        # Query id -> (refresh cron, full rebuild cron) of its materialization jobs
+        self.materialized_schedules: Dict[int, tuple] = {}
         
     async def cleanup_inactive_queries(self):
         """Clean up inactive queries based on workspace settings."""
@@ -56,6 +66,186 @@ class SchedulerService:
             except Exception as e:
                 logger.error(f"Error in cleanup task: {str(e)}")
     
+    async def check_replica_health(self):
+        """Probe database endpoints so failed replicas leave and recovered ones rejoin rotation."""
+        try:
+            await replica_router.check_health()
+        except Exception as e:
+            logger.error(f"Error in replica health check: {str(e)}")
+    
+    async def cleanup_expired_jobs(self):
+        """Remove asynchronous job results past their TTL, and fail jobs of stopped workers."""
+        try:
+            removed, kept = await asyncio.to_thread(job_manager.cleanup_expired)
+            if removed:
+                logger.info(f"Removed {removed} expired job results, {kept} remaining")
+            failed = await asyncio.to_thread(job_manager.fail_orphaned)
+            if failed:
+                logger.warning(f"Marked {failed} jobs of stopped server processes as failed")
+        except Exception as e:
+            logger.error(f"Error in job cleanup task: {str(e)}")
+    
+    async def sync_materializations(self):
+        """Keep one cron job per materialized query in step with the query settings."""
+        async with AsyncSessionLocal() as db:
+            try:
+                queries = await query_crud.get_materialized(db)
+            except Exception as e:
+                logger.error(f"Error loading materialized queries: {str(e)}")
+                return
+        
+        scheduled = set()
+        for query in queries:
+            materialization = query.execution_options["materialization"]
+            incremental = materialization.get("incremental")
+            schedule = (materialization["cron"], incremental["full_refresh_cron"] if incremental else None)
+            scheduled.add(query.id)
+            
+            if self.materialized_schedules.get(query.id) != schedule:
+                self._schedule_materialization(query.id, *schedule)
+                self.materialized_schedules[query.id] = schedule
+                logger.info(f"Scheduled materialization of query {query.id} with cron {schedule}")
+            
+            # Build missing snapshots now rather than at the next cron tick
+            param_sets = materialization.get("param_sets") or [{}]
+            if not all(snapshot_store.exists(query.id, query.current_version_id, p) for p in param_sets):
+                self.scheduler.add_job(
+                    self.refresh_materialization,
+                    args=[query.id],
+                    id=f"materialize_now_{query.id}",
+                    replace_existing=True
+                )
+        
+        for query_id in set(self.materialized_schedules) - scheduled:
+            self._schedule_materialization(query_id, None, None)
+            del self.materialized_schedules[query_id]
+            logger.info(f"Removed materialization schedule of query {query_id}")
+    
+    def _schedule_materialization(self, query_id: int, cron: Optional[str], full_refresh_cron: Optional[str]):
+        """Add, replace or remove the refresh and full rebuild jobs of a query."""
+        for job_id, expression, full_refresh in (
+            (f"materialize_{query_id}", cron, False),
+            (f"materialize_full_{query_id}", full_refresh_cron, True)
+        ):
+            if expression:
+                self.scheduler.add_job(
+                    self.refresh_materialization,
+                    CronTrigger.from_crontab(expression),
+                    args=[query_id, full_refresh],
+                    id=job_id,
+                    replace_existing=True,
+                    max_instances=1,
+                    coalesce=True
+                )
+            elif self.scheduler.get_job(job_id):
+                self.scheduler.remove_job(job_id)
+    
+    async def refresh_materialization(self, query_id: int, full_refresh: bool = False):
+        """Pre-execute a materialized query for each declared parameter set."""
+        with snapshot_store.refresh_lock(query_id) as acquired:
+            if not acquired:
+                logger.info(f"Materialization of query {query_id} already running, skipping")
+                return
+            
+            async with AsyncSessionLocal() as db:
+                query = await query_crud.get_with_workspace(db, id=query_id)
+            
+            materialization = (query.execution_options or {}).get("materialization") if query else None
+            if not materialization or query.status != QueryStatus.AVAILABLE:
+                return
+            
+            logger.info(f"Refreshing snapshots of query {query_id}")
+            for params in materialization.get("param_sets") or [{}]:
+                try:
+                    await self._refresh_snapshot(query, params, materialization.get("incremental"), full_refresh)
+                except Exception as e:
+                    logger.error(f"Error materializing query {query_id} with params {params}: {str(e)}")
+            
+            snapshot_store.prune(query.id, query.current_version_id)
+    
+    async def _refresh_snapshot(
+        self,
+        query,
+        params: Dict[str, Any],
+        incremental: Optional[Dict[str, Any]],
+        full_refresh: bool
+    ):
+        """Rebuild one snapshot, or append the rows past its watermark to it."""
+        previous_watermark = None
+        if incremental and not full_refresh:
+            # Only the previous snapshot's metadata is needed, not its rows
+            previous = await asyncio.to_thread(snapshot_store.open, query.id, query.current_version_id, params)
+            if previous is not None:
+                previous_watermark = decode_watermark(previous.metadata.get("watermark"))
+        
+        sql_template = query.sql_template
+        run_params = dict(params)
+        if previous_watermark is not None:
+            # With merge keys, re-read rows at the watermark too; they replace themselves
+            operator = ">=" if incremental.get("key_columns") else ">"
+            sql_template = (
+                f"SELECT * FROM ({sql_template.strip().rstrip(';')}) incremental_source "
+                f"WHERE {incremental['watermark_column']} {operator} :__watermark"
+            )
+            run_params["__watermark"] = previous_watermark
+        
+        result = await self.query_executor.execute_query(
+            None,
+            sql_template=sql_template,
+            params=run_params,
+            params_info=query.params_info,
+            database_connection=query.workspace.database_connection,
+            timeout_ms=settings.MATERIALIZE_TIMEOUT_MS,
+            # The incremental wrapper is a different statement from the version's own
+            version_id=None if previous_watermark is not None else query.current_version_id,
+            prepare=(query.execution_options or {}).get("prepare_statements"),
+            max_rows=(query.execution_options or {}).get("max_rows"),
+            max_bytes=(query.execution_options or {}).get("max_bytes"),
+            workspace=query.workspace
+        )
+        if result["truncated"]:
+            # A partial snapshot (or watermark) would silently drop rows; keep the previous one
+            raise ValueError(f"Result exceeded the result budget at {result['row_count']} rows")
+        
+        data = result["data"]
+        watermark = None
+        if incremental:
+            column = incremental["watermark_column"]
+            values = [row[column] for row in data if row.get(column) is not None]
+            if previous_watermark is not None:
+                values.append(previous_watermark)
+            watermark = max(values) if values else None
+        
+        if previous_watermark is not None:
+            row_count = await asyncio.to_thread(
+                snapshot_store.append,
+                query.id,
+                query.current_version_id,
+                params,
+                data,
+                result["execution_time_ms"],
+                result["executed_at"],
+                watermark,
+                incremental.get("key_columns")
+            )
+            logger.info(
+                f"Merged {result['row_count']} new rows into snapshot of query {query.id}, "
+                f"{row_count} rows total"
+            )
+            return
+        
+        await asyncio.to_thread(
+            snapshot_store.put,
+            query.id,
+            query.current_version_id,
+            params,
+            data,
+            result["execution_time_ms"],
+            result["executed_at"],
+            watermark,
+            result["columns"]
+        )
+    
     def start(self):
         """Start the scheduler."""
         # Schedule cleanup task to run daily at midnight
@@ -66,6 +256,34 @@ class SchedulerService:
             replace_existing=True
         )
         
+        self.scheduler.add_job(
+            self.check_replica_health,
+            IntervalTrigger(seconds=settings.REPLICA_HEALTH_CHECK_SECONDS),
+            id="check_replica_health",
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
+        )
+        
+        self.scheduler.add_job(
+            self.cleanup_expired_jobs,
+            IntervalTrigger(minutes=10),
+            id="cleanup_expired_jobs",
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
+        )
+        
+        self.scheduler.add_job(
+            self.sync_materializations,
+            IntervalTrigger(minutes=settings.MATERIALIZE_SYNC_MINUTES),
+            id="sync_materializations",
+            next_run_time=datetime.now(),
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
+        )
+        
         self.scheduler.start()
         logger.info("Scheduler started")
     
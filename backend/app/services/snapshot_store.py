@@ -0,0 +1,351 @@
+"""
+Local on-disk store for materialized query results.
+
+A snapshot holds the result of one query version for one parameter set. It
+is a manifest naming the snapshot's segments, in row order, with the
+snapshot's metadata:
+
+    <SNAPSHOT_DIR>/<query_id>/v<version_id>/<params_key>.json
+    <SNAPSHOT_DIR>/<query_id>/v<version_id>/<params_key>.<segment id>.mqc
+
+Segments use the columnar format in app.services.columnar and are never
+changed once written. A full refresh writes a single new segment; an
+incremental refresh appends the new rows as one more segment, and with merge
+keys rewrites only the segments that hold replaced rows, one column at a
+time. Past SNAPSHOT_MAX_SEGMENTS, the segments after the first are merged
+into one. The manifest is replaced atomically, so readers in any worker
+process on the host either see the previous snapshot or the new one, never
+a partial one. Workers share the mapped pages instead of each holding a
+decoded copy.
+"""
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+
+from app.core.config import settings
+from app.services.columnar import ColumnarReader, open_columnar, write_columnar, write_columns
+
+
+def params_key(params: Dict[str, Any]) -> str:
+    """Stable key for a parameter set, independent of key order."""
+    canonical = json.dumps(jsonable_encoder(params or {}), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()[:32]
+
+
+def encode_watermark(value: Any) -> Optional[Dict[str, Any]]:
+    """Serialize a watermark so it can be bound again with its original type."""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return {"type": "datetime", "value": value.isoformat()}
+    if isinstance(value, date):
+        return {"type": "date", "value": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"type": "decimal", "value": str(value)}
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return {"type": "string", "value": str(value)}
+    return {"type": "number", "value": value}
+
+
+def decode_watermark(encoded: Optional[Dict[str, Any]]) -> Any:
+    if not encoded:
+        return None
+    value = encoded["value"]
+    if encoded["type"] == "datetime":
+        return datetime.fromisoformat(value)
+    if encoded["type"] == "date":
+        return date.fromisoformat(value)
+    if encoded["type"] == "decimal":
+        return Decimal(value)
+    return value
+
+
+class SnapshotReader:
+    """The segments of one snapshot, read as a single result."""
+
+    def __init__(self, manifest: Dict[str, Any], segments: List[ColumnarReader]):
+        self.segment_names: List[str] = manifest["segments"]
+        self.segments = segments
+        self.metadata: Dict[str, Any] = manifest["metadata"]
+        self.columns: List[str] = manifest["columns"]
+        self.row_count = sum(segment.row_count for segment in segments)
+
+    def read_rows(self, start: int = 0, stop: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Decode rows [start, stop), touching only the segments of that range."""
+        stop = self.row_count if stop is None else min(stop, self.row_count)
+        rows: List[Dict[str, Any]] = []
+        first = 0
+        for segment in self.segments:
+            if start < first + segment.row_count and stop > first:
+                rows += segment.read_rows(max(start - first, 0), stop - first)
+            first += segment.row_count
+        return rows
+
+
+class SnapshotStore:
+    """Stores and serves pre-computed query results keyed by (query, params)."""
+
+    def __init__(self, snapshot_dir: str, cache_size: int = 128):
+        self.snapshot_dir = snapshot_dir
+        self._cache_size = cache_size
+        self._readers: "OrderedDict[Tuple, SnapshotReader]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _query_dir(self, query_id: int) -> str:
+        return os.path.join(self.snapshot_dir, str(int(query_id)))
+
+    def _version_dir(self, query_id: int, version_id: Optional[int]) -> str:
+        return os.path.join(self._query_dir(query_id), f"v{int(version_id or 0)}")
+
+    def _manifest_path(self, query_id: int, version_id: Optional[int], params: Dict[str, Any]) -> str:
+        return os.path.join(self._version_dir(query_id, version_id), f"{params_key(params)}.json")
+
+    def exists(self, query_id: int, version_id: Optional[int], params: Dict[str, Any]) -> bool:
+        return os.path.exists(self._manifest_path(query_id, version_id, params))
+
+    def _load(self, manifest_path: str) -> SnapshotReader:
+        stat = os.stat(manifest_path)
+        key = (manifest_path, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            reader = self._readers.get(key)
+            if reader is not None:
+                self._readers.move_to_end(key)
+                return reader
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        directory = os.path.dirname(manifest_path)
+        segments = [open_columnar(os.path.join(directory, name)) for name in manifest["segments"]]
+        reader = SnapshotReader(manifest, segments)
+        with self._lock:
+            self._readers[key] = reader
+            while len(self._readers) > self._cache_size:
+                self._readers.popitem(last=False)
+        return reader
+
+    def open(self, query_id: int, version_id: Optional[int], params: Dict[str, Any]) -> Optional[SnapshotReader]:
+        """Map the snapshot for reading row ranges; None if there is no snapshot."""
+        manifest_path = self._manifest_path(query_id, version_id, params)
+        # A refresh may drop the segments of the manifest just read; the next one names the new segments
+        for _ in range(2):
+            try:
+                return self._load(manifest_path)
+            except FileNotFoundError:
+                continue
+            except (OSError, ValueError, KeyError):
+                return None
+        return None
+
+    @staticmethod
+    def read(reader: SnapshotReader, offset: int = 0, limit: Optional[int] = None) -> Dict[str, Any]:
+        """Decode a mapped snapshot; only rows [offset, offset + limit) are read.
+
+        ``row_count`` is the size of the whole snapshot.
+        """
+        snapshot = dict(reader.metadata)
+        snapshot["snapshot_at"] = datetime.fromisoformat(snapshot["snapshot_at"])
+        snapshot["watermark"] = decode_watermark(snapshot.get("watermark"))
+        snapshot["row_count"] = reader.row_count
+        snapshot["columns"] = reader.columns
+        snapshot["data"] = reader.read_rows(offset, None if limit is None else offset + limit)
+        return snapshot
+
+    def get(
+        self,
+        query_id: int,
+        version_id: Optional[int],
+        params: Dict[str, Any],
+        offset: int = 0,
+        limit: Optional[int] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Return the snapshot for the given version and params, if one exists."""
+        reader = self.open(query_id, version_id, params)
+        if reader is None:
+            return None
+        return self.read(reader, offset, limit)
+
+    @staticmethod
+    def _metadata(
+        query_id: int,
+        version_id: Optional[int],
+        params: Dict[str, Any],
+        execution_time_ms: int,
+        snapshot_at: Optional[datetime],
+        watermark: Any
+    ) -> Dict[str, Any]:
+        return jsonable_encoder({
+            "query_id": query_id,
+            "version_id": version_id,
+            "params": params,
+            "snapshot_at": (snapshot_at or datetime.utcnow()).isoformat(),
+            "execution_time_ms": execution_time_ms,
+            "watermark": encode_watermark(watermark)
+        })
+
+    @staticmethod
+    def _segment_name(params: Dict[str, Any]) -> str:
+        return f"{params_key(params)}.{uuid.uuid4().hex[:16]}.mqc"
+
+    def _commit(
+        self,
+        query_id: int,
+        version_id: Optional[int],
+        params: Dict[str, Any],
+        columns: List[str],
+        segments: List[str],
+        metadata: Dict[str, Any]
+    ) -> None:
+        """Atomically point the snapshot at its new segments, then drop the segments it no longer uses."""
+        manifest_path = self._manifest_path(query_id, version_id, params)
+        tmp_path = f"{manifest_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"columns": columns, "segments": segments, "metadata": metadata}, f)
+        os.replace(tmp_path, manifest_path)
+        # Readers that mapped a dropped segment keep reading it until they let go
+        directory, prefix = os.path.dirname(manifest_path), f"{params_key(params)}."
+        for name in os.listdir(directory):
+            if name.startswith(prefix) and name.endswith(".mqc") and name not in segments:
+                try:
+                    os.remove(os.path.join(directory, name))
+                except OSError:
+                    pass
+
+    def put(
+        self,
+        query_id: int,
+        version_id: Optional[int],
+        params: Dict[str, Any],
+        data: List[Dict[str, Any]],
+        execution_time_ms: int,
+        snapshot_at: Optional[datetime] = None,
+        watermark: Any = None,
+        columns: Optional[List[str]] = None
+    ) -> None:
+        """Atomically replace the snapshot for a parameter set."""
+        directory = self._version_dir(query_id, version_id)
+        os.makedirs(directory, exist_ok=True)
+        if columns is None:
+            columns = list(data[0].keys()) if data else []
+        segment = self._segment_name(params)
+        write_columnar(os.path.join(directory, segment), columns, data)
+        self._commit(
+            query_id, version_id, params, columns, [segment],
+            self._metadata(query_id, version_id, params, execution_time_ms, snapshot_at, watermark)
+        )
+
+    def append(
+        self,
+        query_id: int,
+        version_id: Optional[int],
+        params: Dict[str, Any],
+        data: List[Dict[str, Any]],
+        execution_time_ms: int,
+        snapshot_at: Optional[datetime] = None,
+        watermark: Any = None,
+        key_columns: Optional[List[str]] = None
+    ) -> int:
+        """Add rows to an existing snapshot as a new segment; returns its new row count.
+
+        With key_columns, a new row replaces the existing row with the same key
+        (which moves to the end). Segments without replaced rows are kept as
+        they are; the others are rewritten one column at a time.
+        """
+        reader = self.open(query_id, version_id, params)
+        if reader is None:
+            raise ValueError("There is no snapshot to append to")
+        directory = self._version_dir(query_id, version_id)
+        columns = reader.columns
+        segments = list(reader.segment_names)
+        if key_columns:
+            # The last of several new rows with the same key wins
+            data = list({tuple(row.get(c) for c in key_columns): row for row in data}.values())
+            replaced = {tuple(row.get(c) for c in key_columns) for row in data}
+            for index, segment in enumerate(reader.segments):
+                keys = zip(*(segment.read_column(c) for c in key_columns))
+                keep = [i for i, key in enumerate(keys) if key not in replaced]
+                if len(keep) < segment.row_count:
+                    segments[index] = self._rewrite(directory, params, segment, keep)
+        if data:
+            segment = self._segment_name(params)
+            write_columnar(os.path.join(directory, segment), columns, data)
+            segments.append(segment)
+        segments = [name for name in segments if name is not None]
+        if len(segments) > settings.SNAPSHOT_MAX_SEGMENTS:
+            segments = segments[:1] + [self._concat(directory, params, columns, segments[1:])]
+        self._commit(
+            query_id, version_id, params, columns, segments,
+            self._metadata(query_id, version_id, params, execution_time_ms, snapshot_at, watermark)
+        )
+        return sum(open_columnar(os.path.join(directory, name)).row_count for name in segments)
+
+    def _rewrite(
+        self,
+        directory: str,
+        params: Dict[str, Any],
+        segment: ColumnarReader,
+        keep: List[int]
+    ) -> Optional[str]:
+        """Copy the kept rows of a segment into a new one; None if no row is kept."""
+        if not keep:
+            return None
+        def kept_values(column: str) -> List[Any]:
+            values = segment.read_column(column)
+            return [values[i] for i in keep]
+
+        name = self._segment_name(params)
+        write_columns(os.path.join(directory, name), segment.columns, kept_values, len(keep))
+        return name
+
+    def _concat(self, directory: str, params: Dict[str, Any], columns: List[str], names: List[str]) -> str:
+        """Merge segments into one, one column at a time."""
+        segments = [open_columnar(os.path.join(directory, name)) for name in names]
+        name = self._segment_name(params)
+        write_columns(
+            os.path.join(directory, name),
+            columns,
+            lambda column: [value for segment in segments for value in segment.read_column(column)],
+            sum(segment.row_count for segment in segments)
+        )
+        return name
+
+    def prune(self, query_id: int, keep_version_id: Optional[int]) -> None:
+        """Remove snapshots taken from versions other than the given one."""
+        keep = os.path.basename(self._version_dir(query_id, keep_version_id))
+        try:
+            entries = os.listdir(self._query_dir(query_id))
+        except OSError:
+            return
+        for entry in entries:
+            if entry.startswith("v") and entry != keep:
+                shutil.rmtree(os.path.join(self._query_dir(query_id), entry), ignore_errors=True)
+
+    @contextmanager
+    def refresh_lock(self, query_id: int) -> Iterator[bool]:
+        """Non-blocking per-query lock so only one worker refreshes at a time.
+
+        Yields True if the lock was acquired.
+        """
+        os.makedirs(self._query_dir(query_id), exist_ok=True)
+        with open(os.path.join(self._query_dir(query_id), ".lock"), "w") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+snapshot_store = SnapshotStore(settings.SNAPSHOT_DIR)
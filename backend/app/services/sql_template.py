@@ -0,0 +1,317 @@
+"""
+Parsed SQL templates, cached per query version.
+
+A template is tokenized once: string literals, quoted identifiers, comments,
+dollar-quoted bodies and ``::`` casts are skipped, and every remaining
+``:name`` becomes a bind parameter. Colons that are not bind parameters are
+escaped for SQLAlchemy, so ``'10:30'`` or ``created_at::date`` no longer read
+as parameters. The resulting TextClause is reused for every execution of the
+version; SQLAlchemy's per-engine compiled cache then skips recompiling it, so
+a request only has to bind its values.
+
+Array parameters are expanding binds, so ``id IN :ids`` (or ``IN (:ids)``)
+renders one placeholder per element. Lists are padded to the next power of
+two by repeating their last element, which leaves IN results unchanged and
+keeps the number of distinct SQL texts the database has to plan down to one
+per size bucket.
+
+Table parameters are not bound at all: ``:name`` is replaced with the name of
+the temp table their rows are loaded into (see table_params), which depends
+on the dialect, so those templates keep one statement per dialect.
+
+Paged, projected or filtered calls run the template wrapped in an outer
+SELECT (see pagination and projection); those statements are cached per
+dialect and shape as well.
+"""
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.sql.elements import TextClause
+from sqlalchemy.types import Boolean, Date, DateTime, Float, Integer, Numeric, String, Time, TypeEngine
+
+from app.services.pagination import LIMIT_PARAM, OFFSET_PARAM, PageRequest, paginate_sql, split_order_by
+from app.services.param_validators import ParamValidator, table_columns
+from app.services.projection import Projection
+from app.services.prepared_statements import statement_name
+from app.services.table_params import TableValue, temp_table_name
+
+_IDENTIFIER = re.compile(r"[A-Za-z_]\w*")
+_DOLLAR_TAG = re.compile(r"\$(?:[A-Za-z_]\w*)?\$")
+# Characters that can start something other than plain SQL text
+_SPECIAL = re.compile(r"['\"`:$/\-\\]")
+
+# params_info "type" -> SQLAlchemy bind type
+PARAM_TYPES: Dict[str, TypeEngine] = {
+    "string": String(),
+    "integer": Integer(),
+    "float": Float(),
+    "decimal": Numeric(),
+    "boolean": Boolean(),
+    "date": Date(),
+    "datetime": DateTime(),
+    "time": Time()
+}
+
+
+class MissingParametersError(ValueError):
+    def __init__(self, names: List[str]):
+        self.names = names
+        super().__init__(f"Missing required parameters: {', '.join(names)}")
+
+
+def _escape_colons(segment: str) -> str:
+    return segment.replace(":", "\\:")
+
+
+def _follows_word(sql: str, position: int) -> bool:
+    return position > 0 and (sql[position - 1].isalnum() or sql[position - 1] == "_")
+
+
+def parse_template(sql: str) -> Tuple[str, List[str]]:
+    """Return the SQL with non-parameter colons escaped, and the parameter names in order."""
+    out: List[str] = []
+    names: List[str] = []
+    i, n = 0, len(sql)
+    while i < n:
+        match = _SPECIAL.search(sql, i)
+        if match is None:
+            out.append(sql[i:])
+            break
+        start = match.start()
+        out.append(sql[i:start])
+        c = sql[start]
+
+        if c in "'\"`":
+            # Quoted literal or identifier; a doubled quote is an escaped quote
+            end = start + 1
+            while end < n:
+                if sql[end] == c:
+                    if end + 1 < n and sql[end + 1] == c:
+                        end += 2
+                        continue
+                    break
+                end += 1
+            i = min(end + 1, n)
+            out.append(_escape_colons(sql[start:i]))
+        elif sql.startswith("--", start):
+            end = sql.find("\n", start)
+            i = n if end < 0 else end
+            out.append(_escape_colons(sql[start:i]))
+        elif sql.startswith("/*", start):
+            end = sql.find("*/", start + 2)
+            i = n if end < 0 else end + 2
+            out.append(_escape_colons(sql[start:i]))
+        elif c == "$" and (tag := _DOLLAR_TAG.match(sql, start)) and not _follows_word(sql, start):
+            # PostgreSQL dollar-quoted string: $$...$$ or $tag$...$tag$
+            end = sql.find(tag.group(), tag.end())
+            i = n if end < 0 else end + len(tag.group())
+            out.append(_escape_colons(sql[start:i]))
+        elif sql.startswith("\\:", start):
+            # Already escaped by the author
+            out.append("\\:")
+            i = start + 2
+        elif sql.startswith("::", start):
+            out.append("\\:\\:")
+            i = start + 2
+        elif c == ":":
+            name = _IDENTIFIER.match(sql, start + 1)
+            if name and not _follows_word(sql, start):
+                if name.group() not in names:
+                    names.append(name.group())
+                out.append(":" + name.group())
+                i = name.end()
+            else:
+                out.append("\\:")
+                i = start + 1
+        else:
+            out.append(c)
+            i = start + 1
+    return "".join(out), names
+
+
+def size_bucket(size: int) -> int:
+    """Smallest power of two that holds ``size`` elements."""
+    return 1 << max(size - 1, 0).bit_length()
+
+
+def pad_to_bucket(values: List[Any]) -> List[Any]:
+    if not values:
+        return values
+    return values + [values[-1]] * (size_bucket(len(values)) - len(values))
+
+
+class SqlTemplate:
+    """One parsed query template with its reusable statement and parameter validator."""
+
+    def __init__(self, sql: str, params_info: Optional[Dict[str, Any]] = None):
+        self.sql = sql
+        self.params_info = params_info
+        self.normalized_sql, self.param_names = parse_template(sql)
+        self.param_types: Dict[str, TypeEngine] = {}
+        self.array_params: List[str] = []
+        self.table_params: Dict[str, Dict[str, str]] = {}
+        for name in self.param_names:
+            info = (params_info or {}).get(name)
+            if not isinstance(info, dict):
+                continue
+            if info.get("type") == "table":
+                self.table_params[name] = table_columns(info)
+            elif info.get("type") == "array":
+                self.array_params.append(name)
+                item_type = (info.get("items") or {}).get("type", "string")
+                if item_type in PARAM_TYPES:
+                    self.param_types[name] = PARAM_TYPES[item_type]
+            elif info.get("type") in PARAM_TYPES:
+                self.param_types[name] = PARAM_TYPES[info["type"]]
+        for name in self.array_params:
+            # The expansion supplies its own parentheses
+            self.normalized_sql = re.sub(rf"\(\s*:{name}\s*\)", f":{name}", self.normalized_sql)
+        self._bindparams = [
+            bindparam(name, type_=self.param_types.get(name), expanding=name in self.array_params)
+            for name in self.param_names
+            if name in self.param_types or name in self.array_params
+        ]
+        self._dialect_statements: Dict[str, TextClause] = {}
+        self._view_statements: Dict[Tuple[Any, ...], TextClause] = {}
+        self.statement: TextClause = (
+            self.statement_for("default") if self.table_params
+            else text(self.normalized_sql).bindparams(*self._bindparams)
+        )
+        self.validator = ParamValidator(params_info, self.param_names)
+        # SQL that varies per call cannot be prepared once
+        self.prepared_statement: Optional[TextClause] = None
+        if not self.array_params and not self.table_params:
+            self.prepared_statement = self.statement.execution_options(
+                prepared_statement=statement_name(self.normalized_sql, params_info)
+            )
+
+    def statement_to_run(self, prepare: bool = False) -> TextClause:
+        return self.prepared_statement if prepare and self.prepared_statement is not None else self.statement
+
+    def _sql_for(self, dialect: str) -> str:
+        sql = self.normalized_sql
+        for name in self.table_params:
+            table_name = temp_table_name(name, dialect)
+            sql = re.sub(rf"(?<![\\\w]):{name}(?!\w)", lambda _: table_name, sql)
+        return sql
+
+    def statement_for(self, dialect: str) -> TextClause:
+        """The statement with table parameters named as temp tables of the given dialect."""
+        if not self.table_params:
+            return self.statement
+        statement = self._dialect_statements.get(dialect)
+        if statement is None:
+            statement = text(self._sql_for(dialect)).bindparams(*self._bindparams)
+            self._dialect_statements[dialect] = statement
+        return statement
+
+    def view_statement(
+        self,
+        dialect: str,
+        projection: Optional[Projection] = None,
+        page: Optional[PageRequest] = None
+    ) -> TextClause:
+        """The statement narrowed to a projection and/or one page, for the given dialect.
+
+        Raises ValueError for a page of a query without a stable row order, or
+        for keyset pages whose projection leaves out the ordering key.
+        """
+        if page is not None and projection is not None:
+            page.check_fields(projection.fields)
+        key = (
+            dialect,
+            projection.key if projection is not None else None,
+            (tuple(page.order_key), page.first_page) if page is not None else None
+        )
+        statement = self._view_statements.get(key)
+        if statement is None:
+            # The query's own ORDER BY moves to the outermost SELECT
+            sql, order_by = split_order_by(self._sql_for(dialect), dialect)
+            binds = list(self._bindparams)
+            if projection is not None:
+                # A page is ordered by columns the fields may leave out, so it selects the fields itself
+                sql = projection.wrap(sql, project=page is None)
+                binds += [
+                    bindparam(name, type_=PARAM_TYPES[type_name], expanding=expanding)
+                    for name, type_name, expanding in projection.binds()
+                ]
+            if page is not None:
+                sql = paginate_sql(
+                    sql, dialect, page.order_key, page.first_page, order_by,
+                    projection.fields if projection is not None else None
+                )
+                binds.append(bindparam(LIMIT_PARAM, type_=Integer()))
+                if not page.order_key and not page.first_page:
+                    binds.append(bindparam(OFFSET_PARAM, type_=Integer()))
+            elif order_by:
+                sql += f" ORDER BY {order_by}"
+            # Table names are already resolved for this dialect (see table_params)
+            statement = text(sql).bindparams(*binds).execution_options(rendered_for=dialect)
+            self._view_statements[key] = statement
+        return statement
+
+    @staticmethod
+    def view_params(projection: Optional[Projection] = None, page: Optional[PageRequest] = None) -> Dict[str, Any]:
+        """Values for the binds that view_statement adds."""
+        values: Dict[str, Any] = {}
+        if projection is not None:
+            values.update(projection.bind_params())
+            for name, _, expanding in projection.binds():
+                if expanding:
+                    values[name] = pad_to_bucket(values[name])
+        if page is not None:
+            values.update(page.bind_params())
+        return values
+
+    def bind(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Validate and select the values for this template's parameters.
+
+        Raises ParamValidationError or MissingParametersError.
+        """
+        params = self.validator.validate(params)
+        missing = [name for name in self.param_names if name not in params]
+        if missing:
+            raise MissingParametersError(missing)
+        values = {name: params[name] for name in self.param_names}
+        for name in self.array_params:
+            if isinstance(values[name], (list, tuple)):
+                values[name] = pad_to_bucket(list(values[name]))
+        for name, columns in self.table_params.items():
+            values[name] = TableValue(name, columns, values[name] or [], self)
+        return values
+
+
+class SqlTemplateCache:
+    """LRU of parsed templates keyed by query version (or by the SQL text itself)."""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._templates: "OrderedDict[Hashable, SqlTemplate]" = OrderedDict()
+
+    def get(
+        self,
+        sql: str,
+        params_info: Optional[Dict[str, Any]] = None,
+        version_id: Optional[int] = None
+    ) -> SqlTemplate:
+        key: Hashable = ("version", version_id) if version_id is not None else ("sql", sql)
+        with self._lock:
+            template = self._templates.get(key)
+            # A version's SQL can still be edited in place; check before reusing
+            if template is not None and template.sql == sql and template.params_info == params_info:
+                self._templates.move_to_end(key)
+                return template
+        template = SqlTemplate(sql, params_info)
+        with self._lock:
+            self._templates[key] = template
+            self._templates.move_to_end(key)
+            while len(self._templates) > self.max_entries:
+                self._templates.popitem(last=False)
+        return template
+
+
+sql_templates = SqlTemplateCache()
@@ -0,0 +1,215 @@
+"""
+Table-valued query parameters.
+
+A params_info entry of type ``table`` takes a list of rows (a JSON array, or
+an uploaded CSV or Arrow file) and is exposed to the SQL template as a table:
+
+    "keys": {"type": "table", "columns": {"customer_id": "integer"}}
+
+    SELECT o.* FROM orders o JOIN :keys k ON k.customer_id = o.customer_id
+
+Before the statement runs, the rows are bulk-loaded into a temp table on the
+same pooled connection using the fastest path the driver has: COPY on
+PostgreSQL, fast_executemany on SQL Server, and batched executemany (array
+DML on Oracle, multi-row INSERT on MySQL) elsewhere. The table is dropped
+again before the connection goes back to the pool.
+"""
+import csv
+import io
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import column, table
+from sqlalchemy.engine import Connection
+from sqlalchemy.sql.elements import TextClause
+from sqlalchemy.types import (
+    BigInteger, Boolean, Date, DateTime, Float, Numeric, String, Time, TypeEngine
+)
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:
+    pyarrow = None
+
+# params_info column type -> temp table column type
+COLUMN_TYPES: Dict[str, TypeEngine] = {
+    "string": String(4000),
+    "integer": BigInteger(),
+    "float": Float(),
+    "decimal": Numeric(38, 10),
+    "boolean": Boolean(),
+    "date": Date(),
+    "datetime": DateTime(),
+    "time": Time()
+}
+
+ARROW_CONTENT_TYPES = ("application/vnd.apache.arrow.file", "application/vnd.apache.arrow.stream")
+ARROW_EXTENSIONS = (".arrow", ".arrows", ".feather")
+
+_INSERT_BATCH_ROWS = 10000
+
+
+class TableValue:
+    """Validated rows of one table-valued parameter."""
+
+    def __init__(self, name: str, columns: Dict[str, str], rows: List[Tuple[Any, ...]], template: Any):
+        self.name = name
+        self.columns = columns
+        self.rows = rows
+        # The SqlTemplate that renders the table name for each dialect
+        self.template = template
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+
+def temp_table_name(name: str, dialect: str) -> str:
+    """Name the template's ``:name`` is replaced with on the given dialect."""
+    if dialect == "mssql":
+        return f"#tvp_{name}"
+    if dialect == "oracle":
+        # Private temporary tables (Oracle 18c+) must carry this prefix
+        return f"ORA$PTT_TVP_{name.upper()}"
+    return f"tvp_{name}"
+
+
+def _drop_if_exists(conn: Connection, name: str, quoted: str) -> None:
+    dialect = conn.dialect.name
+    if dialect == "mysql":
+        conn.exec_driver_sql(f"DROP TEMPORARY TABLE IF EXISTS {quoted}")
+    elif dialect == "mssql":
+        conn.exec_driver_sql(f"IF OBJECT_ID('tempdb..{name}') IS NOT NULL DROP TABLE {quoted}")
+    elif dialect == "oracle":
+        try:
+            conn.exec_driver_sql(f"DROP TABLE {quoted}")
+        except Exception:
+            pass
+    else:
+        conn.exec_driver_sql(f"DROP TABLE IF EXISTS {quoted}")
+
+
+def _create(conn: Connection, quoted: str, column_ddl: str) -> None:
+    dialect = conn.dialect.name
+    if dialect == "postgresql":
+        conn.exec_driver_sql(f"CREATE TEMPORARY TABLE {quoted} ({column_ddl}) ON COMMIT DROP")
+    elif dialect == "oracle":
+        conn.exec_driver_sql(
+            f"CREATE PRIVATE TEMPORARY TABLE {quoted} ({column_ddl}) ON COMMIT DROP DEFINITION"
+        )
+    elif dialect == "mssql":
+        conn.exec_driver_sql(f"CREATE TABLE {quoted} ({column_ddl})")
+    else:
+        conn.exec_driver_sql(f"CREATE TEMPORARY TABLE {quoted} ({column_ddl})")
+
+
+def _copy_rows(conn: Connection, quoted: str, column_list: str, rows: List[Tuple[Any, ...]]) -> None:
+    # Strings are quoted so "" stays an empty string; None is written unquoted and loads as NULL
+    buffer = io.StringIO()
+    csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC).writerows(rows)
+    buffer.seek(0)
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {quoted} ({column_list}) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+
+
+def _fast_executemany(conn: Connection, quoted: str, column_list: str, rows: List[Tuple[Any, ...]]) -> None:
+    placeholders = ", ".join("?" for _ in rows[0])
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.fast_executemany = True
+        for start in range(0, len(rows), _INSERT_BATCH_ROWS):
+            cursor.executemany(
+                f"INSERT INTO {quoted} ({column_list}) VALUES ({placeholders})",
+                rows[start:start + _INSERT_BATCH_ROWS]
+            )
+    finally:
+        cursor.close()
+
+
+def load_table(conn: Connection, value: TableValue) -> None:
+    """Create the temp table for a table-valued parameter and bulk-load its rows."""
+    dialect = conn.dialect
+    preparer = dialect.identifier_preparer
+    name = temp_table_name(value.name, dialect.name)
+    quoted = preparer.quote(name)
+    column_list = ", ".join(preparer.quote(c) for c in value.columns)
+    column_ddl = ", ".join(
+        f"{preparer.quote(c)} {COLUMN_TYPES[t].compile(dialect=dialect)}" for c, t in value.columns.items()
+    )
+
+    _drop_if_exists(conn, name, quoted)
+    _create(conn, quoted, column_ddl)
+    if not value.rows:
+        return
+    if dialect.name == "postgresql" and dialect.driver == "psycopg2":
+        _copy_rows(conn, quoted, column_list, value.rows)
+    elif dialect.name == "mssql" and dialect.driver == "pyodbc":
+        _fast_executemany(conn, quoted, column_list, value.rows)
+    else:
+        target = table(name, *[column(c) for c in value.columns])
+        names = list(value.columns)
+        for start in range(0, len(value.rows), _INSERT_BATCH_ROWS):
+            conn.execute(
+                target.insert(),
+                [dict(zip(names, row)) for row in value.rows[start:start + _INSERT_BATCH_ROWS]]
+            )
+
+
+def drop_table(conn: Connection, value: TableValue) -> None:
+    """Drop a loaded temp table so the pooled connection is clean for its next user."""
+    if conn.dialect.name == "postgresql" or conn.invalidated:
+        # ON COMMIT DROP removes it when the transaction ends
+        return
+    name = temp_table_name(value.name, conn.dialect.name)
+    try:
+        _drop_if_exists(conn, name, conn.dialect.identifier_preparer.quote(name))
+    except Exception:
+        # A session we cannot clean up must not be reused
+        conn.invalidate()
+
+
+@contextmanager
+def table_params(
+    conn: Connection,
+    statement: TextClause,
+    params: Dict[str, Any]
+) -> Iterator[Tuple[TextClause, Dict[str, Any]]]:
+    """Load the table-valued parameters of a call and yield the statement and values to run."""
+    tables = [value for value in params.values() if isinstance(value, TableValue)]
+    if not tables:
+        yield statement, params
+        return
+    if statement.get_execution_options().get("rendered_for") != conn.dialect.name:
+        statement = tables[0].template.statement_for(conn.dialect.name)
+    loaded: List[TableValue] = []
+    try:
+        for value in tables:
+            loaded.append(value)
+            load_table(conn, value)
+        yield (
+            statement,
+            {name: value for name, value in params.items() if not isinstance(value, TableValue)}
+        )
+    finally:
+        for value in loaded:
+            drop_table(conn, value)
+
+
+def parse_table_upload(content: bytes, filename: Optional[str], content_type: Optional[str]) -> List[Dict[str, Any]]:
+    """Read the rows of an uploaded CSV file (with a header row) or Arrow IPC file."""
+    if content_type in ARROW_CONTENT_TYPES or (filename or "").lower().endswith(ARROW_EXTENSIONS):
+        if pyarrow is None:
+            raise ValueError("Arrow uploads need the pyarrow package on the server")
+        try:
+            arrow_table = pyarrow.ipc.open_file(pyarrow.BufferReader(content)).read_all()
+        except pyarrow.ArrowInvalid:
+            arrow_table = pyarrow.ipc.open_stream(pyarrow.BufferReader(content)).read_all()
+        return arrow_table.to_pylist()
+    try:
+        text = content.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise ValueError("CSV uploads must be UTF-8 encoded")
+    return list(csv.DictReader(io.StringIO(text)))
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Compare result serialization throughput of the pydantic response path and the
+direct encoder used by the execute endpoints.
+
+Usage: python benchmark_serialization.py [rows] [repeats]
+"""
+import asyncio
+import sys
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.schemas import QueryExecuteResponse
+from app.services.result_encoder import encode_response
+
+
+def make_rows(count: int):
+    base = datetime(2024, 1, 1, 9, 30)
+    return [
+        {
+            "id": i,
+            "order_uuid": uuid.UUID(int=i),
+            "customer": f"customer-{i % 1000}",
+            "amount": Decimal(f"{i % 10000}.{i % 100:02d}"),
+            "quantity": i % 17,
+            "ratio": i / 7,
+            "ordered_on": date(2024, 1, 1) + timedelta(days=i % 365),
+            "updated_at": base + timedelta(seconds=i),
+            "payload": b"raw-bytes",
+            "big_counter": 2 ** 64 + i,
+            "note": None
+        }
+        for i in range(count)
+    ]
+
+
+def response_fields(rows):
+    return {
+        "query_id": 1,
+        "query_uuid": uuid.uuid4(),
+        "query_name": "benchmark",
+        "executed_at": datetime.utcnow(),
+        "row_count": len(rows),
+        "data": rows,
+        "execution_time_ms": 10
+    }
+
+
+async def pydantic_path(field, fields) -> bytes:
+    """What FastAPI does for an endpoint returning QueryExecuteResponse."""
+    content = await serialize_response(field=field, response_content=QueryExecuteResponse(**fields))
+    return JSONResponse(content=content).body
+
+
+def measure(name, rows, repeats, fn):
+    best = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        body = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{name:<10} {best * 1000:9.1f} ms  {rows / best:12,.0f} rows/sec  {len(body):,} bytes")
+    return body, best
+
+
+def main():
+    row_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    rows = make_rows(row_count)
+    fields = response_fields(rows)
+    field = create_response_field(name="response", type_=QueryExecuteResponse)
+    loop = asyncio.new_event_loop()
+
+    print(f"Serializing {row_count:,} rows, best of {repeats}")
+    slow_body, slow = measure("pydantic", row_count, repeats, lambda: loop.run_until_complete(pydantic_path(field, fields)))
+    fast_body, fast = measure("direct", row_count, repeats, lambda: encode_response(QueryExecuteResponse, **fields))
+    print(f"Speedup: {slow / fast:.1f}x, identical output: {slow_body == fast_body}")
+
+
+if __name__ == "__main__":
+    main()
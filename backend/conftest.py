@@ -0,0 +1,169 @@
+"""
+Shared fixtures for the backend tests.
+
+The tests run the executor against a throwaway SQLite target database, so
+they need neither the application database nor a running server.
+"""
+import asyncio
+import itertools
+import os
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+
+os.environ.setdefault("JWT_SECRET_KEY", "test")
+os.environ.setdefault("SECRET_KEY", "test")
+# The tests run in one process, which gets the whole capacity of per-host limits
+os.environ.setdefault("WEB_CONCURRENCY", "1")
+
+from app.core.security import encrypt_password
+from app.models.database_connection import DatabaseType
+
+# Circuit breakers, engines and queues are keyed by connection id; every test gets fresh ones
+_connection_ids = itertools.count(10000)
+
+ROW_COUNT = 1000
+
+
+def make_connection(database_name: str, **fields):
+    """A DatabaseConnection stand-in for a target database."""
+    values = {
+        "id": next(_connection_ids),
+        "name": "test",
+        "database_type": DatabaseType.SQLITE,
+        "host": "localhost",
+        "port": 0,
+        "database_name": database_name,
+        "username": "",
+        "password_encrypted": encrypt_password("test"),
+        "is_active": True,
+        "endpoints": None,
+        "additional_params": None
+    }
+    values.update(fields)
+    return SimpleNamespace(**values)
+
+
+@pytest.fixture
+def target_db(tmp_path) -> str:
+    """SQLite database with a table t(id, name, amount, day) of ROW_COUNT rows."""
+    path = str(tmp_path / "target.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, name TEXT, amount REAL, day TEXT)")
+    conn.executemany(
+        "INSERT INTO t VALUES (?, ?, ?, ?)",
+        [(i, f"n{i % 5}", i * 1.5, f"2024-01-{i % 28 + 1:02d}") for i in range(1, ROW_COUNT + 1)]
+    )
+    conn.commit()
+    conn.close()
+    return path
+
+
+@pytest.fixture
+def db_conn(target_db):
+    return make_connection(target_db)
+
+
+@pytest.fixture
+def executor():
+    from app.services.query_executor import QueryExecutorService
+    service = QueryExecutorService()
+    yield service
+    for engine in service.engine_cache.values():
+        engine.dispose()
+
+
+@pytest.fixture(autouse=True)
+def storage_dirs(tmp_path, monkeypatch):
+    """Keep job results, snapshots, cursor sessions and the result cache of each test in its own directory."""
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "JOB_RESULT_DIR", str(tmp_path / "jobs"))
+    monkeypatch.setattr(settings, "SNAPSHOT_DIR", str(tmp_path / "snapshots"))
+    from app.services.snapshot_store import snapshot_store
+    monkeypatch.setattr(snapshot_store, "snapshot_dir", settings.SNAPSHOT_DIR)
+    monkeypatch.setattr(settings, "RESULT_CACHE_PATH", str(tmp_path / "result_cache.sqlite3"))
+    monkeypatch.setattr(settings, "CURSOR_SESSION_DIR", str(tmp_path / "cursor_sessions"))
+
+
+def _uuid_columns_as_text() -> None:
+    """Let SQLite create the models' PostgreSQL UUID columns; SQLAlchemy stores the values as hex strings."""
+    from sqlalchemy.dialects.postgresql import UUID
+    from sqlalchemy.ext.compiler import compiles
+
+    @compiles(UUID, "sqlite")
+    def _compile_uuid(type_, compiler, **kw):
+        return "CHAR(32)"
+
+
+@pytest.fixture
+def app_db(tmp_path):
+    """Session factory for an application database in SQLite, with every table created.
+
+    Connections are not pooled, so each asyncio.run of a test gets its own.
+    """
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+    from sqlalchemy.pool import NullPool
+    from app.core.database import Base
+    import app.models  # noqa: F401 - registers the tables
+
+    _uuid_columns_as_text()
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'app.sqlite3'}", poolclass=NullPool)
+
+    async def create_tables():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    asyncio.run(create_tables())
+    yield async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False, autoflush=False)
+    asyncio.run(engine.dispose())
+
+
+def call_api(app_db, method, url, **kwargs):
+    """Send one request to the app, with the application database in app_db."""
+    import httpx
+    from app.core.database import get_db
+    from app.main import app
+
+    async def get_test_db():
+        async with app_db() as session:
+            yield session
+
+    async def request():
+        app.dependency_overrides[get_db] = get_test_db
+        try:
+            async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+                return await client.request(method, url, **kwargs)
+        finally:
+            app.dependency_overrides.pop(get_db, None)
+
+    return asyncio.run(request())
+
+
+def add_published_query(app_db, target_db, sql_template, **fields):
+    """Add an available query on the target database, in a workspace of its own; returns its uuid.
+
+    The ids are unique across tests, since engines, breakers and caches of
+    the app are keyed by them.
+    """
+    from app.models import DatabaseConnection, Query, Workspace
+    from app.models.query import QueryStatus
+    from app.models.workspace import WorkspaceType
+
+    async def add():
+        async with app_db() as session:
+            connection_id = next(_connection_ids)
+            connection = DatabaseConnection(
+                id=connection_id, name=f"target-{connection_id}", database_type=DatabaseType.SQLITE, host="localhost",
+                port=0, database_name=target_db, username="", password_encrypted=encrypt_password("x")
+            )
+            workspace = Workspace(name="reports", type=WorkspaceType.GROUP, owner_id="admin", database_connection=connection)
+            query = Query(
+                id=next(_connection_ids), name="report", sql_template=sql_template, workspace=workspace,
+                status=QueryStatus.AVAILABLE, created_by="admin", **fields
+            )
+            session.add_all([workspace, query])
+            await session.commit()
+            return query.uuid
+
+    return asyncio.run(add())
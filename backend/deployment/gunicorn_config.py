@@ -2,13 +2,16 @@
 Gunicorn configuration file for production deployment
 """
 import multiprocessing
+import os
 
 # Server socket
 bind = "0.0.0.0:8006"
 backlog = 2048
 
 # Worker processes
-workers = multiprocessing.cpu_count() * 2 + 1
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+# Workers split per-host limits such as the execution queue capacity by this count
+os.environ["WEB_CONCURRENCY"] = str(workers)
 worker_class = "uvicorn.workers.UvicornWorker"
 worker_connections = 1000
 timeout = 30
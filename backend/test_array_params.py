@@ -0,0 +1,33 @@
+"""Array parameters: IN lists bound as expanding parameters."""
+import pytest
+
+from conftest import add_published_query, call_api
+
+PARAMS_INFO = {"ids": {"type": "array", "items": {"type": "integer"}, "max_items": 10}}
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT id FROM t WHERE id IN :ids ORDER BY id",
+    "SELECT id FROM t WHERE id IN (:ids) ORDER BY id"
+])
+def test_in_lists_match_their_elements(app_db, target_db, sql):
+    query_uuid = add_published_query(app_db, target_db, sql, params_info=PARAMS_INFO)
+
+    def ids(value):
+        response = call_api(app_db, "POST", f"/api/v1/execute/{query_uuid}", json={"params": {"ids": value}})
+        assert response.status_code == 200, response.text
+        return [row["id"] for row in response.json()["data"]]
+
+    # Padding the list to its size bucket adds no rows
+    assert ids([7, 3, 5]) == [3, 5, 7]
+    assert ids("9, 2") == [2, 9]
+    assert ids([]) == []
+
+
+def test_array_elements_are_validated(app_db, target_db):
+    query_uuid = add_published_query(
+        app_db, target_db, "SELECT id FROM t WHERE id IN :ids", params_info=PARAMS_INFO
+    )
+    for value in (["x"], list(range(11))):
+        response = call_api(app_db, "POST", f"/api/v1/execute/{query_uuid}", json={"params": {"ids": value}})
+        assert response.status_code == 400
@@ -0,0 +1,30 @@
+"""Batch execution: one result or error per parameter set."""
+from app.core.config import settings
+from conftest import add_published_query, call_api
+
+PARAMS_INFO = {"min_id": {"type": "integer", "min": 1}}
+
+
+def test_each_parameter_set_gets_its_own_result(app_db, target_db):
+    query_uuid = add_published_query(
+        app_db, target_db, "SELECT id FROM t WHERE id >= :min_id ORDER BY id", params_info=PARAMS_INFO
+    )
+    response = call_api(app_db, "POST", f"/api/v1/execute/{query_uuid}/batch", json={
+        "param_sets": [{"min_id": 998}, {"min_id": 0}, {}, {"min_id": "1000"}]
+    })
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["succeeded"], body["failed"]) == (2, 2)
+    results = body["results"]
+    assert [result["index"] for result in results] == [0, 1, 2, 3]
+    assert results[0]["data"] == [{"id": 998}, {"id": 999}, {"id": 1000}]
+    assert results[3]["row_count"] == 1
+    for failed in results[1:3]:
+        assert failed["status_code"] == 400 and "min_id" in failed["error"] and "data" not in failed
+
+
+def test_oversized_batch_is_rejected(app_db, target_db, monkeypatch):
+    monkeypatch.setattr(settings, "BATCH_MAX_PARAM_SETS", 2)
+    query_uuid = add_published_query(app_db, target_db, "SELECT 1")
+    response = call_api(app_db, "POST", f"/api/v1/execute/{query_uuid}/batch", json={"param_sets": [{}, {}, {}]})
+    assert response.status_code == 400
@@ -0,0 +1,37 @@
+"""Query bundles: one NDJSON line per query, errors included."""
+import json
+import uuid
+
+from conftest import add_published_query, call_api
+
+
+def bundle_lines(response):
+    return sorted((json.loads(line) for line in response.text.splitlines()), key=lambda line: line["index"])
+
+
+def test_each_query_gets_a_line(app_db, target_db):
+    query_uuid = add_published_query(
+        app_db, target_db, "SELECT id FROM t WHERE id <= :max_id ORDER BY id",
+        params_info={"max_id": {"type": "integer"}}
+    )
+    missing = uuid.uuid4()
+    response = call_api(app_db, "POST", "/api/v1/execute/bundle", json={"queries": [
+        {"query_id": str(query_uuid), "params": {"max_id": 2}},
+        {"query_id": str(missing)},
+        {"query_id": str(query_uuid), "params": {"max_id": "x"}}
+    ]})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    first, not_found, invalid = bundle_lines(response)
+    assert first["data"] == [{"id": 1}, {"id": 2}] and first["query_uuid"] == str(query_uuid)
+    assert (not_found["status_code"], not_found["query_uuid"]) == (404, str(missing))
+    assert invalid["status_code"] == 400 and "max_id" in json.dumps(invalid["error"])
+
+
+def test_queries_of_different_workspaces_are_rejected(app_db, target_db):
+    first = add_published_query(app_db, target_db, "SELECT 1")
+    second = add_published_query(app_db, target_db, "SELECT 2")
+    response = call_api(app_db, "POST", "/api/v1/execute/bundle", json={
+        "queries": [{"query_id": str(first)}, {"query_id": str(second)}]
+    })
+    assert response.status_code == 400
@@ -0,0 +1,83 @@
+"""Circuit breaker behaviour of the query executor against a SQLite target."""
+import asyncio
+import sqlite3
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeoutError
+
+from app.services.circuit_breaker import CircuitBreaker, CircuitOpenError, CircuitState, circuit_breakers
+from app.services.db_errors import is_availability_error
+from conftest import make_connection
+
+
+def run(executor, db_conn, sql, **kwargs):
+    return asyncio.run(executor.execute_query(None, sql_template=sql, params={}, database_connection=db_conn, **kwargs))
+
+
+def test_breaker_opens_on_failure_rate():
+    breaker = CircuitBreaker("db", minimum_calls=4, window_size=4, open_duration_seconds=60)
+    for _ in range(2):
+        breaker.allow_request()
+        breaker.record_success(5)
+    for _ in range(2):
+        breaker.allow_request()
+        breaker.record_failure(5, "refused")
+    assert breaker.state == CircuitState.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.allow_request()
+
+
+def test_breaker_half_open_probe_closes(monkeypatch):
+    breaker = CircuitBreaker("db", minimum_calls=2, window_size=2, open_duration_seconds=0.01)
+    for _ in range(2):
+        breaker.allow_request()
+        breaker.record_failure(5, "refused")
+    assert breaker.state == CircuitState.OPEN
+    asyncio.run(asyncio.sleep(0.02))
+    breaker.allow_request()
+    assert breaker.state == CircuitState.HALF_OPEN
+    breaker.record_success(5)
+    assert breaker.state == CircuitState.CLOSED
+
+
+def test_statement_errors_are_not_availability_errors():
+    conn = sqlite3.connect(":memory:")
+    with pytest.raises(sqlite3.OperationalError) as bad_column:
+        conn.execute("SELECT missing_column FROM sqlite_master")
+    with pytest.raises(sqlite3.OperationalError) as syntax:
+        conn.execute("SELEC 1")
+    assert not is_availability_error(bad_column.value)
+    assert not is_availability_error(syntax.value)
+    assert not is_availability_error(OperationalError("SELECT", {}, bad_column.value))
+
+
+def test_connection_errors_are_availability_errors(tmp_path):
+    with pytest.raises(sqlite3.OperationalError) as cannot_open:
+        sqlite3.connect(str(tmp_path / "missing" / "db.sqlite3"))
+    assert is_availability_error(cannot_open.value)
+    assert is_availability_error(OperationalError("connect", {}, cannot_open.value))
+    assert is_availability_error(PoolTimeoutError("pool exhausted"))
+    invalidated = OperationalError("SELECT 1", {}, Exception("server closed the connection"), connection_invalidated=True)
+    assert is_availability_error(invalidated)
+
+
+def test_bad_sql_does_not_trip_breaker(executor, db_conn):
+    for _ in range(10):
+        with pytest.raises(HTTPException) as error:
+            run(executor, db_conn, "SELECT no_such_column FROM t")
+        assert error.value.status_code == 400
+    assert circuit_breakers.get(db_conn.id).state == CircuitState.CLOSED
+    result = run(executor, db_conn, "SELECT id FROM t WHERE id = 1")
+    assert result["data"] == [{"id": 1}]
+
+
+def test_unreachable_database_trips_breaker(executor, tmp_path):
+    db_conn = make_connection(str(tmp_path / "missing" / "db.sqlite3"))
+    for _ in range(5):
+        with pytest.raises(HTTPException):
+            run(executor, db_conn, "SELECT 1")
+    assert circuit_breakers.get(db_conn.id).state == CircuitState.OPEN
+    with pytest.raises(HTTPException) as error:
+        run(executor, db_conn, "SELECT 1")
+    assert error.value.status_code == 503
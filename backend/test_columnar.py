@@ -0,0 +1,60 @@
+"""Columnar result files: every value kind round-trips, and readers keep no decoded values."""
+import uuid
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+from app.services.columnar import ColumnarReader, write_columnar
+from app.services.result_encoder import encode_json
+
+ROWS = [
+    {
+        "id": 1, "name": "a", "price": Decimal("1.50"), "key": uuid.UUID(int=1), "day": date(2024, 1, 1),
+        "at": datetime(2024, 1, 1, 12, 0, tzinfo=timezone.utc), "blob": b"\x89PNG\xff", "meta": {"tags": ["x"]}
+    },
+    {
+        "id": 2, "name": None, "price": Decimal("2"), "key": None, "day": None,
+        "at": None, "blob": b"text", "meta": [1, "two"]
+    },
+    {
+        "id": 3, "name": "a", "price": None, "key": uuid.UUID(int=3), "day": date(2024, 1, 3),
+        "at": datetime(2024, 1, 3, tzinfo=timezone.utc), "blob": None, "meta": None
+    }
+]
+COLUMNS = list(ROWS[0])
+
+
+def test_values_round_trip(tmp_path):
+    path = str(tmp_path / "result.mqc")
+    write_columnar(path, COLUMNS, ROWS, {"source": "test"})
+    reader = ColumnarReader(path)
+    assert reader.columns == COLUMNS and reader.metadata == {"source": "test"}
+    assert reader.read_rows() == ROWS
+    assert reader.read_rows(1, 2) == ROWS[1:2]
+
+
+def test_binary_values_inside_other_values(tmp_path):
+    path = str(tmp_path / "result.mqc")
+    rows = [{"value": {"raw": b"\xff\xfe"}}, {"value": 7}]
+    write_columnar(path, ["value"], rows)
+    # Written as a live response would write them
+    assert ColumnarReader(path).read_column("value") == [{"raw": "//4="}, 7]
+    assert encode_json(rows[0]) == b'{"value":{"raw":"//4="}}'
+
+
+def test_reads_do_not_share_decoded_values(tmp_path):
+    path = str(tmp_path / "result.mqc")
+    write_columnar(path, ["meta"], [{"meta": {"n": i % 3}} for i in range(1000)])
+    reader = ColumnarReader(path)
+    first = reader.read_column("meta", 0, 10)
+    first[0]["n"] = "changed"
+    assert reader.read_column("meta", 0, 10)[0] == {"n": 0}
+
+
+def test_mixed_columns_are_stored_as_json(tmp_path):
+    path = str(tmp_path / "result.mqc")
+    # SQLite lets one column hold ints, floats and text
+    rows = [{"value": 1}, {"value": 2.5}, {"value": "x"}, {"value": None}]
+    write_columnar(path, ["value"], rows)
+    assert ColumnarReader(path).read_rows() == rows
+    write_columnar(path, ["value"], rows[:2])
+    assert ColumnarReader(path).read_rows() == [{"value": 1.0}, {"value": 2.5}]
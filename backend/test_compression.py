@@ -0,0 +1,50 @@
+"""Content-Encoding negotiation, and compressed bodies and streams that decode."""
+import asyncio
+import zlib
+
+import pytest
+
+from app.core.config import settings
+from app.services.compression import SUPPORTED_ENCODINGS, compress_body, compress_stream, negotiate
+from conftest import add_published_query, call_api
+
+BODY = b'{"data":[' + b",".join(b'{"id":%d,"name":"n%d"}' % (i, i % 5) for i in range(2000)) + b"]}"
+
+
+def test_negotiation_follows_client_preferences():
+    assert negotiate(None) == "identity"
+    assert negotiate("gzip;q=0.5, deflate") == "gzip"
+    assert negotiate("gzip;q=0, identity") == "identity"
+    assert negotiate("*") == SUPPORTED_ENCODINGS[0]
+    assert negotiate("compress") == "identity"
+
+
+def test_small_bodies_are_sent_as_they_are():
+    small = BODY[:settings.RESPONSE_COMPRESSION_MIN_BYTES - 1]
+    assert asyncio.run(compress_body(small, "gzip")) == (small, {"Vary": "Accept-Encoding"})
+
+
+def test_gzip_stream_decodes_after_every_chunk():
+    decoder = zlib.decompressobj(31)
+    decoded = b""
+    for chunk in compress_stream([BODY[:5000], BODY[5000:]], "gzip"):
+        decoded += decoder.decompress(chunk)
+        # Each chunk is flushed, so what was sent so far is readable
+        assert BODY.startswith(decoded) and decoded
+    assert decoded == BODY
+
+
+@pytest.mark.parametrize("encoding, module", [("br", "brotli"), ("zstd", "zstandard")])
+def test_optional_encodings_round_trip(encoding, module):
+    codec = pytest.importorskip(module)
+    body, headers = asyncio.run(compress_body(BODY, encoding))
+    assert headers["Content-Encoding"] == encoding
+    decoded = codec.decompress(body) if module == "brotli" else codec.ZstdDecompressor().decompress(body)
+    assert decoded == BODY
+
+
+def test_execute_response_is_compressed(app_db, target_db):
+    query_uuid = add_published_query(app_db, target_db, "SELECT id, name FROM t ORDER BY id")
+    response = call_api(app_db, "POST", f"/api/v1/execute/{query_uuid}", json={}, headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip" and response.headers["Vary"] == "Accept-Encoding"
+    assert response.json()["row_count"] == 1000
@@ -0,0 +1,135 @@
+"""COPY export: the pipe between the COPY thread and the response, and the export's lifecycle.
+
+The COPY itself needs a PostgreSQL server; a writer thread feeding the pipe
+stands in for it.
+"""
+import asyncio
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import HTTPException
+
+from app.models.database_connection import DatabaseType
+from app.services.copy_export import CopyPipe, CopyStream
+from app.services.execution_control import ClientDisconnected, DeadlineExceeded, ExecutionContext
+from app.services.execution_queue import execution_scheduler
+from conftest import make_connection
+
+
+def start_writer(pipe, chunks, stall=None):
+    """Write chunks into the pipe from a thread, as copy_expert does; returns the writer's outcome."""
+    outcome = {}
+
+    def write():
+        try:
+            for chunk in chunks:
+                pipe.write(chunk)
+            if stall is not None:
+                stall.wait(5)
+            pipe.finish()
+        except BaseException as e:
+            outcome["error"] = e
+            pipe.finish(e)
+
+    thread = threading.Thread(target=write, daemon=True)
+    thread.start()
+    return thread, outcome
+
+
+def open_stream(context, chunks, stall=None, max_chunks=2):
+    pipe = CopyPipe(context, chunk_bytes=4, max_chunks=max_chunks)
+    closed = []
+    stream = CopyStream(pipe, context, closed.append)
+    thread, outcome = start_writer(pipe, chunks, stall)
+    return stream, closed, thread, outcome
+
+
+def test_stream_is_read_on_the_event_loop():
+    async def scenario():
+        # The only default executor thread is busy for the whole export
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(1))
+        busy = threading.Event()
+        blocker = asyncio.ensure_future(asyncio.to_thread(busy.wait, 5))
+        stream, closed, thread, _ = open_stream(ExecutionContext(5000), [b"abcd"] * 50)
+        await stream.open()
+        data = b"".join([chunk async for chunk in stream])
+        busy.set()
+        await blocker
+        return data, closed
+
+    data, closed = asyncio.run(scenario())
+    assert data == b"abcd" * 50
+    assert closed == [None]
+
+
+def test_unread_stream_is_ended_by_aclose():
+    async def scenario():
+        context = ExecutionContext(5000)
+        stream, closed, thread, outcome = open_stream(context, [b"abcd"] * 50)
+        await stream.open()
+        # The response's background task, when the client left before reading
+        await stream.aclose()
+        await asyncio.to_thread(thread.join, 5)
+        await stream.aclose()
+        return context, closed, thread, outcome
+
+    context, closed, thread, outcome = asyncio.run(scenario())
+    assert not thread.is_alive()
+    assert isinstance(outcome["error"], ClientDisconnected)
+    assert context.cancel_reason == "client disconnected"
+    assert closed == [None]
+
+
+def test_export_is_bounded_by_its_deadline():
+    async def scenario():
+        stall = threading.Event()
+        stream, closed, thread, _ = open_stream(ExecutionContext(200), [b"abcd"], stall)
+        await stream.open()
+        received = []
+        with pytest.raises(DeadlineExceeded):
+            async for chunk in stream:
+                received.append(chunk)
+        stall.set()
+        return received, closed
+
+    received, closed = asyncio.run(scenario())
+    assert received == [b"abcd"]
+    assert len(closed) == 1 and isinstance(closed[0], DeadlineExceeded)
+
+
+def postgres_connection():
+    return make_connection(
+        "unused", database_type=DatabaseType.POSTGRESQL, port=1,
+        additional_params=json.dumps({"max_concurrent_executions": 1})
+    )
+
+
+def test_export_waits_in_the_execution_queue(executor):
+    db_conn = postgres_connection()
+
+    async def scenario():
+        holder = await execution_scheduler.acquire(db_conn, None, 5000)
+        try:
+            with pytest.raises(HTTPException) as error:
+                await executor.export_copy("SELECT 1", {}, database_connection=db_conn, timeout_ms=50)
+        finally:
+            holder.release()
+        return error.value.status_code
+
+    assert asyncio.run(scenario()) == 504
+
+
+def test_failed_export_releases_its_slot(executor):
+    db_conn = postgres_connection()
+
+    async def scenario():
+        with pytest.raises(HTTPException) as error:
+            await executor.export_copy("SELECT 1", {}, database_connection=db_conn, timeout_ms=5000)
+        # The only slot is free again
+        slot = await execution_scheduler.acquire(db_conn, None, 50)
+        slot.release()
+        return error.value.status_code
+
+    assert asyncio.run(scenario()) == 503
@@ -0,0 +1,129 @@
+"""Cursor sessions: results spooled to shared storage and pulled in chunks from any worker.
+
+Another worker process is stood in for by a second CursorSessionRegistry,
+which shares nothing with the first but CURSOR_SESSION_DIR.
+"""
+import asyncio
+import os
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.services.cursor_sessions import CursorSessionLimitError, CursorSessionRegistry, cursor_sessions
+from app.services.execution_control import ExecutionContext
+from conftest import ROW_COUNT
+
+QUERY = {"query_id": 1, "query_uuid": "uuid", "query_name": "name"}
+
+
+@pytest.fixture(autouse=True)
+def small_segments(monkeypatch):
+    monkeypatch.setattr(settings, "CURSOR_SESSION_SEGMENT_ROWS", 100)
+
+
+def open_session(executor, db_conn, sql="SELECT * FROM t ORDER BY id", chunk_rows=250):
+    return executor.open_session(sql, {}, QUERY, database_connection=db_conn, chunk_rows=chunk_rows)
+
+
+def test_session_is_pulled_in_chunks_until_exhausted(executor, db_conn):
+    async def scenario():
+        first = await open_session(executor, db_conn)
+        ids = [row["id"] for row in first["data"]]
+        token = first["session_token"]
+        while token:
+            chunk = await executor.fetch_session(token, 300)
+            assert chunk["query_id"] == 1 and chunk["columns"] == ["id", "name", "amount", "day"]
+            ids += [row["id"] for row in chunk["data"]]
+            token = chunk["session_token"]
+        return ids
+
+    assert asyncio.run(scenario()) == list(range(1, ROW_COUNT + 1))
+    assert cursor_sessions.snapshot() == {"open": 0, "spooling": 0, "per_connection": {}}
+
+
+def test_result_fitting_the_first_chunk_has_no_session(executor, db_conn):
+    result = asyncio.run(open_session(executor, db_conn, "SELECT * FROM t WHERE id < 5"))
+    assert result["row_count"] == 4 and result["session_token"] is None
+    assert cursor_sessions.snapshot()["open"] == 0
+
+
+def test_any_worker_serves_pulls(executor, db_conn):
+    other_worker = CursorSessionRegistry()
+
+    async def scenario():
+        first = await open_session(executor, db_conn, chunk_rows=10)
+        query, columns, rows, done = await other_worker.pull(first["session_token"], 500, ExecutionContext(5000))
+        return query, rows, done
+
+    query, rows, done = asyncio.run(scenario())
+    assert query == QUERY
+    assert [row["id"] for row in rows] == list(range(11, 511))
+    assert not done
+
+
+def test_session_limit_holds_across_workers(executor, db_conn, monkeypatch):
+    monkeypatch.setattr(settings, "CURSOR_SESSION_MAX_PER_CONNECTION", 2)
+    other_worker = CursorSessionRegistry()
+
+    async def scenario():
+        tokens = [(await open_session(executor, db_conn, chunk_rows=1))["session_token"] for _ in range(2)]
+        with pytest.raises(CursorSessionLimitError):
+            other_worker.reserve(db_conn, QUERY)
+        await other_worker.close(tokens[0])
+        session = other_worker.reserve(db_conn, QUERY)
+        await other_worker.discard(session)
+
+    asyncio.run(scenario())
+
+
+def test_closed_session_returns_404(executor, db_conn):
+    async def scenario():
+        token = (await open_session(executor, db_conn))["session_token"]
+        await executor.close_session(token)
+        with pytest.raises(HTTPException) as error:
+            await executor.fetch_session(token)
+        return error.value.status_code
+
+    assert asyncio.run(scenario()) == 404
+    assert cursor_sessions.snapshot()["per_connection"] == {}
+
+
+def test_invalid_token_returns_404(executor):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(executor.fetch_session("../../etc"))
+    assert error.value.status_code == 404
+
+
+def test_spool_pauses_for_slow_reader_and_drops_read_segments(executor, db_conn, monkeypatch):
+    monkeypatch.setattr(settings, "CURSOR_SESSION_SPOOL_AHEAD_ROWS", 200)
+
+    async def scenario():
+        token = (await open_session(executor, db_conn, chunk_rows=10))["session_token"]
+        session_dir = os.path.join(settings.CURSOR_SESSION_DIR, "sessions", token)
+        await asyncio.sleep(0.3)
+        paused = sorted(name for name in os.listdir(session_dir) if name.endswith(".mqc"))
+        chunk = await executor.fetch_session(token, 250)
+        await asyncio.sleep(0.3)
+        resumed = sorted(name for name in os.listdir(session_dir) if name.endswith(".mqc"))
+        await executor.close_session(token)
+        return paused, chunk, resumed
+
+    paused, chunk, resumed = asyncio.run(scenario())
+    assert paused == ["0.mqc", "1.mqc"]
+    # A chunk larger than the lookahead returns what was spooled
+    assert [row["id"] for row in chunk["data"]] == list(range(11, 211))
+    assert resumed == ["2.mqc", "3.mqc"]
+
+
+def test_idle_sessions_are_reaped(executor, db_conn, monkeypatch):
+    async def scenario():
+        token = (await open_session(executor, db_conn))["session_token"]
+        monkeypatch.setattr(settings, "CURSOR_SESSION_IDLE_TTL_SECONDS", -1)
+        assert CursorSessionRegistry().reap() == 1
+        with pytest.raises(HTTPException) as error:
+            await executor.fetch_session(token)
+        return error.value.status_code
+
+    assert asyncio.run(scenario()) == 404
+    assert cursor_sessions.snapshot()["open"] == 0
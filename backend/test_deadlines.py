@@ -0,0 +1,46 @@
+"""Execution deadlines: statements are cancelled on the database at the deadline or on disconnect."""
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.services.execution_control import resolve_timeout_ms
+
+SLOW_SQL = (
+    "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 1000000000) "
+    "SELECT count(*) AS c FROM n"
+)
+
+
+def run(executor, db_conn, sql, **kwargs):
+    return asyncio.run(executor.execute_query(None, sql_template=sql, params={}, database_connection=db_conn, **kwargs))
+
+
+def test_statement_is_cancelled_at_the_deadline(executor, db_conn):
+    started = time.monotonic()
+    with pytest.raises(HTTPException) as error:
+        run(executor, db_conn, SLOW_SQL, timeout_ms=200)
+    assert error.value.status_code == 504
+    assert time.monotonic() - started < 2
+    # The connection went back to the pool without the deadline
+    assert run(executor, db_conn, "SELECT count(*) AS c FROM t", timeout_ms=5000)["data"] == [{"c": 1000}]
+
+
+def test_statement_is_cancelled_when_the_client_disconnects(executor, db_conn):
+    async def is_disconnected():
+        return True
+
+    started = time.monotonic()
+    with pytest.raises(HTTPException) as error:
+        run(executor, db_conn, SLOW_SQL, timeout_ms=10000, is_disconnected=is_disconnected)
+    assert error.value.status_code == 499
+    assert time.monotonic() - started < 2
+
+
+def test_client_timeout_can_only_shorten_the_deadline():
+    assert resolve_timeout_ms(None) == settings.QUERY_DEFAULT_TIMEOUT_MS
+    assert resolve_timeout_ms(10000, 500) == 500
+    assert resolve_timeout_ms(10000, 60000) == 10000
+    assert resolve_timeout_ms(10 ** 9) == settings.QUERY_MAX_TIMEOUT_MS
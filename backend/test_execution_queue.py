@@ -0,0 +1,107 @@
+"""Weighted fair queuing of executions across workspaces."""
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.config import settings
+from app.services import execution_queue
+from app.services.execution_control import DeadlineExceeded
+from app.services.execution_queue import ExecutionScheduler
+from conftest import make_connection
+
+
+class Clock:
+    """Monotonic time of the queue, advanced by the test."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(execution_queue, "time", SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+
+def workspace(workspace_id, weight):
+    return SimpleNamespace(id=workspace_id, execution_weight=weight)
+
+
+def single_slot_connection():
+    return make_connection("unused", additional_params=json.dumps({"max_concurrent_executions": 1}))
+
+
+def test_capacity_is_split_across_workers(monkeypatch):
+    scheduler = ExecutionScheduler()
+    monkeypatch.setattr(settings, "WEB_CONCURRENCY", 4)
+    assert scheduler.capacity_for(make_connection("unused")) == 3
+    assert scheduler.capacity_for(single_slot_connection()) == 1
+
+
+def test_weighted_dispatch_order(clock):
+    scheduler = ExecutionScheduler()
+    db_conn = single_slot_connection()
+    heavy, light = workspace(1, 3), workspace(2, 1)
+    order = []
+
+    async def execution(ws):
+        slot = await scheduler.acquire(db_conn, ws, 60000)
+        order.append(ws.id)
+        # Every execution holds the database for one second
+        clock.now += 1
+        slot.release()
+
+    async def scenario():
+        blocker = await scheduler.acquire(db_conn, None, 60000)
+        tasks = [asyncio.create_task(execution(ws)) for ws in [heavy] * 12 + [light] * 12]
+        await asyncio.sleep(0)
+        blocker.release()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
+    # While both have work queued, the weight 3 workspace gets three of every four turns
+    assert order[:16].count(heavy.id) == 12
+    assert order[:16].count(light.id) == 4
+
+
+def test_deadline_expires_while_queued(clock):
+    scheduler = ExecutionScheduler()
+    db_conn = single_slot_connection()
+
+    async def scenario():
+        holder = await scheduler.acquire(db_conn, workspace(1, 1), 60000)
+        with pytest.raises(DeadlineExceeded):
+            await scheduler.acquire(db_conn, workspace(2, 1), 20)
+        waiting = scheduler.snapshot()[str(db_conn.id)]["workspaces"]
+        holder.release()
+        # The expired waiter gave its place back: the next execution runs at once
+        slot = await scheduler.acquire(db_conn, workspace(2, 1), 20)
+        slot.release()
+        return waiting
+
+    # Nothing of the expired execution is left queued
+    assert list(asyncio.run(scenario())) == ["1"]
+
+
+def test_idle_workspaces_are_forgotten(clock):
+    scheduler = ExecutionScheduler()
+    db_conn = single_slot_connection()
+
+    async def scenario():
+        for workspace_id in range(50):
+            slot = await scheduler.acquire(db_conn, workspace(workspace_id, 1), 1000)
+            clock.now += 0.1
+            slot.release()
+        holder = await scheduler.acquire(db_conn, workspace(1, 1), 1000)
+        return scheduler.snapshot(), holder
+
+    snapshot, holder = asyncio.run(scenario())
+    assert list(snapshot[str(db_conn.id)]["workspaces"]) == ["1"]
+    holder.release()
+    assert scheduler.snapshot() == {}
@@ -0,0 +1,48 @@
+"""Chunked fetching: rows in order, in array-size chunks, and per-connection tuning."""
+import json
+
+import pytest
+
+from app.core.config import settings
+from app.services.fetch_pipeline import fetch_options, fetch_rows
+
+COLUMNS = ["id", "name"]
+ROWS = [(i, f"n{i}") for i in range(1, 1001)]
+
+
+def cursor(rows):
+    """A fetchmany over ``rows`` that records the sizes it was asked for."""
+    calls = []
+    remaining = list(rows)
+
+    def fetchmany(size):
+        calls.append(size)
+        chunk, remaining[:] = remaining[:size], remaining[size:]
+        return chunk
+
+    return fetchmany, calls
+
+
+@pytest.mark.parametrize("overlap", [True, False])
+def test_rows_arrive_complete_and_in_order(overlap):
+    fetchmany, calls = cursor(ROWS)
+    rows = fetch_rows(fetchmany, COLUMNS, 64, overlap=overlap)
+    assert rows == [{"id": i, "name": name} for i, name in ROWS]
+    # 15 full chunks, a short one, and the empty read that ends the result
+    assert calls == [64] * 17
+
+
+def test_empty_result():
+    fetchmany, calls = cursor([])
+    assert fetch_rows(fetchmany, COLUMNS, 64) == []
+    assert calls == [64]
+
+
+def test_connections_tune_their_fetches():
+    options = fetch_options(json.dumps({"fetch_array_size": 500, "stream_results": True}))
+    assert (options.array_size, options.prefetch_rows) == (500, 501)
+    assert options.execution_options("postgresql") == {"stream_results": True, "max_row_buffer": 500}
+    # sqlite3 has no server-side cursors
+    assert options.execution_options("sqlite") == {}
+    defaults = fetch_options("not json")
+    assert defaults.array_size == settings.FETCH_ARRAY_SIZE
@@ -50,7 +50,27 @@ def test_imports():
         print(f"\n❌ Import error: {e}")
         return False
 
+def test_isolated_imports():
+    """Each package must import on its own, not only after app.main has loaded the others."""
+    import os
+    import subprocess
+    import sys
+    
+    env = {"JWT_SECRET_KEY": "test", "SECRET_KEY": "test", **os.environ}
+    for module in ("app.schemas", "app.crud", "app.services", "app.routers"):
+        result = subprocess.run(
+            [sys.executable, "-c", f"import {module}"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            env=env,
+            capture_output=True,
+            text=True
+        )
+        assert result.returncode == 0, f"import {module} failed:\n{result.stderr}"
+        print(f"✓ import {module}")
+
+
 if __name__ == "__main__":
     import sys
     success = test_imports()
+    test_isolated_imports()
     sys.exit(0 if success else 1)
\ No newline at end of file
@@ -0,0 +1,74 @@
+"""Asynchronous jobs: running them, and what happens to them when their server process stops.
+
+Other server processes are stood in for by more JobManagers on the same
+JOB_RESULT_DIR; closing a manager's lock file is what the OS does when its
+process dies.
+"""
+import asyncio
+from types import SimpleNamespace
+
+from app.core.config import settings
+from app.schemas.job import JobStatus
+from app.services.job_manager import INTERRUPTED_ERROR, JobManager
+
+
+def new_manager(workers=0):
+    return JobManager(settings.JOB_RESULT_DIR, workers, settings.JOB_RESULT_TTL_SECONDS)
+
+
+def submit(manager, db_conn, sql="SELECT id, name FROM t WHERE id <= 25 ORDER BY id"):
+    return manager.submit(
+        query_id=1, query_uuid="6ba7b810-9dad-11d1-80b4-00c04fd430c8", query_name="name",
+        sql_template=sql, version_id=None, params={}, params_info=None, database_connection=db_conn,
+        timeout_ms=5000, priority=5, workspace=SimpleNamespace(id=1, execution_weight=1)
+    )
+
+
+def test_job_runs_and_serves_pages(db_conn):
+    async def scenario():
+        manager = new_manager(workers=1)
+        await manager.start()
+        job_id = (await submit(manager, db_conn))["job_id"]
+        while manager.get_status(job_id)["status"] in (JobStatus.QUEUED.value, JobStatus.RUNNING.value):
+            await asyncio.sleep(0.01)
+        await manager.shutdown()
+        return manager, job_id
+
+    manager, job_id = asyncio.run(scenario())
+    status = manager.get_status(job_id)
+    assert status["status"] == JobStatus.SUCCEEDED.value and status["row_count"] == 25
+    assert [row["id"] for row in manager.read_page(job_id, 20, 10)] == [21, 22, 23, 24, 25]
+
+
+def test_jobs_of_a_dead_process_fail_when_another_starts(db_conn):
+    async def scenario():
+        dead, alive = new_manager(), new_manager()
+        await dead.start()
+        await alive.start()
+        orphaned = (await submit(dead, db_conn))["job_id"]
+        kept = (await submit(alive, db_conn))["job_id"]
+        dead._owner_lock.close()
+        restarted = new_manager()
+        await restarted.start()
+        return restarted, alive, orphaned, kept
+
+    manager, alive, orphaned, kept = asyncio.run(scenario())
+    status = manager.get_status(orphaned)
+    assert status["status"] == JobStatus.FAILED.value and status["error"] == INTERRUPTED_ERROR
+    assert status["finished_at"] is not None
+    assert manager.get_status(kept)["status"] == JobStatus.QUEUED.value
+    # Later sweeps leave the live process's jobs alone too
+    assert manager.fail_orphaned() == 0
+
+
+def test_shutdown_fails_jobs_left_in_the_queue(db_conn):
+    async def scenario():
+        manager = new_manager()
+        await manager.start()
+        job_id = (await submit(manager, db_conn))["job_id"]
+        await manager.shutdown()
+        return manager, job_id
+
+    manager, job_id = asyncio.run(scenario())
+    assert manager.get_status(job_id)["status"] == JobStatus.FAILED.value
+    assert manager.cleanup_expired() == (0, 1)
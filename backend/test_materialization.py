@@ -0,0 +1,47 @@
+"""Materialized queries: snapshots built by the scheduler are served by /execute instead of the database."""
+import asyncio
+import sqlite3
+
+from app.crud import query_crud
+from app.services.scheduler import SchedulerService
+from conftest import ROW_COUNT, add_published_query, call_api
+
+MATERIALIZATION = {"materialization": {"cron": "0 * * * *", "param_sets": [{}]}}
+
+
+def load_query(app_db, query_uuid):
+    async def load():
+        async with app_db() as session:
+            query = await query_crud.get_by_uuid(session, uuid=query_uuid)
+            return await query_crud.get_with_workspace(session, id=query.id)
+
+    return asyncio.run(load())
+
+
+def materialize(app_db, target_db, sql):
+    query_uuid = add_published_query(app_db, target_db, sql, execution_options=MATERIALIZATION)
+    asyncio.run(SchedulerService()._refresh_snapshot(load_query(app_db, query_uuid), {}, None, False))
+    return query_uuid
+
+
+def test_snapshot_is_served_instead_of_the_database(app_db, target_db):
+    query_uuid = materialize(app_db, target_db, "SELECT id, name FROM t ORDER BY id")
+    conn = sqlite3.connect(target_db)
+    conn.execute("DELETE FROM t")
+    conn.commit()
+    conn.close()
+
+    response = call_api(app_db, "POST", f"/api/v1/execute/{query_uuid}", json={"params": {}})
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["snapshot_at"] is not None
+    assert body["row_count"] == ROW_COUNT and body["data"][0] == {"id": 1, "name": "n1"}
+
+
+def test_snapshot_is_paged_by_offset(app_db, target_db):
+    query_uuid = materialize(app_db, target_db, "SELECT id, name FROM t ORDER BY id")
+    first = call_api(app_db, "POST", f"/api/v1/execute/{query_uuid}", json={"page_size": 400}).json()
+    second = call_api(
+        app_db, "POST", f"/api/v1/execute/{query_uuid}", json={"page_size": 400, "cursor": first["next_cursor"]}
+    ).json()
+    assert [row["id"] for row in first["data"] + second["data"]] == list(range(1, 801))
@@ -0,0 +1,125 @@
+"""Paged and projected execution: the SQL wrapped around a query for each dialect, and paging through it."""
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.dialects import mssql, mysql, oracle, postgresql, sqlite
+
+from app.services.pagination import PageRequest, split_order_by
+from app.services.projection import Projection
+from app.services.sql_template import SqlTemplate
+from conftest import ROW_COUNT
+
+DIALECTS = {
+    "mssql": mssql.dialect(),
+    "mysql": mysql.dialect(),
+    "oracle": oracle.dialect(),
+    "postgresql": postgresql.dialect(),
+    "sqlite": sqlite.dialect()
+}
+OUTPUT_COLUMNS = {"id": "integer", "name": "string", "amount": "float", "day": "string"}
+ORDERED_SQL = "SELECT t.id, t.name, t.amount, t.day FROM t WHERE t.amount > :min ORDER BY t.day DESC, t.id"
+PARAMS_INFO = {"min": {"type": "float"}}
+
+
+def compile_view(sql, dialect, projection=None, page=None):
+    statement = SqlTemplate(sql, PARAMS_INFO).view_statement(dialect, projection, page)
+    return " ".join(str(statement.compile(dialect=DIALECTS[dialect])).split())
+
+
+def offset_page(offset):
+    return PageRequest(100, PageRequest(100)._token({"o": offset}))
+
+
+@pytest.mark.parametrize("dialect", sorted(DIALECTS))
+def test_order_by_moves_out_of_the_derived_table(dialect):
+    for page in (PageRequest(100), offset_page(200)):
+        sql = compile_view(ORDERED_SQL, dialect, Projection(OUTPUT_COLUMNS, ["id"]), page)
+        inner, outer = sql.rsplit(") page_source", 1)
+        assert "ORDER BY" not in inner
+        assert "ORDER BY day DESC, id" in outer
+
+
+def test_mssql_pages_compile_without_inner_order_by():
+    first = compile_view(ORDERED_SQL, "mssql", page=PageRequest(100))
+    assert first.startswith("SELECT TOP (")
+    assert first.endswith(") page_source ORDER BY day DESC, id")
+    later = compile_view(ORDERED_SQL, "mssql", page=offset_page(200))
+    assert later.endswith("ORDER BY day DESC, id OFFSET :qh_page_offset ROWS FETCH NEXT :qh_page_limit ROWS ONLY")
+
+
+def test_projection_keeps_the_query_order():
+    sql = compile_view(ORDERED_SQL, "mssql", Projection(OUTPUT_COLUMNS, ["id", "name"]))
+    assert sql.endswith(") q ORDER BY day DESC, id")
+    assert sql.count("ORDER BY") == 1
+
+
+def test_expression_order_stays_inside_and_is_valid_on_mssql():
+    sql = "SELECT id, name FROM t ORDER BY lower(name)"
+    assert split_order_by(sql, "mssql") == (f"{sql}\nOFFSET 0 ROWS", None)
+    assert split_order_by(sql, "postgresql") == (sql, None)
+    assert split_order_by("SELECT TOP 5 id FROM t ORDER BY lower(name)", "mssql")[1] is None
+    assert split_order_by("SELECT id FROM t ORDER BY id LIMIT 5", "mysql") == ("SELECT id FROM t ORDER BY id LIMIT 5", None)
+
+
+def test_order_by_in_literals_comments_and_subqueries_is_ignored():
+    for sql in (
+        "SELECT 'ORDER BY x' AS s FROM t",
+        "SELECT id FROM t -- ORDER BY id",
+        "SELECT * FROM (SELECT id FROM t ORDER BY id) x"
+    ):
+        assert split_order_by(sql, "postgresql") == (sql, None)
+    assert split_order_by("SELECT id, [Day] FROM t ORDER BY [Day] DESC -- newest first\n", "mssql") == (
+        "SELECT id, [Day] FROM t", "[Day] DESC"
+    )
+
+
+def test_order_by_on_columns_that_are_not_returned_stays_inside():
+    sql = "SELECT id FROM t ORDER BY name, id"
+    assert split_order_by(sql, "postgresql") == (sql, None)
+    assert split_order_by(sql, "mssql") == (f"{sql}\nOFFSET 0 ROWS", None)
+    assert split_order_by("SELECT name AS label FROM t ORDER BY name", "sqlite")[1] is None
+    # Aliases and columns behind * are output columns
+    assert split_order_by("SELECT lower(name) AS lname FROM t ORDER BY lname", "sqlite")[1] == "lname"
+    assert split_order_by("SELECT t.* FROM t ORDER BY t.name", "sqlite")[1] == "name"
+
+
+def test_paging_by_columns_that_are_not_returned_is_rejected(executor, db_conn):
+    sql = "SELECT id FROM t ORDER BY name, id"
+
+    async def run(**page):
+        return await executor.execute_query(None, sql_template=sql, params={}, database_connection=db_conn, **page)
+
+    assert asyncio.run(run())["row_count"] == ROW_COUNT
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(run(page_size=10))
+    assert error.value.status_code == 400
+    assert "order_key" in error.value.detail
+
+
+def test_paging_without_an_order_is_rejected(executor, db_conn):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(executor.execute_query(
+            None, sql_template="SELECT id FROM t", params={}, database_connection=db_conn, page_size=10
+        ))
+    assert error.value.status_code == 400
+    assert "order" in error.value.detail
+
+
+def test_offset_pages_follow_the_query_order(executor, db_conn):
+    async def scenario():
+        rows, cursor = [], None
+        while True:
+            result = await executor.execute_query(
+                None, sql_template=ORDERED_SQL, params={"min": 0}, params_info=PARAMS_INFO,
+                database_connection=db_conn, page_size=150, cursor=cursor, version_id=1,
+                fields=["id", "day"], output_columns=OUTPUT_COLUMNS
+            )
+            rows += result["data"]
+            cursor = result["next_cursor"]
+            if not cursor:
+                return rows
+
+    rows = asyncio.run(scenario())
+    assert len(rows) == ROW_COUNT
+    assert rows == sorted(rows, key=lambda row: (row["day"], -row["id"]), reverse=True)
@@ -0,0 +1,66 @@
+"""Parameter validation: coercion, defaults and constraints compiled from params_info."""
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from app.services.param_validators import ParamValidationError, ParamValidator
+from app.services.sql_template import SqlTemplateCache
+
+PARAMS_INFO = {
+    "limit": {"type": "integer", "default": 10, "enum": [10, 20, 50]},
+    "price": {"type": "decimal", "min": 0},
+    "day": {"type": "date", "required": False},
+    "code": {"type": "string", "min": 2, "max": 4},
+    "ids": {"type": "array", "items": {"type": "integer"}, "max_items": 3},
+    "model_config": {"type": "boolean", "required": False}
+}
+
+
+def test_values_are_coerced_and_defaults_filled_in():
+    validator = ParamValidator(PARAMS_INFO)
+    params = validator.validate({"price": "1.50", "day": "", "code": "ab", "ids": "1, 2", "other": "x"})
+    assert params == {
+        "limit": 10, "price": Decimal("1.50"), "day": None, "code": "ab", "ids": [1, 2],
+        "model_config": None, "other": "x"
+    }
+    params = validator.validate({"price": 0, "day": "2024-01-02", "code": "abcd", "ids": [], "model_config": "true"})
+    assert params["day"] == date(2024, 1, 2) and params["model_config"] is True
+
+
+def test_every_invalid_parameter_is_reported():
+    with pytest.raises(ParamValidationError) as error:
+        ParamValidator(PARAMS_INFO).validate({"limit": 30, "price": -1, "code": "a", "ids": [1, "x"]})
+    assert set(error.value.errors) == {"limit", "price", "code", "ids"}
+    assert error.value.errors["limit"] == "must be one of 10, 20, 50"
+    assert error.value.errors["ids"].startswith("item 1: ")
+
+
+def test_missing_required_parameters_are_reported():
+    with pytest.raises(ParamValidationError) as error:
+        ParamValidator(PARAMS_INFO).validate({"code": "ab", "ids": []})
+    assert list(error.value.errors) == ["price"]
+
+
+def test_undescribed_parameters_pass_through():
+    assert ParamValidator(None).validate({"a": "1"}) == {"a": "1"}
+
+
+def test_numbers_are_accepted_for_string_parameters():
+    validator = ParamValidator({
+        "code": {"type": "string"},
+        "codes": {"type": "array", "items": {"type": "string"}},
+        "rows": {"type": "table", "columns": {"code": "string"}}
+    })
+    params = validator.validate({"code": 123, "codes": [1, 2.5], "rows": [[7]]})
+    assert params == {"code": "123", "codes": ["1", "2.5"], "rows": [("7",)]}
+    with pytest.raises(ParamValidationError):
+        validator.validate({"code": True, "codes": [], "rows": []})
+
+
+def test_parameters_the_template_does_not_use_are_not_required():
+    template = SqlTemplateCache().get("SELECT * FROM t WHERE id = :id", params_info={
+        "id": {"type": "integer"},
+        "removed": {"type": "string"}
+    })
+    assert template.bind({"id": "5"}) == {"id": 5}
@@ -0,0 +1,77 @@
+"""Server-side prepared statements through the query executor.
+
+SQLite is not a supported driver, but its qmark parameters run through the
+cursor-per-statement path that SQL Server and Oracle use, so the tests enable
+it for that path.
+"""
+import asyncio
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from app.services import prepared_statements
+from app.services.circuit_breaker import CircuitState, circuit_breakers
+from app.services.prepared_statements import prepared_stats
+from conftest import add_published_query, call_api
+
+ID_PARAM = {"id": {"type": "integer"}}
+# Counts far beyond any deadline of these tests
+SLOW_SQL = (
+    "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 1000000000) "
+    "SELECT count(*) AS n FROM c WHERE x > :id"
+)
+
+
+@pytest.fixture(autouse=True)
+def sqlite_prepared(monkeypatch):
+    monkeypatch.setattr(
+        prepared_statements, "SUPPORTED_DRIVERS", prepared_statements.SUPPORTED_DRIVERS | {("sqlite", "pysqlite")}
+    )
+
+
+def run(executor, db_conn, sql, params, **kwargs):
+    return asyncio.run(executor.execute_query(
+        None, sql_template=sql, params=params, params_info=ID_PARAM, database_connection=db_conn, prepare=True, **kwargs
+    ))
+
+
+def test_prepared_statement_is_reused(executor, db_conn):
+    before = prepared_stats.snapshot().get("sqlite", {"prepared": 0, "reused": 0})
+    for i in range(1, 4):
+        assert run(executor, db_conn, "SELECT id FROM t WHERE id = :id", {"id": i})["data"] == [{"id": i}]
+    after = prepared_stats.snapshot()["sqlite"]
+    assert after["prepared"] - before["prepared"] == 1
+    assert after["reused"] - before["reused"] == 2
+
+
+def test_prepared_bad_sql_is_a_400_and_keeps_breaker_closed(executor, db_conn):
+    for _ in range(10):
+        with pytest.raises(HTTPException) as error:
+            run(executor, db_conn, "SELECT no_such_column FROM t WHERE id = :id", {"id": 1})
+        assert error.value.status_code == 400
+    assert circuit_breakers.get(db_conn.id).state == CircuitState.CLOSED
+
+
+def test_prepared_deadline_is_a_504(executor, db_conn):
+    with pytest.raises(HTTPException) as error:
+        run(executor, db_conn, SLOW_SQL, {"id": 0}, timeout_ms=200)
+    assert error.value.status_code == 504
+    assert circuit_breakers.get(db_conn.id).state == CircuitState.CLOSED
+    # The pooled connection is still usable afterwards
+    assert run(executor, db_conn, "SELECT id FROM t WHERE id = :id", {"id": 2})["data"] == [{"id": 2}]
+
+
+def test_upload_endpoint_prepares(app_db, target_db):
+    query_uuid = add_published_query(
+        app_db, target_db, "SELECT id FROM t WHERE id = :id", params_info=ID_PARAM,
+        execution_options={"prepare_statements": True}
+    )
+    before = prepared_stats.snapshot().get("sqlite", {"prepared": 0, "reused": 0})
+    for i in range(1, 3):
+        response = call_api(app_db, "POST", f"/api/v1/execute/{query_uuid}/upload", data={
+            "params": json.dumps({"id": i})
+        })
+        assert response.json()["data"] == [{"id": i}]
+    after = prepared_stats.snapshot()["sqlite"]
+    assert (after["prepared"] - before["prepared"], after["reused"] - before["reused"]) == (1, 1)
@@ -0,0 +1,61 @@
+"""Projection: fields and filters on a query's declared output columns, run by the database."""
+from conftest import add_published_query, call_api
+
+SQL = "SELECT id, name, amount, day FROM t ORDER BY id"
+OPTIONS = {"output_columns": {"id": "integer", "name": "string", "amount": "float", "day": "date"}}
+
+
+def execute(app_db, query_uuid, **body):
+    return call_api(app_db, "POST", f"/api/v1/execute/{query_uuid}", json=body)
+
+
+def test_fields_and_filters_narrow_the_result(app_db, target_db):
+    query_uuid = add_published_query(app_db, target_db, SQL, execution_options=OPTIONS)
+    response = execute(app_db, query_uuid, fields=["day", "id"], filters=[
+        {"column": "name", "op": "in", "values": ["n1", "n2"]},
+        {"column": "id", "op": "range", "gte": "10", "lt": 20},
+        {"column": "day", "op": "eq", "value": "2024-01-12"}
+    ])
+    assert response.status_code == 200, response.text
+    data = response.json()["data"]
+    assert data == [{"day": "2024-01-12", "id": 11}] and list(data[0]) == ["day", "id"]
+
+
+def test_projection_pages_in_the_query_order(app_db, target_db):
+    query_uuid = add_published_query(app_db, target_db, SQL, execution_options=OPTIONS)
+    filters = [{"column": "name", "op": "eq", "value": "n0"}]
+    first = execute(app_db, query_uuid, fields=["id"], filters=filters, page_size=3).json()
+    assert [row["id"] for row in first["data"]] == [5, 10, 15]
+    second = execute(app_db, query_uuid, fields=["id"], filters=filters, page_size=3, cursor=first["next_cursor"])
+    assert [row["id"] for row in second.json()["data"]] == [20, 25, 30]
+
+
+def test_unknown_columns_and_bad_values_are_rejected(app_db, target_db):
+    query_uuid = add_published_query(app_db, target_db, SQL, execution_options=OPTIONS)
+    assert execute(app_db, query_uuid, fields=["secret"]).status_code == 400
+    assert execute(app_db, query_uuid, filters=[{"column": "id", "op": "eq", "value": "x"}]).status_code == 400
+    # Without declared output columns there is nothing to project onto
+    plain_uuid = add_published_query(app_db, target_db, SQL)
+    assert execute(app_db, plain_uuid, fields=["id"]).status_code == 400
+
+
+def test_pages_can_leave_out_the_columns_they_are_ordered_by(app_db, target_db):
+    query_uuid = add_published_query(
+        app_db, target_db, "SELECT id, name, amount, day FROM t ORDER BY day DESC, id", execution_options=OPTIONS
+    )
+    first = execute(app_db, query_uuid, fields=["id"], page_size=3).json()
+    assert first["data"] == [{"id": 27}, {"id": 55}, {"id": 83}]
+    second = execute(app_db, query_uuid, fields=["id"], page_size=3, cursor=first["next_cursor"]).json()
+    assert second["data"] == [{"id": 111}, {"id": 139}, {"id": 167}]
+
+
+def test_keyset_pages_need_their_key_in_the_fields(app_db, target_db):
+    options = dict(OPTIONS, order_key=["-id"])
+    query_uuid = add_published_query(app_db, target_db, SQL, execution_options=options)
+    response = execute(app_db, query_uuid, fields=["name"], page_size=3)
+    assert response.status_code == 400
+    assert response.json()["detail"].endswith("ordering key columns; add id to fields")
+    first = execute(app_db, query_uuid, fields=["id", "name"], page_size=3).json()
+    assert [row["id"] for row in first["data"]] == [1000, 999, 998]
+    second = execute(app_db, query_uuid, fields=["id", "name"], page_size=3, cursor=first["next_cursor"]).json()
+    assert [row["id"] for row in second["data"]] == [997, 996, 995]
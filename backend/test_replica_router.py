@@ -0,0 +1,67 @@
+"""Replica routing, failover and endpoint health of the query executor."""
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.models.database_connection import EndpointRole
+from app.services.replica_router import ReplicaRouter, replica_router
+from conftest import make_connection
+
+REPLICAS = [{"host": "replica-1", "port": 5432}, {"host": "replica-2", "port": 5432}]
+
+
+def run(executor, db_conn, sql):
+    return asyncio.run(executor.execute_query(None, sql_template=sql, params={}, database_connection=db_conn))
+
+
+def replicas(db_conn):
+    return [e for e in replica_router.endpoints_for(db_conn) if e.role == EndpointRole.REPLICA]
+
+
+def test_checkout_prefers_least_outstanding_replica():
+    router = ReplicaRouter()
+    db_conn = make_connection("unused", endpoints=REPLICAS)
+    first = router.checkout(db_conn)
+    second = router.checkout(db_conn)
+    assert {first.host, second.host} == {"replica-1", "replica-2"}
+    router.release(first, 5)
+    assert router.checkout(db_conn) is first
+
+
+def test_primary_serves_when_no_replica_is_healthy():
+    router = ReplicaRouter()
+    db_conn = make_connection("unused", endpoints=REPLICAS)
+    for endpoint in router.endpoints_for(db_conn):
+        if endpoint.role == EndpointRole.REPLICA:
+            router.mark_unhealthy(endpoint, "down")
+    assert router.checkout(db_conn).role == EndpointRole.PRIMARY
+
+
+def test_bad_sql_keeps_replicas_healthy(executor, target_db):
+    db_conn = make_connection(target_db, endpoints=REPLICAS)
+    for _ in range(6):
+        with pytest.raises(HTTPException) as error:
+            run(executor, db_conn, "SELECT no_such_column FROM t")
+        assert error.value.status_code == 400
+    assert all(e.healthy for e in replicas(db_conn))
+    # No failover: every bad call ran on exactly one endpoint
+    assert sum(e.dispatched for e in replica_router.endpoints_for(db_conn)) == 6
+    assert run(executor, db_conn, "SELECT count(*) AS n FROM t")["data"] == [{"n": 1000}]
+
+
+def test_unreachable_replica_fails_over_and_leaves_rotation(executor, target_db, tmp_path, monkeypatch):
+    db_conn = make_connection(target_db, endpoints=REPLICAS)
+    connection_string = executor._get_connection_string
+
+    def unreachable_replica_1(conn, host=None, port=None):
+        if host == "replica-1":
+            return f"sqlite:///{tmp_path / 'missing' / 'db.sqlite3'}"
+        return connection_string(conn, host, port)
+
+    monkeypatch.setattr(executor, "_get_connection_string", unreachable_replica_1)
+    for _ in range(3):
+        assert run(executor, db_conn, "SELECT count(*) AS n FROM t")["data"] == [{"n": 1000}]
+    by_host = {e.host: e for e in replicas(db_conn)}
+    assert not by_host["replica-1"].healthy
+    assert by_host["replica-2"].healthy
@@ -0,0 +1,38 @@
+"""Encoded response bodies: hot queries reuse their body and revalidate with ETags."""
+import sqlite3
+
+from conftest import add_published_query, call_api
+
+SQL = "SELECT id, name FROM t WHERE id <= :last ORDER BY id"
+PARAMS_INFO = {"last": {"type": "integer"}}
+
+
+def execute(app_db, query_uuid, last, **headers):
+    return call_api(app_db, "POST", f"/api/v1/execute/{query_uuid}", json={"params": {"last": last}}, headers=headers)
+
+
+def test_cached_body_is_reused_and_revalidated(app_db, target_db):
+    query_uuid = add_published_query(
+        app_db, target_db, SQL, params_info=PARAMS_INFO, execution_options={"cache_ttl_seconds": 60}
+    )
+    first = execute(app_db, query_uuid, 3)
+    assert first.status_code == 200, first.text
+    conn = sqlite3.connect(target_db)
+    conn.execute("DELETE FROM t")
+    conn.commit()
+    conn.close()
+
+    again = execute(app_db, query_uuid, 3)
+    assert again.content == first.content and again.headers["ETag"] == first.headers["ETag"]
+    assert again.json()["row_count"] == 3
+    revalidated = execute(app_db, query_uuid, 3, **{"If-None-Match": first.headers["ETag"]})
+    assert revalidated.status_code == 304 and revalidated.content == b""
+    # Other parameters are another body
+    assert execute(app_db, query_uuid, 2).json()["row_count"] == 0
+
+
+def test_uncached_queries_carry_no_etag(app_db, target_db):
+    query_uuid = add_published_query(app_db, target_db, SQL, params_info=PARAMS_INFO)
+    response = execute(app_db, query_uuid, 3)
+    assert response.json()["row_count"] == 3
+    assert "ETag" not in response.headers
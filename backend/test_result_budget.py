@@ -0,0 +1,51 @@
+"""Result budgets: fetching stops at a query's row and byte limits, and the result says so."""
+from app.core.config import settings
+from app.services.fetch_pipeline import ResultBudget, fetch_rows, result_budget
+from conftest import add_published_query, call_api
+
+ROWS = [(i, "x" * 92) for i in range(1000)]
+
+
+def test_fetching_stops_once_the_budget_is_spent():
+    remaining = list(ROWS)
+    reads = []
+
+    def fetchmany(size):
+        reads.append(size)
+        chunk, remaining[:] = remaining[:size], remaining[size:]
+        return chunk
+
+    budget = ResultBudget(max_rows=150)
+    rows = fetch_rows(fetchmany, ["id", "text"], 100, budget=budget)
+    assert [row["id"] for row in rows] == list(range(150))
+    assert budget.truncated
+    # Nothing is read past the chunk that crossed the limit
+    assert len(reads) <= 3
+
+
+def test_byte_limit_cuts_inside_a_chunk():
+    # 16 + 100 estimated bytes per row
+    budget = ResultBudget(max_bytes=116 * 10 + 50)
+    rows = [{"id": i, "text": "x" * 92} for i in range(20)]
+    assert len(budget.take(rows, 116 * 20)) == 10
+    assert budget.truncated and budget.take(rows, 116) == []
+
+
+def test_query_limits_are_capped_by_the_server(monkeypatch):
+    monkeypatch.setattr(settings, "RESULT_MAX_ROWS", 100)
+    assert result_budget(max_rows=1000).max_rows == 100
+    assert result_budget(max_rows=10).max_rows == 10
+    assert result_budget().max_bytes == settings.RESULT_MAX_BYTES
+
+
+def test_truncated_results_are_marked(app_db, target_db):
+    query_uuid = add_published_query(
+        app_db, target_db, "SELECT id FROM t ORDER BY id", execution_options={"max_rows": 10}
+    )
+    body = call_api(app_db, "POST", f"/api/v1/execute/{query_uuid}", json={}).json()
+    assert (body["row_count"], body["truncated"]) == (10, True)
+
+    # The sets of a batch share one budget
+    batch = call_api(app_db, "POST", f"/api/v1/execute/{query_uuid}/batch", json={"param_sets": [{}, {}]}).json()
+    assert sum(result["row_count"] for result in batch["results"]) == 10
+    assert any(result["truncated"] for result in batch["results"])
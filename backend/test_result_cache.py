@@ -0,0 +1,43 @@
+"""Result cache: cached results encode like live ones, through both tiers."""
+import asyncio
+import json
+from datetime import datetime
+from decimal import Decimal
+
+from app.core.config import settings
+from app.schemas.query import QueryExecuteResponse
+from app.services.result_cache import MemoryCache, ResultCache, SQLiteCacheBackend
+from app.services.result_encoder import encode_response
+
+RESULT = {
+    "executed_at": datetime(2024, 1, 2, 3, 4, 5),
+    "row_count": 3,
+    "columns": ["id", "payload", "amount"],
+    "data": [
+        {"id": 1, "payload": b"\x89PNG\r\n\x1a\n\xff", "amount": Decimal("1.50")},
+        {"id": 2, "payload": b"plain text", "amount": Decimal("2")},
+        {"id": 3, "payload": None, "amount": None}
+    ],
+    "execution_time_ms": 5
+}
+
+
+def cached_body(result):
+    return encode_response(QueryExecuteResponse, query_id=1, query_uuid="uuid", query_name="name", **result)
+
+
+def test_binary_values_are_cached_as_base64(tmp_path):
+    l2 = SQLiteCacheBackend(str(tmp_path / "cache.sqlite3"), settings.RESULT_CACHE_MAX_BYTES)
+
+    async def scenario():
+        stored = await ResultCache(MemoryCache(10, 1 << 20), l2).set("key", RESULT, 60)
+        # Another worker only has the L2 copy
+        shared = await ResultCache(MemoryCache(10, 1 << 20), l2).get("key")
+        return stored, shared
+
+    stored, shared = asyncio.run(scenario())
+    live = json.loads(cached_body(RESULT))
+    assert live["data"][0]["payload"] == "iVBORw0KGgr/"
+    for cached in (stored, shared):
+        body = json.loads(cached_body({key: value for key, value in cached.items() if key != "expires_at"}))
+        assert body == live
@@ -0,0 +1,45 @@
+"""Result encoding: direct JSON matches what the response models produce."""
+import json
+import uuid
+from datetime import date, datetime, time, timezone
+from decimal import Decimal
+
+from app.schemas.query import QueryExecuteResponse
+from app.services.result_encoder import encode_json, encode_ndjson, encode_response
+
+ROWS = [
+    {
+        "id": 1, "big": 2 ** 70, "price": Decimal("1.50"), "key": uuid.UUID(int=1), "day": date(2024, 1, 1),
+        "at": datetime(2024, 1, 1, 12, 0, tzinfo=timezone.utc), "local": datetime(2024, 1, 1, 12, 0),
+        "clock": time(9, 30), "name": "é", "blob": b"text", "meta": {"tags": ["x"]}
+    },
+    {
+        "id": 2, "big": None, "price": None, "key": None, "day": None, "at": None, "local": None,
+        "clock": None, "name": None, "blob": None, "meta": None
+    }
+]
+FIELDS = dict(
+    query_id=1, query_uuid=uuid.UUID(int=7), query_name="name", executed_at=datetime(2024, 1, 2, 3, 4, 5),
+    row_count=2, columns=list(ROWS[0]), data=ROWS, execution_time_ms=5
+)
+
+
+def test_response_matches_the_model():
+    assert json.loads(encode_response(QueryExecuteResponse, **FIELDS)) == json.loads(
+        QueryExecuteResponse(**FIELDS).model_dump_json()
+    )
+    # Field order and defaults come from the model
+    assert list(json.loads(encode_response(QueryExecuteResponse, **FIELDS))) == list(QueryExecuteResponse.model_fields)
+
+
+def test_values_json_cannot_hold_are_still_valid_json():
+    body = encode_json({"values": [float("nan"), float("inf"), 1.5], "raw": b"\xff\xfe"})
+    assert json.loads(body) == {"values": [None, None, 1.5], "raw": "//4="}
+    # Only real non-finite floats change; strings that mention them do not
+    assert json.loads(encode_json({"text": "NaN", "value": 1.0})) == {"text": "NaN", "value": 1.0}
+
+
+def test_ndjson_writes_one_row_per_line():
+    lines = encode_ndjson(ROWS).split(b"\n")
+    assert lines[-1] == b""
+    assert [json.loads(line)["id"] for line in lines[:-1]] == [1, 2]
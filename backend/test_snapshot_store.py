@@ -0,0 +1,91 @@
+"""Materialized snapshots: incremental refreshes append segments instead of rewriting the snapshot."""
+import asyncio
+import os
+import sqlite3
+from types import SimpleNamespace
+
+from app.core.config import settings
+from app.services.scheduler import SchedulerService
+from app.services.snapshot_store import SnapshotStore, snapshot_store
+from conftest import ROW_COUNT
+
+
+def rows(first, last, label="a"):
+    return [{"id": i, "label": label} for i in range(first, last + 1)]
+
+
+def segment_files(store):
+    directory = os.path.join(store.snapshot_dir, "1", "v1")
+    return sorted(name for name in os.listdir(directory) if name.endswith(".mqc"))
+
+
+def test_append_leaves_existing_segments_alone(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    store.put(1, 1, {}, rows(1, 100), 5, watermark=100)
+    base = store.open(1, 1, {}).segment_names[0]
+    base_mtime = os.stat(os.path.join(store.snapshot_dir, "1", "v1", base)).st_mtime_ns
+
+    assert store.append(1, 1, {}, rows(101, 150), 5, watermark=150) == 150
+    snapshot = store.get(1, 1, {})
+    assert [row["id"] for row in snapshot["data"]] == list(range(1, 151))
+    assert snapshot["watermark"] == 150
+    assert store.open(1, 1, {}).segment_names[0] == base
+    assert os.stat(os.path.join(store.snapshot_dir, "1", "v1", base)).st_mtime_ns == base_mtime
+    assert store.get(1, 1, {}, offset=95, limit=10)["data"] == rows(96, 105)
+
+
+def test_merge_keys_rewrite_only_segments_with_replaced_rows(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    store.put(1, 1, {}, rows(1, 100), 5)
+    store.append(1, 1, {}, rows(101, 110), 5)
+    base, appended = store.open(1, 1, {}).segment_names
+
+    store.append(1, 1, {}, rows(105, 112, "b") + rows(112, 112, "c"), 5, key_columns=["id"])
+    reader = store.open(1, 1, {})
+    assert reader.segment_names[0] == base and appended not in reader.segment_names
+    assert store.get(1, 1, {})["data"] == rows(1, 104) + rows(105, 111, "b") + rows(112, 112, "c")
+    assert len(segment_files(store)) == 3
+
+
+def test_segments_are_merged_past_the_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "SNAPSHOT_MAX_SEGMENTS", 3)
+    store = SnapshotStore(str(tmp_path))
+    store.put(1, 1, {}, rows(1, 10), 5)
+    base = store.open(1, 1, {}).segment_names[0]
+    for first in range(11, 101, 10):
+        store.append(1, 1, {}, rows(first, first + 9), 5)
+    reader = store.open(1, 1, {})
+    assert len(reader.segment_names) <= 3 and reader.segment_names[0] == base
+    assert store.get(1, 1, {})["data"] == rows(1, 100)
+    assert segment_files(store) == sorted(reader.segment_names)
+
+
+def test_open_reader_keeps_its_rows_across_a_refresh(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    store.put(1, 1, {}, rows(1, 10), 5)
+    before = store.open(1, 1, {})
+    store.put(1, 1, {}, rows(1, 20, "b"), 5)
+    assert store.read(before)["data"] == rows(1, 10)
+    assert store.get(1, 1, {})["data"] == rows(1, 20, "b")
+
+
+def test_incremental_refresh_appends_rows_past_the_watermark(executor, db_conn):
+    scheduler = SchedulerService()
+    scheduler.query_executor = executor
+    query = SimpleNamespace(
+        id=1, current_version_id=1, sql_template="SELECT id, name FROM t", params_info=None,
+        execution_options={}, workspace=SimpleNamespace(id=1, execution_weight=1, database_connection=db_conn)
+    )
+    incremental = {"watermark_column": "id"}
+
+    asyncio.run(scheduler._refresh_snapshot(query, {}, incremental, False))
+    conn = sqlite3.connect(db_conn.database_name)
+    conn.execute("INSERT INTO t (id, name) VALUES (?, 'new'), (?, 'new')", (ROW_COUNT + 1, ROW_COUNT + 2))
+    conn.commit()
+    conn.close()
+    asyncio.run(scheduler._refresh_snapshot(query, {}, incremental, False))
+
+    snapshot = snapshot_store.get(1, 1, {})
+    assert snapshot["row_count"] == ROW_COUNT + 2 and snapshot["watermark"] == ROW_COUNT + 2
+    assert snapshot["data"][-2:] == [{"id": ROW_COUNT + 1, "name": "new"}, {"id": ROW_COUNT + 2, "name": "new"}]
+    assert len(snapshot_store.open(1, 1, {}).segment_names) == 2
@@ -0,0 +1,51 @@
+"""SQL templates: what counts as a parameter, IN-list buckets, and reuse per version."""
+import pytest
+from sqlalchemy import create_engine
+
+from app.services.sql_template import MissingParametersError, SqlTemplateCache, pad_to_bucket, parse_template
+
+
+def test_only_bind_parameters_are_parameters():
+    sql = (
+        "SELECT created_at::date, '10:30' AS t, \"a:b\", $$x:y$$ -- :c\n"
+        "FROM t /* :d */ WHERE id = :id AND name = :name AND id <> :id"
+    )
+    normalized, names = parse_template(sql)
+    assert names == ["id", "name"]
+    assert normalized == (
+        "SELECT created_at\\:\\:date, '10\\:30' AS t, \"a\\:b\", $$x\\:y$$ -- \\:c\n"
+        "FROM t /* \\:d */ WHERE id = :id AND name = :name AND id <> :id"
+    )
+
+
+def test_in_lists_are_padded_to_a_power_of_two():
+    assert pad_to_bucket([]) == []
+    assert pad_to_bucket([1]) == [1]
+    assert pad_to_bucket([1, 2, 3]) == [1, 2, 3, 3]
+    assert len(pad_to_bucket(list(range(9)))) == 16
+
+
+def test_templates_are_reused_per_version_until_edited():
+    cache = SqlTemplateCache(max_entries=2)
+    first = cache.get("SELECT :a", version_id=1)
+    assert cache.get("SELECT :a", version_id=1) is first
+    # The version was edited in place
+    edited = cache.get("SELECT :a, :b", version_id=1)
+    assert edited is not first and edited.param_names == ["a", "b"]
+    cache.get("SELECT 2", version_id=2)
+    cache.get("SELECT 3", version_id=3)
+    assert cache.get("SELECT :a, :b", version_id=1) is not edited
+
+
+def test_bind_reports_missing_parameters():
+    template = SqlTemplateCache().get("SELECT * FROM t WHERE id = :id AND name = :name")
+    with pytest.raises(MissingParametersError) as error:
+        template.bind({"id": 1})
+    assert error.value.names == ["name"]
+    assert template.bind({"id": 1, "name": "n1", "extra": 2}) == {"id": 1, "name": "n1"}
+
+
+def test_statement_runs_with_colons_in_literals(target_db):
+    template = SqlTemplateCache().get("SELECT '10:30' AS t, id FROM t WHERE id = :id")
+    with create_engine(f"sqlite:///{target_db}").connect() as connection:
+        assert connection.execute(template.statement, template.bind({"id": 3})).all() == [("10:30", 3)]
@@ -0,0 +1,42 @@
+"""Table parameters: rows sent as JSON or uploaded as CSV, joined as a temp table."""
+import json
+
+from conftest import add_published_query, call_api
+
+SQL = "SELECT t.id, k.label FROM t JOIN :keys k ON k.id = t.id ORDER BY t.id"
+PARAMS_INFO = {"keys": {"type": "table", "columns": {"id": "integer", "label": "string"}}}
+
+
+def test_json_rows_are_joined(app_db, target_db):
+    query_uuid = add_published_query(app_db, target_db, SQL, params_info=PARAMS_INFO)
+    for _ in range(2):
+        # The temp table is dropped after each run, so a second run can create it again
+        response = call_api(app_db, "POST", f"/api/v1/execute/{query_uuid}", json={
+            "params": {"keys": [{"id": 3, "label": "c"}, [1, "a"], {"id": "2000", "label": "none"}]}
+        })
+        assert response.status_code == 200, response.text
+        assert response.json()["data"] == [{"id": 1, "label": "a"}, {"id": 3, "label": "c"}]
+
+
+def test_csv_upload_is_joined(app_db, target_db):
+    query_uuid = add_published_query(app_db, target_db, SQL, params_info=PARAMS_INFO)
+    response = call_api(
+        app_db, "POST", f"/api/v1/execute/{query_uuid}/upload",
+        data={"params": json.dumps({})},
+        files={"keys": ("keys.csv", b"id,label\n5,e\n4,d\n", "text/csv")}
+    )
+    assert response.status_code == 200, response.text
+    assert response.json()["data"] == [{"id": 4, "label": "d"}, {"id": 5, "label": "e"}]
+
+
+def test_invalid_rows_and_unknown_uploads_are_rejected(app_db, target_db):
+    query_uuid = add_published_query(app_db, target_db, SQL, params_info=PARAMS_INFO)
+    response = call_api(app_db, "POST", f"/api/v1/execute/{query_uuid}", json={
+        "params": {"keys": [{"id": "x", "label": "a"}]}
+    })
+    assert response.status_code == 400
+    response = call_api(
+        app_db, "POST", f"/api/v1/execute/{query_uuid}/upload",
+        files={"other": ("other.csv", b"id\n1\n", "text/csv")}
+    )
+    assert response.status_code == 400
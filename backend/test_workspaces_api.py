@@ -0,0 +1,51 @@
+"""Workspace endpoints against an application database in SQLite."""
+import asyncio
+
+from app.core.security import create_access_token, encrypt_password
+from app.models import DatabaseConnection, Query, Workspace
+from app.models.database_connection import DatabaseType
+from app.models.query import QueryStatus
+from app.models.workspace import WorkspaceType
+from conftest import call_api
+
+
+def auth(is_admin=True):
+    token = create_access_token({"sub": "admin", "is_admin": is_admin})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def add_workspace(app_db):
+    async def add():
+        async with app_db() as session:
+            connection = DatabaseConnection(
+                name="warehouse", database_type=DatabaseType.SQLITE, host="localhost", port=0,
+                database_name="warehouse.sqlite3", username="", password_encrypted=encrypt_password("x")
+            )
+            workspace = Workspace(name="sales", type=WorkspaceType.GROUP, owner_id="admin", database_connection=connection)
+            session.add_all([
+                workspace,
+                Query(name="q1", sql_template="SELECT 1", workspace=workspace, status=QueryStatus.AVAILABLE,
+                      created_by="admin")
+            ])
+            await session.commit()
+            return workspace.uuid
+
+    return asyncio.run(add())
+
+
+def test_update_workspace_returns_relationships(app_db):
+    workspace_uuid = add_workspace(app_db)
+    response = call_api(app_db, "PUT", f"/api/v1/workspaces/{workspace_uuid}", json={"execution_weight": 3}, headers=auth())
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["execution_weight"] == 3
+    assert body["database_connection_name"] == "warehouse"
+    assert body["query_count"] == 1
+
+
+def test_update_workspace_requires_admin(app_db):
+    workspace_uuid = add_workspace(app_db)
+    response = call_api(
+        app_db, "PUT", f"/api/v1/workspaces/{workspace_uuid}", json={"execution_weight": 3}, headers=auth(False)
+    )
+    assert response.status_code == 403
@@ -10,6 +10,7 @@ export interface Workspace {
   type: WorkspaceType;
   owner_id: string;
   auto_close_days: number | null;
+  execution_weight: number;
   database_connection_id?: number | null;
   database_connection_name?: string | null;
   created_at: string;
@@ -20,6 +21,7 @@ export interface WorkspaceCreate {
   name: string;
   type: WorkspaceType;
   auto_close_days?: number | null;
+  execution_weight?: number;
   database_connection_id?: number | null;
 }
 